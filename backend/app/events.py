@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Event stream konfigürasyonu
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))  # saniye
+
+# İşleme aşamaları
+class Stage:
+    UPLOADED = "uploaded"
+    PREPROCESSING = "preprocessing"
+    OCR = "ocr"
+    EXTRACTION = "extraction"
+    DONE = "done"
+    ERROR = "error"
+
+FINAL_STAGES = {Stage.DONE, Stage.ERROR}
+
+# Aşama sırası; geç gelen eski olaylar (ör. DB anlık görüntüsü) geri adım attırmaz
+STAGE_ORDER = {
+    Stage.UPLOADED: 0,
+    Stage.PREPROCESSING: 1,
+    Stage.OCR: 2,
+    Stage.EXTRACTION: 3,
+    Stage.DONE: 4,
+    Stage.ERROR: 4
+}
+
+def invoice_topic(invoice_id: int) -> str:
+    return f"invoice:{invoice_id}"
+
+def batch_topic(batch_id: str) -> str:
+    return f"batch:{batch_id}"
+
+class ProgressBroker:
+    """
+    Fatura işleme aşamaları için process içi yayın/abonelik
+
+    Olaylar herhangi bir thread'den yayınlanabilir (queue worker, persist pool,
+    process pool dinleyicisi); her abone kendi event loop'undaki bir
+    asyncio.Queue üzerinden olayları alır.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._published = 0
+
+    def publish(self, invoice_id: int, stage: str, batch_id: Optional[str] = None, **data: Any):
+        event = {
+            "invoice_id": invoice_id,
+            "batch_id": batch_id,
+            "stage": stage,
+            "timestamp": datetime.utcnow().isoformat(),
+            **data
+        }
+
+        topics = [invoice_topic(invoice_id)]
+        if batch_id:
+            topics.append(batch_topic(batch_id))
+
+        with self._lock:
+            self._published += 1
+            targets = [sub for topic in topics for sub in self._subscribers.get(topic, ())]
+
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # Abonenin event loop'u kapanmış
+
+    @contextmanager
+    def subscribe(self, topic: str):
+        """Event loop içinden çağrılır; olayları alacak kuyruğu verir"""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[topic].append(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[topic].remove(subscriber)
+                if not self._subscribers[topic]:
+                    del self._subscribers[topic]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "topics": len(self._subscribers),
+                "subscribers": sum(len(subs) for subs in self._subscribers.values()),
+                "published": self._published
+            }
+
+    async def stream(self, topic: str, snapshot: Callable[[], Awaitable[List[Dict[str, Any]]]],
+                     keepalive: float = EVENTS_KEEPALIVE) -> AsyncIterator[str]:
+        """
+        Server-Sent Events akışı
+
+        Önce veritabanındaki güncel durum gönderilir, ardından canlı olaylar.
+        Takip edilen tüm faturalar son aşamaya ulaşınca akış kapanır. Olay başka
+        bir node'da yayınlanmış olabileceği için keepalive aralığında durum
+        veritabanından bir kez daha okunur.
+        """
+        with self.subscribe(topic) as queue:
+            latest: Dict[int, str] = {}
+
+            def changed(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                fresh = []
+                for event in events:
+                    current = latest.get(event["invoice_id"])
+                    if current is None or STAGE_ORDER.get(event["stage"], 0) > STAGE_ORDER.get(current, 0):
+                        latest[event["invoice_id"]] = event["stage"]
+                        fresh.append(event)
+                return fresh
+
+            def finished() -> bool:
+                return bool(latest) and all(stage in FINAL_STAGES for stage in latest.values())
+
+            for event in changed(await snapshot()):
+                yield format_sse(event)
+
+            while not finished():
+                try:
+                    events = [await asyncio.wait_for(queue.get(), timeout=keepalive)]
+                    while not queue.empty():
+                        events.append(queue.get_nowait())
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    events = await snapshot()
+
+                for event in changed(events):
+                    yield format_sse(event)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: progress\ndata: {json.dumps(event, default=str)}\n\n"
+
+# Global broker instance
+progress_broker = ProgressBroker()
@@ -1,13 +1,46 @@
+import os
 import re
-import spacy
+import threading
+import numpy as np
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Any
 import logging
 from dataclasses import dataclass
 from decimal import Decimal
+from field_patterns import FieldScanner, PatternRegistry, ScanResult, TEXT_START
+from table_layout import (
+    LayoutRow, TABLE_COLUMN_GAP, assign_columns, cluster_positions, cluster_rows, median_height, split_cells
+)
 
 logger = logging.getLogger(__name__)
 
+# spaCy modelleri (sırayla denenir) ve NER için gerekmeyen, yüklenmeyen bileşenler.
+# Paylaşılan tok2vec, dinleyeni kalmadıysa yüklemeden sonra çıkarılır (bkz. _drop_unused_tok2vec)
+NLP_MODELS = [m for m in os.getenv("NLP_MODELS", "tr_core_news_sm,en_core_web_sm").split(",") if m]
+NLP_EXCLUDE = [c for c in os.getenv(
+    "NLP_EXCLUDE", "tagger,parser,morphologizer,lemmatizer,trainable_lemmatizer,attribute_ruler,senter"
+).split(",") if c]
+
+# NER sadece regex güveni bu değerin altında kalan (veya bulunamayan) alanlar için çalışır.
+# NER sonucu regex sonucunu sadece kendi güveni daha yüksekse değiştirdiğinden eşik
+# alanın NER güveniyle sınırlanır; varsayılan eşik sonuçları değiştirmez.
+NLP_CONFIDENCE_THRESHOLD = float(os.getenv("NLP_CONFIDENCE_THRESHOLD", "0.9"))
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "16"))
+
+# NER ile çıkarılabilen alanlar ve NER sonuçlarının güveni.
+# company_name regex güveni her zaman 0.6'nın üzerinde: NER sadece regex bulamazsa çalışır
+NLP_FIELDS = {'total_amount': 0.7, 'date': 0.75, 'company_name': 0.6}
+
+# Satır kalemi tablosunda sayı hücresi (1.234,56 / 2 / %18 / 18%)
+NUMERIC_TOKEN = re.compile(r'^%?\d[\d.,]*%?$')
+CURRENCY_TOKENS = {'tl', 'try', '₺', 'usd', 'eur', 'gbp'}
+
+# Tablo sonu: ara toplam / genel toplam / KDV matrahı satırları
+SUMMARY_WORDS = ('toplam', 'total', 'subtotal', 'matrah', 'odenecek', 'yekun')
+
+# Türkçe karakterleri sadeleştirme (başlık / özet kelimeleri için)
+_FOLD = str.maketrans('İIıŞşÇçĞğÜüÖö', 'iiissccgguuoo')
+
 @dataclass
 class ExtractedField:
     value: Any
@@ -17,17 +50,10 @@ class ExtractedField:
 
 class AdvancedFieldExtractor:
     def __init__(self):
-        # spaCy modelini yükle (Turkish model gerekirse indirilecek)
-        try:
-            self.nlp = spacy.load("tr_core_news_sm")
-        except OSError:
-            # Türkçe model yoksa İngilizce kullan
-            try:
-                self.nlp = spacy.load("en_core_web_sm")
-                logger.warning("Turkish spaCy model not found, using English model")
-            except OSError:
-                self.nlp = None
-                logger.warning("No spaCy model found, using regex-only extraction")
+        # spaCy modeli ilk NER ihtiyacında yüklenir (bkz. nlp)
+        self._nlp = None
+        self._nlp_loaded = False
+        self._nlp_lock = threading.Lock()
         
         # Gelişmiş regex pattern'leri
         self.advanced_patterns = {
@@ -51,9 +77,10 @@ class AdvancedFieldExtractor:
                 r'(?:tax\s*(?:no|id)[:.\s]*)(\d{10,11})'
             ],
             'company_name': [
-                r'(?:unvan|firma\s*adı|company)[:.\s]*([A-ZÇĞIİÖŞÜa-zçğıiöşü\s.&\-\'\"]+?)(?:\s+(?:LTD|A\.Ş|SAN|TİC|INC|LLC)\.?)*',
-                r'^([A-ZÇĞIİÖŞÜ][A-Za-zçğıiöşü\s.&\-\'\"]+)(?:\s+(?:LTD|A\.Ş|SAN|TİC|INC|LLC)\.?)*',
-                r'(?:satıcı|seller)[:.\s]*([A-ZÇĞIİÖŞÜa-zçğıiöşü\s.&\-\'\"]+)'
+                # Unvan satır sonunda biter (metinde satır sonları korunur); ikinci pattern belgenin başı
+                r'(?:unvan|firma\s*adı|company)[:.\s]*([A-ZÇĞIİÖŞÜa-zçğıiöşü .&\-\'\"]+?)(?:\s+(?:LTD|A\.Ş|SAN|TİC|INC|LLC)\.?)*',
+                r'\A([A-ZÇĞIİÖŞÜ][A-Za-zçğıiöşü .&\-\'\"]+)(?:\s+(?:LTD|A\.Ş|SAN|TİC|INC|LLC)\.?)*',
+                r'(?:satıcı|seller)[:.\s]*([A-ZÇĞIİÖŞÜa-zçğıiöşü .&\-\'\"]+)'
             ],
             'total_amount': [
                 r'(?:toplam|total|genel\s*toplam|grand\s*total)[:.\s]*([0-9.,]+)(?:\s*(?:TL|₺|USD|EUR))?',
@@ -89,6 +116,46 @@ class AdvancedFieldExtractor:
             ]
         }
         
+        # Pattern'ler yüklemede bir kez derlenir (değer grubu 1 zorunlu)
+        self.field_patterns = PatternRegistry(self.advanced_patterns, require_group=True)
+        
+        # Özel kurallar: toplam / ödenecek sonrası ve TL / ₺ öncesi tutarlar
+        self.rule_patterns = PatternRegistry({
+            'total_amount_rule': [
+                r'(?:toplam|ödenecek).*?(\d+[.,]\d{2})',
+                r'(\d+[.,]\d{2})\s*(?:TL|₺)'
+            ]
+        }, flags=re.IGNORECASE)
+        
+        # Pattern'lerin başladığı etiket kelimeleri; metin bunlar için tek geçişte taranır,
+        # değer pattern'leri sadece etiket konumlarındaki pencerelerde çalışır.
+        # Tarama _preprocess_text çıktısında yapıldığından etiketler sadeleştirilmiş yazılır (fiş -> fis)
+        self.field_labels = {
+            'invoice_number': ['fatura', 'belge', 'seri', 'invoice', 'fis'],
+            'date': ['tarih', 'date', 'duzenleme', 'duzenlenme', 'fis'],
+            'tax_number': ['vergi', 'vkn', 'v.k.n', 'tc', 't.c', 'tax'],
+            'company_name': ['unvan', 'firma', 'company', 'satici', 'seller', TEXT_START],
+            'total_amount': ['toplam', 'total', 'genel', 'grand', 'odenecek', 'amount', 'brut', 'gross', 'ara', 'subtotal'],
+            'net_amount': ['net', 'vergisiz', 'tax'],
+            'vat_amount': ['kdv', 'ktv', 'vat', 'katma', '%'],
+            'vat_rate': ['kdv', 'vat', '%', 'vergi'],
+            'currency': ['tl', '₺', 'usd', 'eur', 'gbp', 'para', 'currency'],
+            'iban': ['iban', 'hesap', 'tr'],
+            'due_date': ['vade', 'due', 'son'],
+            'total_amount_rule': ['toplam', 'odenecek', 'tl', '₺']
+        }
+        self.field_scanner = FieldScanner(self.field_labels, lookbehind={'total_amount_rule': 24})
+        
+        # Satır kalemi tablo formatları
+        self.line_item_patterns = [
+            # Miktar Açıklama BirimFiyat Tutar
+            re.compile(r'(\d+(?:[.,]\d+)?)\s+([A-Za-zçğıiöşü\s\-\.]+?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)'),
+            # Açıklama Miktar BirimFiyat Tutar
+            re.compile(r'([A-Za-zçğıiöşü\s\-\.]+?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)'),
+            # Daha esnek pattern
+            re.compile(r'(.+?)\s+(\d+[.,]?\d*)\s+(\d+[.,]?\d*)\s+(\d+[.,]?\d*)\s*(?:TL|₺)?')
+        ]
+        
         # Türk lirası format recognizer
         self.turkish_number_pattern = r'\d{1,3}(?:\.\d{3})*(?:,\d{2})?'
         
@@ -101,52 +168,153 @@ class AdvancedFieldExtractor:
             'INC', 'INC.', 'LLC', 'CORP'
         ]
 
-    def extract_all_fields(self, text: str) -> Dict[str, ExtractedField]:
+    @property
+    def nlp(self):
         """
-        Metinden tüm fatura alanlarını çıkarır
+        spaCy modeli (ilk erişimde yüklenir)
+
+        Process başlangıcı model yükleme süresi ve belleğini taşımaz; regex'in
+        yeterli olduğu belgelerde model hiç yüklenmez.
         """
-        results = {}
+        if not self._nlp_loaded:
+            with self._nlp_lock:
+                if not self._nlp_loaded:
+                    self._nlp = self._load_nlp()
+                    self._nlp_loaded = True
+        return self._nlp
+
+    def _load_nlp(self):
+        try:
+            import spacy
+        except ImportError:
+            logger.warning("spaCy not installed, using regex-only extraction")
+            return None
         
+        # Türkçe model yoksa İngilizce kullan
+        for i, model in enumerate(NLP_MODELS):
+            try:
+                nlp = spacy.load(model, exclude=NLP_EXCLUDE)
+                self._drop_unused_tok2vec(nlp)
+                if i > 0:
+                    logger.warning(f"spaCy model {NLP_MODELS[0]} not found, using {model}")
+                logger.info(f"spaCy model {model} loaded with pipes: {', '.join(nlp.pipe_names)}")
+                return nlp
+            except OSError:
+                continue
+        
+        logger.warning("No spaCy model found, using regex-only extraction")
+        return None
+
+    def _drop_unused_tok2vec(self, nlp):
+        """
+        Paylaşılan tok2vec'i dinleyen bileşen kalmadıysa pipeline'dan çıkarır
+
+        NER kendi tok2vec katmanını taşıyorsa paylaşılan tok2vec sadece
+        yüklenmeyen tagger / parser için çalışır. Dinleyen varsa (NER paylaşılan
+        katmanı kullanıyorsa) tok2vec yerinde bırakılır; bu yüzden NLP_EXCLUDE'a
+        sabit olarak eklenmez.
+        """
+        if "tok2vec" not in nlp.pipe_names:
+            return
+        listeners = getattr(nlp.get_pipe("tok2vec"), "listening_components", None)
+        if listeners is None:
+            return
+        if not any(name in nlp.pipe_names for name in listeners):
+            nlp.remove_pipe("tok2vec")
+
+    def extract_all_fields(self, text: str, words: Optional[List[Dict]] = None) -> Dict[str, ExtractedField]:
+        """
+        Metinden tüm fatura alanlarını çıkarır
+
+        OCR kelime kutuları verilirse satır kalemleri tablo geometrisinden çıkarılır.
+        """
+        return self.extract_batch([text], [words])[0]
+
+    def extract_batch(self, texts: List[str], words: Optional[List[Optional[List[Dict]]]] = None,
+                      batch_size: int = NLP_BATCH_SIZE) -> List[Dict[str, ExtractedField]]:
+        """
+        Birden çok metinden fatura alanlarını çıkarır
+
+        NER sadece regex'in bulamadığı veya eşiğin altında güvenle bulduğu alanı
+        olan belgelerde çalışır; bu belgeler tek bir nlp.pipe çağrısında toplu işlenir.
+        """
+        words = words or [None] * len(texts)
         # Metni temizle
-        cleaned_text = self._preprocess_text(text)
+        cleaned_texts = [self._preprocess_text(text) for text in texts]
+        
+        # Etiketler tek geçişte taranır; alanlar sadece etiket pencerelerinde aranır
+        scans = [self.field_scanner.scan(cleaned_text) for cleaned_text in cleaned_texts]
         
         # Her alan için extraction
-        for field_name in self.advanced_patterns.keys():
-            extracted = self._extract_field_with_confidence(cleaned_text, field_name)
-            if extracted:
-                results[field_name] = extracted
-        
-        # spaCy ile NLP-based extraction (eğer model mevcutsa)
-        if self.nlp:
-            nlp_results = self._extract_with_nlp(cleaned_text)
-            
-            # NLP sonuçlarını mevcut sonuçlarla birleştir
-            for field_name, nlp_result in nlp_results.items():
-                if field_name not in results or nlp_result.confidence > results[field_name].confidence:
-                    results[field_name] = nlp_result
-        
-        # Özel extraction kuralları
-        special_extractions = self._apply_special_rules(cleaned_text)
-        results.update(special_extractions)
-        
-        # Line items extraction
-        line_items = self._extract_line_items(cleaned_text)
-        if line_items:
-            results['line_items'] = ExtractedField(
-                value=line_items,
-                confidence=0.8,
-                source_text="Multiple lines",
-                method="rule-based"
-            )
+        all_results = []
+        for cleaned_text, scan in zip(cleaned_texts, scans):
+            results = {}
+            for field_name in self.advanced_patterns.keys():
+                extracted = self._extract_field_with_confidence(cleaned_text, field_name, scan)
+                if extracted:
+                    results[field_name] = extracted
+            all_results.append(results)
+        
+        # spaCy ile NLP-based extraction (eğer gereken alan ve model varsa)
+        pending = [(i, fields) for i, fields in enumerate(map(self._fields_needing_nlp, all_results)) if fields]
+        if pending and self.nlp:
+            try:
+                docs = self.nlp.pipe((cleaned_texts[i] for i, _ in pending), batch_size=batch_size)
+                for (i, fields), doc in zip(pending, docs):
+                    nlp_results = self._extract_with_nlp(cleaned_texts[i], doc)
+                    results = all_results[i]
+                    
+                    # NLP sonuçlarını mevcut sonuçlarla birleştir
+                    for field_name, nlp_result in nlp_results.items():
+                        if field_name not in fields:
+                            continue
+                        if field_name not in results or nlp_result.confidence > results[field_name].confidence:
+                            results[field_name] = nlp_result
+            except Exception as e:
+                logger.error(f"NLP extraction error: {e}")
         
-        return results
+        for cleaned_text, scan, results, document_words in zip(cleaned_texts, scans, all_results, words):
+            # Özel extraction kuralları
+            special_extractions = self._apply_special_rules(cleaned_text, scan)
+            results.update(special_extractions)
+            
+            # Line items extraction: önce kelime kutularından (tablo geometrisi), olmazsa metin satırlarından
+            line_items, confidence = self._extract_line_items_from_words(document_words) if document_words else ([], 0.0)
+            if line_items:
+                results['line_items'] = ExtractedField(
+                    value=line_items,
+                    confidence=confidence,
+                    source_text=f"Table rows on pages {sorted({item['additional_data']['page'] for item in line_items})}",
+                    method="layout"
+                )
+                continue
+            
+            line_items = self._extract_line_items(cleaned_text)
+            if line_items:
+                results['line_items'] = ExtractedField(
+                    value=line_items,
+                    confidence=0.8,
+                    source_text="Multiple lines",
+                    method="rule-based"
+                )
+        
+        return all_results
+
+    def _fields_needing_nlp(self, results: Dict[str, ExtractedField]) -> List[str]:
+        """Regex'in bulamadığı veya NER'in geçebileceği (eşiğin altındaki) güvenle bulduğu NLP alanları"""
+        return [
+            field_name for field_name, nlp_confidence in NLP_FIELDS.items()
+            if field_name not in results
+            or results[field_name].confidence < min(NLP_CONFIDENCE_THRESHOLD, nlp_confidence)
+        ]
 
     def _preprocess_text(self, text: str) -> str:
         """
         Metni temizle ve normalize et
         """
-        # Çoklu boşlukları tek boşluk yap
-        text = re.sub(r'\s+', ' ', text)
+        # Satır içi çoklu boşlukları tek boşluk yap; satır sonları (tablo satırları) korunur
+        text = re.sub(r'[^\S\n]+', ' ', text)
+        text = re.sub(r' ?\n[ \n]*', '\n', text)
         
         # OCR hatalarını düzelt
         ocr_corrections = {
@@ -167,28 +335,33 @@ class AdvancedFieldExtractor:
         
         return text.strip()
 
-    def _extract_field_with_confidence(self, text: str, field_name: str) -> Optional[ExtractedField]:
+    def _extract_field_with_confidence(self, text: str, field_name: str,
+                                       scan: Optional[ScanResult] = None) -> Optional[ExtractedField]:
         """
         Belirli bir alan için pattern matching ile confidence score
+
+        scan verilirse pattern'ler sadece alanın etiket pencerelerinde çalışır.
         """
-        patterns = self.advanced_patterns.get(field_name, [])
+        spans = scan.spans(field_name) if scan else None
+        if spans == []:
+            return None  # Etiket yok
         
-        for i, pattern in enumerate(patterns):
+        for pattern in self.field_patterns.patterns(field_name):
             try:
-                matches = list(re.finditer(pattern, text, re.IGNORECASE | re.MULTILINE))
+                # En güvenilir match'i seç (en uzun değer; eşleşmeler listeye toplanmaz)
+                best_match = pattern.best(text, spans=spans)
                 
-                if matches:
-                    # En güvenilir match'i seç
-                    best_match = max(matches, key=lambda m: len(m.group(1)))
+                if best_match:
+                    value = pattern.value(best_match)
                     
                     # Confidence hesapla (ilk pattern daha güvenilir)
-                    base_confidence = 0.9 - (i * 0.1)  # İlk pattern %90, sonrakiler daha az
-                    length_bonus = min(len(best_match.group(1)) / 20, 0.1)
+                    base_confidence = 0.9 - (pattern.index * 0.1)  # İlk pattern %90, sonrakiler daha az
+                    length_bonus = min(len(value) / 20, 0.1)
                     
                     confidence = min(base_confidence + length_bonus, 0.95)
                     
                     # Alan türüne göre post-processing
-                    processed_value = self._post_process_field(field_name, best_match.group(1))
+                    processed_value = self._post_process_field(field_name, value)
                     
                     if processed_value is not None:
                         return ExtractedField(
@@ -199,19 +372,22 @@ class AdvancedFieldExtractor:
                         )
                         
             except Exception as e:
-                logger.debug(f"Pattern {pattern} failed for {field_name}: {e}")
+                logger.debug(f"Pattern {pattern.source} failed for {field_name}: {e}")
                 continue
         
         return None
 
-    def _extract_with_nlp(self, text: str) -> Dict[str, ExtractedField]:
+    def _extract_with_nlp(self, text: str, doc=None) -> Dict[str, ExtractedField]:
         """
         spaCy ile NLP-based field extraction
+
+        doc verilirse (nlp.pipe çıktısı) metin yeniden işlenmez.
         """
         results = {}
         
         try:
-            doc = self.nlp(text)
+            if doc is None:
+                doc = self.nlp(text)
             
             # Named Entity Recognition
             for ent in doc.ents:
@@ -221,7 +397,7 @@ class AdvancedFieldExtractor:
                     if amount and 'total_amount' not in results:
                         results['total_amount'] = ExtractedField(
                             value=amount,
-                            confidence=0.7,
+                            confidence=NLP_FIELDS['total_amount'],
                             source_text=ent.text,
                             method="nlp-ner"
                         )
@@ -232,7 +408,7 @@ class AdvancedFieldExtractor:
                     if date_str and 'date' not in results:
                         results['date'] = ExtractedField(
                             value=date_str,
-                            confidence=0.75,
+                            confidence=NLP_FIELDS['date'],
                             source_text=ent.text,
                             method="nlp-ner"
                         )
@@ -242,26 +418,11 @@ class AdvancedFieldExtractor:
                     if 'company_name' not in results:
                         results['company_name'] = ExtractedField(
                             value=ent.text.strip(),
-                            confidence=0.6,
+                            confidence=NLP_FIELDS['company_name'],
                             source_text=ent.text,
                             method="nlp-ner"
                         )
             
-            # Token-based extraction
-            tokens = [token.text for token in doc]
-            
-            # IBAN detection
-            for i, token in enumerate(tokens):
-                if token.upper().startswith('TR') and len(token) >= 24:
-                    iban = self._validate_iban(token)
-                    if iban:
-                        results['iban'] = ExtractedField(
-                            value=iban,
-                            confidence=0.9,
-                            source_text=token,
-                            method="nlp-token"
-                        )
-            
         except Exception as e:
             logger.error(f"NLP extraction error: {e}")
         
@@ -296,31 +457,30 @@ class AdvancedFieldExtractor:
         
         return None
 
-    def _apply_special_rules(self, text: str) -> Dict[str, ExtractedField]:
+    def _apply_special_rules(self, text: str, scan: Optional[ScanResult] = None) -> Dict[str, ExtractedField]:
         """
         Özel kuralları uygula
         """
         results = {}
+        spans = scan.spans('total_amount_rule') if scan else None
         
         # Toplam tutar kuralları
-        total_patterns = [
-            r'(?:toplam|ödenecek).*?(\d+[.,]\d{2})',
-            r'(\d+[.,]\d{2})\s*(?:TL|₺)'
-        ]
-        
-        for pattern in total_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                amounts = [self._parse_turkish_number(m) for m in matches if self._parse_turkish_number(m)]
-                if amounts:
-                    # En büyük miktarı toplam olarak kabul et
-                    max_amount = max(amounts)
-                    results['total_amount_rule'] = ExtractedField(
-                        value=max_amount,
-                        confidence=0.8,
-                        source_text=f"Detected from multiple amounts: {amounts}",
-                        method="rule-based"
-                    )
+        for pattern in self.rule_patterns.patterns('total_amount_rule'):
+            amounts = []
+            for match in pattern.finditer(text, spans):
+                amount = self._parse_turkish_number(pattern.value(match))
+                if amount:
+                    amounts.append(amount)
+            
+            if amounts:
+                # En büyük miktarı toplam olarak kabul et
+                max_amount = max(amounts)
+                results['total_amount_rule'] = ExtractedField(
+                    value=max_amount,
+                    confidence=0.8,
+                    source_text=f"Detected from multiple amounts: {amounts}",
+                    method="rule-based"
+                )
         
         return results
 
@@ -333,23 +493,13 @@ class AdvancedFieldExtractor:
         try:
             lines = text.split('\n')
             
-            # Tablo formatını algıla
-            table_patterns = [
-                # Miktar Açıklama BirimFiyat Tutar
-                r'(\d+(?:[.,]\d+)?)\s+([A-Za-zçğıiöşü\s\-\.]+?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)',
-                # Açıklama Miktar BirimFiyat Tutar
-                r'([A-Za-zçğıiöşü\s\-\.]+?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)\s+(\d+(?:[.,]\d+)?)',
-                # Daha esnek pattern
-                r'(.+?)\s+(\d+[.,]?\d*)\s+(\d+[.,]?\d*)\s+(\d+[.,]?\d*)\s*(?:TL|₺)?'
-            ]
-            
             for line in lines:
                 line = line.strip()
                 if len(line) < 10:  # Çok kısa satırları atla
                     continue
                 
-                for pattern in table_patterns:
-                    match = re.search(pattern, line)
+                for pattern in self.line_item_patterns:
+                    match = pattern.search(line)
                     if match:
                         try:
                             groups = match.groups()
@@ -382,6 +532,274 @@ class AdvancedFieldExtractor:
         
         return items
 
+    def _extract_line_items_from_words(self, words: List[Dict]) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Fatura satır kalemlerini OCR kelime kutularından (geometri) çıkar
+
+        Kelimeler taban çizgisine göre satırlara kümelenir. Başlık satırı
+        (Açıklama / Miktar / Birim Fiyat / KDV / Tutar) bulunursa sütunlar
+        başlık hücrelerinden, bulunamazsa sayı hücrelerinin sağ kenarları
+        x ekseninde kümelenerek belirlenir. Her kelime sütun sınırlarına göre
+        tek seferde yerleştirildiği için maliyet kelime sayısıyla doğrusal
+        kalır (satır / sütun kümeleme için bir sıralama dışında).
+
+        Kalemler ve miktar x birim fiyat = tutar tutarlılığına göre bir güven
+        skoru döner.
+        """
+        items: List[Dict[str, Any]] = []
+        try:
+            rows = cluster_rows(words)
+            gap = median_height(words) * TABLE_COLUMN_GAP
+            
+            headers = [self._header_columns(row, gap) for row in rows]
+            if any(headers):
+                items = self._items_from_rows(rows, headers)
+            else:
+                # Başlık yok: sütunlar sayı hücrelerinden; sadece tutarlı satırlar kalem sayılır
+                columns = self._numeric_columns(rows, gap)
+                if columns:
+                    items = self._items_from_rows(rows, [None] * len(rows), columns)
+            
+        except Exception as e:
+            logger.error(f"Layout line items extraction error: {e}")
+            return [], 0.0
+        
+        if not items:
+            return items, 0.0
+        consistent = sum(1 for item in items if item['additional_data'].get('consistent'))
+        return items, round(0.6 + 0.35 * consistent / len(items), 3)
+
+    def _items_from_rows(self, rows: List[LayoutRow], headers: List[Optional[List[Tuple[str, int, int]]]],
+                         columns: Optional[List[Tuple[str, int, int]]] = None) -> List[Dict[str, Any]]:
+        """
+        Satırları sütunlara göre kalemlere çevir
+
+        Başlık satırı sütunları (yeniden) belirler; tablo ara / genel toplam
+        satırında biter, o satıra kadar sonraki sayfalarda aynı sütunlarla
+        devam eder. Başlığın sayfası dışında (devam sayfası veya hiç başlık
+        olmayan belge) sadece miktar x birim fiyat = tutar tutan satırlar
+        kalem sayılır.
+        """
+        items: List[Dict[str, Any]] = []
+        header_page, in_table, previous = None, columns is not None, None
+        boundaries = self._column_boundaries(columns) if columns else None
+        
+        for row, header in zip(rows, headers):
+            if header:
+                columns, boundaries = header, self._column_boundaries(header)
+                header_page, in_table, previous = row.page, True, None
+                continue
+            if not in_table:
+                continue
+            
+            # Başlığın sayfası dışındaki satırlar (devam sayfası / başlıksız belge)
+            strict = row.page != header_page
+            
+            cells = self._row_cells(row, columns, boundaries)
+            if self._is_summary_row(row, cells):
+                # Tablo toplam satırında biter; başlıksız belgede sadece satır atlanır
+                in_table = header_page is None
+                previous = None
+                continue
+            
+            item = self._line_item_from_cells(cells, row)
+            if item and (not strict or item['additional_data']['consistent']):
+                items.append(item)
+                previous = item
+            elif (previous and not strict and cells.get('description')
+                  and not any(value for role, value in cells.items() if role != 'description')
+                  and row.top - previous['additional_data']['bbox'][3] < 2 * (row.bottom - row.top)):
+                # Sayısız satır: önceki kalemin açıklamasının devamı
+                previous['description'] = f"{previous['description']} {cells['description']}".strip()
+        
+        return items
+
+    def _column_boundaries(self, columns: List[Tuple[str, int, int]]) -> np.ndarray:
+        """Komşu sütunlar arasındaki orta noktalar"""
+        return np.array([(left[2] + right[1]) / 2 for left, right in zip(columns, columns[1:])])
+
+    def _header_role(self, text: str) -> Optional[str]:
+        """Başlık hücresi metninden sütun türü"""
+        tokens = re.findall(r'[a-z%]+', text.translate(_FOLD).lower())
+        
+        def has(*prefixes):
+            return any(token.startswith(prefix) for token in tokens for prefix in prefixes)
+        
+        if has('kdv', 'vat') and has('tutar', 'amount'):
+            return 'vat_amount'
+        if has('kdv', 'vat', '%', 'oran'):
+            return 'vat_rate'
+        if has('fiyat', 'price'):
+            return 'unit_price'
+        if has('miktar', 'adet', 'qty', 'quantity'):
+            return 'quantity'
+        if has('tutar', 'toplam', 'total', 'amount', 'bedel'):
+            return 'total'
+        if has('aciklama', 'urun', 'mal', 'hizmet', 'malzeme', 'cins', 'tanim', 'description', 'item'):
+            return 'description'
+        if has('birim', 'unit'):
+            return 'unit'
+        return None
+
+    def _header_columns(self, row: LayoutRow, gap: float) -> Optional[List[Tuple[str, int, int]]]:
+        """Satır tablo başlığıysa (tür, sol, sağ) sütunları; değilse None"""
+        # Başlıkta sayı hücresi olmaz; kalem satırları hücre sınıflandırmasına girmez
+        if any(NUMERIC_TOKEN.match(word['text']) for word in row.words):
+            return None
+        
+        columns = []
+        for cell in split_cells(row, gap):
+            role = self._header_role(' '.join(word['text'] for word in cell))
+            left = min(word['left'] for word in cell)
+            right = max(word['left'] + word['width'] for word in cell)
+            columns.append((role or 'other', left, right))
+        
+        roles = {role for role, _, _ in columns}
+        if 'total' in roles and len(roles & {'description', 'quantity', 'unit_price', 'vat_rate'}) >= 2:
+            return columns
+        return None
+
+    def _numeric_columns(self, rows: List[LayoutRow], gap: float) -> Optional[List[Tuple[str, int, int]]]:
+        """
+        Başlıksız tablo: sayı hücrelerinin sağ kenarlarını kümeleyerek sütunları bul
+
+        En sağdaki sütun tutar; yüzde işaretli sütun KDV oranı; kalanlardan
+        çarpımı tutarı en iyi veren ikili miktar ve birim fiyat sayılır.
+        """
+        candidates = [
+            [word for word in row.words if NUMERIC_TOKEN.match(word['text'])]
+            for row in rows if not self._is_summary_row(row, {})
+        ]
+        candidates = [numbers for numbers in candidates if len(numbers) >= 3]
+        if not candidates:
+            return None
+        
+        numbers = [word for row_numbers in candidates for word in row_numbers]
+        labels = cluster_positions(np.array([word['left'] + word['width'] for word in numbers]), gap)
+        support = np.bincount(labels, minlength=labels.max() + 1)
+        
+        clusters = []
+        for label in range(len(support)):
+            if support[label] < min(2, len(candidates)):
+                continue
+            members = [word for word, member_label in zip(numbers, labels) if member_label == label]
+            clusters.append({
+                'left': min(word['left'] for word in members),
+                'right': max(word['left'] + word['width'] for word in members),
+                'percent': sum(1 for word in members if '%' in word['text']) / len(members),
+                'members': {id(word) for word in members}
+            })
+        if len(clusters) < 3:
+            return None
+        
+        roles = ['other'] * len(clusters)
+        roles[-1] = 'total'
+        for i, cluster in enumerate(clusters[:-1]):
+            if cluster['percent'] >= 0.5:
+                roles[i] = 'vat_rate'
+        
+        remaining = [i for i, role in enumerate(roles) if role == 'other']
+        if len(remaining) < 2:
+            return None
+        
+        # Miktar x birim fiyat = tutar olan sütun ikilisi
+        totals = self._column_values(candidates, clusters[-1])
+        best_pair, best_score = (remaining[0], remaining[-1]), -1
+        for a in range(len(remaining)):
+            for b in range(a + 1, len(remaining)):
+                quantities = self._column_values(candidates, clusters[remaining[a]])
+                prices = self._column_values(candidates, clusters[remaining[b]])
+                score = sum(1 for q, p, t in zip(quantities, prices, totals) if self._amounts_consistent(q, p, t))
+                if score > best_score:
+                    best_pair, best_score = (remaining[a], remaining[b]), score
+        roles[best_pair[0]], roles[best_pair[1]] = 'quantity', 'unit_price'
+        
+        columns = [('description', 0, clusters[0]['left'] - 1)]
+        columns += [(role, cluster['left'], cluster['right']) for role, cluster in zip(roles, clusters)]
+        return columns
+
+    def _column_values(self, candidates: List[List[Dict]], cluster: Dict) -> List[Optional[float]]:
+        values = []
+        for row_numbers in candidates:
+            text = next((word['text'] for word in row_numbers if id(word) in cluster['members']), None)
+            values.append(self._parse_turkish_number(text.strip('%')) if text else None)
+        return values
+
+    def _row_cells(self, row: LayoutRow, columns: List[Tuple[str, int, int]],
+                   boundaries: np.ndarray) -> Dict[str, str]:
+        """Satırdaki kelimeleri sütunlara yerleştir: tür -> hücre metni"""
+        cells: Dict[str, List[str]] = {}
+        for word, column in zip(row.words, assign_columns(row.words, boundaries)):
+            cells.setdefault(columns[column][0], []).append(word['text'])
+        return {role: ' '.join(texts) for role, texts in cells.items()}
+
+    def _is_summary_row(self, row: LayoutRow, cells: Dict[str, str]) -> bool:
+        """Ara toplam / genel toplam satırı (miktar ve birim fiyatı olmayan)"""
+        text = row.text.translate(_FOLD).lower()
+        if not any(word in text for word in SUMMARY_WORDS):
+            return False
+        return not (self._cell_number(cells.get('quantity')) and self._cell_number(cells.get('unit_price')))
+
+    def _cell_number(self, text: Optional[str], last: bool = True) -> Optional[float]:
+        """Hücredeki sayı (para birimi ve % ayıklanır); birden çok sayıdan son / ilki"""
+        if not text:
+            return None
+        numbers = [token for token in text.split()
+                   if token.lower() not in CURRENCY_TOKENS and NUMERIC_TOKEN.match(token)]
+        if not numbers:
+            return None
+        return self._parse_turkish_number((numbers[-1] if last else numbers[0]).strip('%'))
+
+    def _amounts_consistent(self, quantity: Optional[float], unit_price: Optional[float],
+                            total: Optional[float]) -> bool:
+        if quantity is None or unit_price is None or total is None:
+            return False
+        return abs(quantity * unit_price - total) <= max(0.02, total * 0.01)
+
+    def _line_item_from_cells(self, cells: Dict[str, str], row: LayoutRow) -> Optional[Dict[str, Any]]:
+        """Sütun hücrelerinden satır kalemi; tutar ve miktar / birim fiyattan biri yoksa None"""
+        quantity = self._cell_number(cells.get('quantity'), last=False)
+        unit_price = self._cell_number(cells.get('unit_price'))
+        total = self._cell_number(cells.get('total'))
+        
+        if not total or not (quantity or unit_price):
+            return None
+        
+        consistent = self._amounts_consistent(quantity, unit_price, total)
+        derived = None
+        if not quantity:
+            quantity, derived = round(total / unit_price, 3), 'quantity'
+        elif not unit_price:
+            unit_price, derived = round(total / quantity, 2), 'unit_price'
+        
+        # Birim: miktar hücresindeki sayı dışı kelime ("2 Adet") veya birim sütunu
+        unit_words = [token for token in (cells.get('quantity') or '').split() if not NUMERIC_TOKEN.match(token)]
+        unit = cells.get('unit') or ' '.join(unit_words) or 'adet'
+        
+        item = {
+            'description': (cells.get('description') or '').strip(),
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total': total,
+            'unit': unit.lower(),
+            'additional_data': {
+                'page': row.page,
+                'bbox': [row.left, row.top, row.right, row.bottom],
+                'consistent': consistent
+            }
+        }
+        
+        vat_rate = self._cell_number(cells.get('vat_rate'))
+        if vat_rate is not None and 0 <= vat_rate <= 100:
+            item['vat_rate'] = vat_rate
+        vat_amount = self._cell_number(cells.get('vat_amount'))
+        if vat_amount is not None:
+            item['additional_data']['vat_amount'] = vat_amount
+        if derived:
+            item['additional_data']['derived'] = derived
+        
+        return item
+
     def _post_process_field(self, field_name: str, value: str) -> Any:
         """
         Alan türüne göre post-processing
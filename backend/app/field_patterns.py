@@ -0,0 +1,344 @@
+import os
+import re
+import logging
+from bisect import bisect_right
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Alan pattern'lerinin varsayılan bayrakları
+DEFAULT_FLAGS = re.IGNORECASE | re.MULTILINE
+
+# Etiket taraması: değer pattern'leri etiketten itibaren bu kadar karakterlik pencerede aranır
+FIELD_SCAN_WINDOW = int(os.getenv("FIELD_SCAN_WINDOW", "160"))
+
+# Etiket listelerinde satır / metin başını temsil eder (etiketsiz, ^ / \A ile başlayan pattern'ler için)
+LINE_START = "^"
+TEXT_START = "\\A"
+
+Span = Tuple[int, int]
+
+_NEWLINE = re.compile(r"\n")
+
+# Derlenmiş pattern'ler (kaynak, bayrak) -> Pattern; iki çıkarıcıda ortak olanlar bir kez derlenir
+_compiled: Dict[Tuple[str, int], Pattern] = {}
+
+def compile_pattern(source: str, flags: int = DEFAULT_FLAGS) -> Pattern:
+    key = (source, flags)
+    if key not in _compiled:
+        _compiled[key] = re.compile(source, flags)
+    return _compiled[key]
+
+class FieldPattern:
+    """
+    Derlenmiş tek alan pattern'i
+
+    Değer, findall ile aynı şekilde yakalama grubundan (grup yoksa tüm
+    eşleşmeden) alınır; eşleşmeler listeye toplanmadan sırayla üretilir.
+    """
+
+    __slots__ = ("field", "index", "regex", "group")
+
+    def __init__(self, field: str, index: int, regex: Pattern, group: int):
+        self.field = field
+        self.index = index  # Alan içindeki sıra (önceki pattern daha güvenilir)
+        self.regex = regex
+        self.group = group
+
+    @property
+    def source(self) -> str:
+        return self.regex.pattern
+
+    def value(self, match: re.Match) -> str:
+        return match.group(self.group) or ""
+
+    def finditer(self, text: str, spans: Optional[Iterable[Span]] = None) -> Iterator[re.Match]:
+        """
+        Eşleşmeler; spans verilirse sadece bu aralıklarda başlayanlar (pos/endpos ile, ^ anlamı korunur)
+
+        Aralık sonuna dayanan eşleşme (değer pencerede kesilmiş olabilir) aynı
+        konumdan tüm metinde yeniden eşleştirilir. Aralıklarda hiç eşleşme
+        yoksa (değer etiketten pencereden uzakta) tüm metin taranır; böylece
+        sonuç, spans verilmeden yapılan taramayla aynı kalır.
+        """
+        if spans is None:
+            yield from self.regex.finditer(text)
+            return
+        found = False
+        for start, end in spans:
+            for match in self.regex.finditer(text, start, end):
+                if match.end() == end < len(text):
+                    match = self.regex.match(text, match.start()) or match
+                found = True
+                yield match
+        if not found:
+            yield from self.regex.finditer(text)
+
+    def first(self, text: str, predicate: Optional[Callable[[str], bool]] = None,
+              spans: Optional[Iterable[Span]] = None) -> Optional[re.Match]:
+        """Koşulu sağlayan ilk eşleşme; bulunduğunda tarama durur"""
+        for match in self.finditer(text, spans):
+            if predicate is None or predicate(self.value(match)):
+                return match
+        return None
+
+    def best(self, text: str, key: Callable[[str], int] = len,
+             spans: Optional[Iterable[Span]] = None) -> Optional[re.Match]:
+        """
+        key değeri en büyük eşleşme (eşitlikte ilk gelen)
+
+        Eşleşmeler akış halinde gezilir; sadece o ana kadarki en iyi tutulur.
+        """
+        best_match, best_key = None, None
+        for match in self.finditer(text, spans):
+            score = key(self.value(match))
+            if best_key is None or score > best_key:
+                best_match, best_key = match, score
+        return best_match
+
+class PatternRegistry:
+    """
+    Alan adı -> derlenmiş pattern listesi
+
+    Pattern'ler kayıt sırasında bir kez derlenir. Değer grubu olmayan
+    pattern'ler (require_group) kayda alınmaz; her çağrıda hata verip
+    atlanmak yerine yüklemede bir kez loglanır.
+    """
+
+    def __init__(self, patterns: Optional[Dict[str, List[str]]] = None, flags: int = DEFAULT_FLAGS,
+                 group: int = 1, require_group: bool = False):
+        self.flags = flags
+        self.group = group
+        self.require_group = require_group
+        self._fields: Dict[str, List[FieldPattern]] = {}
+        for field, sources in (patterns or {}).items():
+            self.register(field, sources)
+
+    def register(self, field: str, sources: List[str], flags: Optional[int] = None):
+        compiled = []
+        for index, source in enumerate(sources):
+            try:
+                regex = compile_pattern(source, self.flags if flags is None else flags)
+            except re.error as e:
+                logger.warning(f"Pattern {source} for {field} could not be compiled: {e}")
+                continue
+
+            if regex.groups >= self.group:
+                group = self.group
+            elif self.require_group:
+                logger.debug(f"Pattern {source} for {field} has no capture group {self.group}, skipped")
+                continue
+            else:
+                group = 0
+            compiled.append(FieldPattern(field, index, regex, group))
+        self._fields[field] = compiled
+
+    def fields(self) -> List[str]:
+        return list(self._fields)
+
+    def patterns(self, field: str) -> List[FieldPattern]:
+        return self._fields.get(field, [])
+
+    def iter_matches(self, field: str, text: str) -> Iterator[Tuple[FieldPattern, re.Match]]:
+        """Alanın pattern'lerini sırayla, eşleşmeleri tembel olarak üret"""
+        for pattern in self.patterns(field):
+            for match in pattern.finditer(text):
+                yield pattern, match
+
+    def first(self, field: str, text: str,
+              predicate: Optional[Callable[[str], bool]] = None) -> Optional[Tuple[FieldPattern, re.Match]]:
+        """Pattern sırasına göre koşulu sağlayan ilk eşleşme"""
+        for pattern in self.patterns(field):
+            match = pattern.first(text, predicate)
+            if match is not None:
+                return pattern, match
+        return None
+
+class ScanResult:
+    """Bir metnin etiket taraması: alan -> değer aranacak birleştirilmiş aralıklar"""
+
+    def __init__(self, spans: Dict[str, List[Span]], labelled: FrozenSet[str]):
+        self._spans = spans
+        self._labelled = labelled
+
+    def spans(self, field: str) -> Optional[List[Span]]:
+        """Alanın aralıkları; etiketi tanımlı olmayan alan için None (tüm metin)"""
+        if field not in self._labelled:
+            return None
+        return self._spans.get(field, [])
+
+def _keyword_regex(keywords: Iterable[str]) -> str:
+    """
+    Anahtar kelimelerden ortak önekleri birleştirilmiş (trie) alternasyon
+
+    Düz "a|b|c" alternasyonunda her konumda bütün kelimeler tek tek denenir;
+    trie biçiminde ilk karakter uymayan dallar hemen elenir. Uzun kelime
+    tercih edilir (vergisiz > vergi).
+    """
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return body + "?" if len(branches) == 1 and len(body) == 1 else "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+class FieldScanner:
+    """
+    Tek geçişte çok alanlı etiket taraması
+
+    Tüm alanların etiket kelimeleri tek bir birleşik alternasyonda (sıfır
+    genişlikli lookahead, böylece iç içe geçen etiketler de bulunur) metin
+    üzerinde bir kez taranır. Değer pattern'leri sonra sadece etiket
+    konumlarından başlayan pencerelerde çalışır; çakışan pencereler
+    birleştirildiği için her karakter bir pattern tarafından en fazla bir kez
+    gezilir ve maliyet metin uzunluğuyla doğrusal kalır.
+
+    Değeri etiketten önce gelen alanlar (ör. "250,00 TL") için lookbehind ile
+    pencere etiketin gerisinden başlatılır.
+    """
+
+    def __init__(self, labels: Dict[str, List[str]], window: int = FIELD_SCAN_WINDOW,
+                 lookbehind: Optional[Dict[str, int]] = None):
+        self.window = window
+        self.lookbehind = lookbehind or {}
+        self.labelled = frozenset(labels)
+
+        keyword_fields: Dict[str, Set[str]] = {}
+        line_fields: Set[str] = set()
+        start_fields: Set[str] = set()
+        for field, keywords in labels.items():
+            for keyword in keywords:
+                if keyword == LINE_START:
+                    line_fields.add(field)
+                elif keyword == TEXT_START:
+                    start_fields.add(field)
+                else:
+                    keyword_fields.setdefault(keyword.lower(), set()).add(field)
+        self.line_fields = frozenset(line_fields)
+        self.start_fields = frozenset(start_fields - line_fields)
+
+        # Bir konumda en uzun etiket raporlanır; önek etiketlerin alanları da eklenir
+        self._keyword_fields: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset().union(*(fields for other, fields in keyword_fields.items()
+                                         if keyword.startswith(other)))
+            for keyword in keyword_fields
+        }
+        source = "(?=(" + _keyword_regex(keyword_fields) + "))"
+        self._regex = re.compile(source, re.IGNORECASE)
+        self._lower_regex = re.compile(source)
+
+    def scan(self, text: str) -> ScanResult:
+        hits: Dict[str, List[int]] = {}
+
+        # Küçük harfe çevrilmiş metinde büyük/küçük harf duyarsız aramadan birkaç kat hızlı;
+        # uzunluğu değişen metinlerde (İ -> i̇) konumlar kaymasın diye IGNORECASE kullanılır
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self._lower_regex.finditer(lowered)
+        else:
+            matches = self._regex.finditer(text)
+
+        for match in matches:
+            fields = self._keyword_fields.get(match.group(1).lower(), ())
+            for field in fields:
+                hits.setdefault(field, []).append(match.start())
+
+        if self.line_fields:
+            line_starts = [0] + [match.end() for match in _NEWLINE.finditer(text)]
+            for field in self.line_fields:
+                hits[field] = sorted(hits.get(field, []) + line_starts)
+        for field in self.start_fields:
+            if not hits.get(field) or hits[field][0] != 0:
+                hits[field] = [0] + hits.get(field, [])
+
+        spans = {field: self._merge(positions, self.lookbehind.get(field, 0), len(text))
+                 for field, positions in hits.items()}
+        return ScanResult(spans, self.labelled)
+
+    def _merge(self, positions: List[int], before: int, length: int) -> List[Span]:
+        spans: List[Span] = []
+        for position in positions:
+            start = max(position - before, 0)
+            end = min(position + self.window, length)
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return spans
+
+class LineIndex:
+    """
+    Bir metnin satır indeksi: anahtar kelime -> geçtiği satır numaraları
+
+    İlk sorguda metin bir kez satırlara bölünür, anahtar kelimeler tek
+    geçişte bulunur ve satır numaralarına çevrilir. Aynı belgede birden çok
+    alan aynı indeksi kullanır; komşu satır pencereleri de bir kez
+    birleştirilir. Hiç sorgulanmayan indeks maliyet getirmez.
+    """
+
+    def __init__(self, indexer: "LineIndexer", text: str):
+        self._indexer = indexer
+        self._text = text
+        self._lines: Optional[List[str]] = None
+        self._keyword_lines: Dict[str, List[int]] = {}
+        self._windows: Dict[Tuple[int, int, int], str] = {}
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self._text.split('\n')
+            self._keyword_lines = self._indexer.keyword_lines(self._text)
+        return self._lines
+
+    def lines_with(self, keywords: Iterable[str]) -> List[int]:
+        """Anahtar kelimelerden en az birini (büyük/küçük harf duyarsız) içeren satırlar, sırayla"""
+        self.lines
+        found: Set[int] = set()
+        for keyword in keywords:
+            found.update(self._keyword_lines.get(keyword.lower(), ()))
+        return sorted(found)
+
+    def window(self, line: int, before: int = 1, after: int = 2) -> str:
+        """Satır ve komşuları, boşlukla birleştirilmiş"""
+        key = (line, before, after)
+        if key not in self._windows:
+            lines = self.lines
+            self._windows[key] = ' '.join(lines[max(0, line - before):min(len(lines), line + after + 1)])
+        return self._windows[key]
+
+class LineIndexer:
+    """Sabit bir anahtar kelime kümesi için LineIndex üretir (alternasyon bir kez derlenir)"""
+
+    def __init__(self, keywords: Iterable[str]):
+        keywords = {keyword.lower() for keyword in keywords}
+        # Bulunan (en uzun) kelime, önek kelimeleri de içerir: "try" satırı "tr" için de sayılır
+        self._prefixes = {keyword: [other for other in keywords if keyword.startswith(other)]
+                          for keyword in keywords}
+        self._regex = re.compile("(?=(" + _keyword_regex(keywords) + "))")
+
+    def index(self, text: str) -> LineIndex:
+        return LineIndex(self, text)
+
+    def keyword_lines(self, text: str) -> Dict[str, List[int]]:
+        lowered = text.lower()
+        line_starts = [0] + [match.end() for match in _NEWLINE.finditer(lowered)]
+
+        keyword_lines: Dict[str, List[int]] = {}
+        for match in self._regex.finditer(lowered):
+            line = bisect_right(line_starts, match.start()) - 1
+            for keyword in self._prefixes[match.group(1)]:
+                lines = keyword_lines.setdefault(keyword, [])
+                if not lines or lines[-1] != line:
+                    lines.append(line)
+        return keyword_lines
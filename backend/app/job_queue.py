@@ -0,0 +1,386 @@
+import os
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, or_, func, insert
+from sqlalchemy.orm import Session
+
+from models import QueuedJob, JobStatus
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Kuyruk konfigürasyonu
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))  # saniye
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "10"))  # saniye, deneme başına artar
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", (os.cpu_count() or 1) * 2))
+
+@dataclass
+class LeasedJob:
+    id: int
+    kind: str
+    invoice_id: Optional[int]
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+    lease_token: str
+
+class JobQueue:
+    """
+    Veritabanı tablosu üzerinde kalıcı iş kuyruğu
+
+    İşler `job_queue` tablosunda tutulur ve `SELECT ... FOR UPDATE SKIP LOCKED`
+    ile kiralanır (lease). Kiralanan iş görünürlük süresi içinde onaylanmazsa
+    tekrar kuyruğa düşer; deneme hakkı biten işler `dead` durumuna alınır.
+    """
+
+    def __init__(self, session_factory=SessionLocal, visibility_timeout: int = JOB_VISIBILITY_TIMEOUT):
+        self.session_factory = session_factory
+        self.visibility_timeout = visibility_timeout
+        self.on_dead: Optional[Callable[[LeasedJob, str], None]] = None
+
+    def enqueue(self, db: Session, kind: str, invoice_id: Optional[int] = None,
+                payload: Optional[Dict[str, Any]] = None,
+                max_attempts: int = JOB_MAX_ATTEMPTS) -> QueuedJob:
+        """
+        İşi kuyruğa ekle. Commit çağırana bırakılır; böylece iş, onu üreten
+        kayıtla aynı transaction içinde yazılır.
+        """
+        job = QueuedJob(
+            kind=kind,
+            invoice_id=invoice_id,
+            payload=payload or {},
+            status=JobStatus.QUEUED,
+            attempts=0,
+            max_attempts=max_attempts,
+            available_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.flush()
+        return job
+
+    def enqueue_many(self, db: Session, kind: str, items: List[Dict[str, Any]],
+                     max_attempts: int = JOB_MAX_ATTEMPTS) -> List[int]:
+        """
+        Birden çok işi tek INSERT ile kuyruğa ekle; her öğe `invoice_id` ve
+        `payload` içerir. İş id'leri öğelerle aynı sırada döner.
+        """
+        if not items:
+            return []
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                "kind": kind,
+                "invoice_id": item.get("invoice_id"),
+                "payload": item.get("payload") or {},
+                "status": JobStatus.QUEUED,
+                "attempts": 0,
+                "max_attempts": max_attempts,
+                "available_at": now,
+                "created_at": now,
+                "updated_at": now
+            }
+            for item in items
+        ]
+        result = db.execute(
+            insert(QueuedJob).returning(QueuedJob.id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(result.scalars())
+
+    def lease(self, worker_id: str, limit: int = 1, kinds: Optional[List[str]] = None) -> List[LeasedJob]:
+        """
+        Hazır işleri (ve süresi dolmuş kiraları) bu worker adına kirala
+        """
+        if limit <= 0:
+            return []
+
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            query = db.query(QueuedJob).filter(
+                or_(
+                    and_(QueuedJob.status == JobStatus.QUEUED, QueuedJob.available_at <= now),
+                    and_(QueuedJob.status == JobStatus.RUNNING, QueuedJob.lease_expires_at < now)
+                )
+            )
+            if kinds:
+                query = query.filter(QueuedJob.kind.in_(kinds))
+
+            rows = (
+                query.order_by(QueuedJob.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+
+            leased, dead = [], []
+            for row in rows:
+                if row.status == JobStatus.RUNNING:
+                    logger.warning(f"Job {row.id} lease expired (owner {row.lease_owner})")
+                    if row.attempts >= row.max_attempts:
+                        dead.append(self._to_lease(row))
+                        row.status = JobStatus.DEAD
+                        row.last_error = row.last_error or "Lease expired"
+                        row.lease_token = None
+                        row.finished_at = now
+                        continue
+
+                row.status = JobStatus.RUNNING
+                row.attempts += 1
+                row.lease_owner = worker_id
+                row.lease_token = str(uuid.uuid4())
+                row.lease_expires_at = now + timedelta(seconds=self.visibility_timeout)
+                leased.append(self._to_lease(row))
+
+            db.commit()
+
+            for job in dead:
+                self._dead_letter(job, "Lease expired")
+            return leased
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def extend(self, leases: List[LeasedJob]):
+        """Çalışmaya devam eden işlerin kiralarını uzat (heartbeat)"""
+        if not leases:
+            return
+
+        expires_at = datetime.utcnow() + timedelta(seconds=self.visibility_timeout)
+        db = self.session_factory()
+        try:
+            for lease in leases:
+                db.query(QueuedJob).filter(
+                    QueuedJob.id == lease.id,
+                    QueuedJob.lease_token == lease.lease_token
+                ).update({QueuedJob.lease_expires_at: expires_at}, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def complete(self, lease: LeasedJob) -> bool:
+        """İşi başarılı olarak onayla"""
+        return self._finish(lease, {
+            QueuedJob.status: JobStatus.DONE,
+            QueuedJob.finished_at: datetime.utcnow(),
+            QueuedJob.lease_token: None,
+            QueuedJob.lease_expires_at: None
+        })
+
+    def fail(self, lease: LeasedJob, error: str) -> JobStatus:
+        """
+        Başarısız denemeyi kaydet: deneme hakkı varsa geri kuyruğa, yoksa dead-letter
+        """
+        now = datetime.utcnow()
+        if lease.attempts >= lease.max_attempts:
+            status = JobStatus.DEAD
+            values = {QueuedJob.finished_at: now}
+        else:
+            status = JobStatus.QUEUED
+            values = {QueuedJob.available_at: now + timedelta(seconds=JOB_RETRY_BACKOFF * lease.attempts)}
+
+        values.update({
+            QueuedJob.status: status,
+            QueuedJob.last_error: error[:2000],
+            QueuedJob.lease_token: None,
+            QueuedJob.lease_expires_at: None
+        })
+        if self._finish(lease, values) and status == JobStatus.DEAD:
+            self._dead_letter(lease, error)
+        return status
+
+    def find_active(self, db: Session, kind: str, invoice_id: int) -> Optional[QueuedJob]:
+        """Fatura için kuyrukta bekleyen veya çalışan iş (yeniden denemeyi bekleyenler dahil)"""
+        return (
+            db.query(QueuedJob)
+            .filter(
+                QueuedJob.kind == kind,
+                QueuedJob.invoice_id == invoice_id,
+                QueuedJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING])
+            )
+            .order_by(QueuedJob.id.desc())
+            .first()
+        )
+
+    def get(self, db: Session, job_id: int) -> Optional[QueuedJob]:
+        return db.query(QueuedJob).filter(QueuedJob.id == job_id).first()
+
+    def stats(self, db: Session) -> Dict[str, int]:
+        """Durum bazında iş sayıları"""
+        counts = {status.value: 0 for status in JobStatus}
+        rows = db.query(QueuedJob.status, func.count(QueuedJob.id)).group_by(QueuedJob.status).all()
+        for status, count in rows:
+            counts[status] = count
+        return counts
+
+    def _to_lease(self, row: QueuedJob) -> LeasedJob:
+        return LeasedJob(
+            id=row.id,
+            kind=row.kind,
+            invoice_id=row.invoice_id,
+            payload=dict(row.payload or {}),
+            attempts=row.attempts,
+            max_attempts=row.max_attempts,
+            lease_token=row.lease_token
+        )
+
+    def _dead_letter(self, lease: LeasedJob, job_error: str):
+        logger.error(f"Job {lease.id} ({lease.kind}) moved to dead-letter after {lease.attempts} attempts")
+        if self.on_dead:
+            try:
+                self.on_dead(lease, job_error)
+            except Exception as e:
+                logger.error(f"Dead-letter handler failed for job {lease.id}: {e}")
+
+    def _finish(self, lease: LeasedJob, values: Dict) -> bool:
+        db = self.session_factory()
+        try:
+            # Kira başka bir worker'a geçtiyse (timeout) sonucu yazma
+            updated = db.query(QueuedJob).filter(
+                QueuedJob.id == lease.id,
+                QueuedJob.lease_token == lease.lease_token
+            ).update(values, synchronize_session=False)
+            db.commit()
+
+            if not updated:
+                logger.warning(f"Job {lease.id} lease lost before acknowledgement")
+            return bool(updated)
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+class QueueWorker:
+    """
+    Kuyruktan iş çeken worker
+
+    Her backend node'unda (ve her uvicorn process'inde) bir tane çalışır.
+    Kiralanan işler `kind` değerine göre kayıtlı handler'lara dağıtılır;
+    handler hata fırlatırsa iş yeniden denenir.
+    """
+
+    def __init__(self, queue: JobQueue, concurrency: int = JOB_WORKER_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._handlers: Dict[str, Callable[[LeasedJob], None]] = {}
+        self._inflight: Dict[int, LeasedJob] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def register(self, kind: str, handler: Callable[[LeasedJob], None]):
+        """İş türü için handler kaydet"""
+        self._handlers[kind] = handler
+
+    def notify(self):
+        """Yeni iş eklendiğinde poll aralığını beklemeden uyan"""
+        self._wakeup.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-worker")
+        self._thread = threading.Thread(target=self._run, name="job-queue-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"Queue worker {self.worker_id} started (concurrency={self.concurrency})")
+
+    def stop(self, wait: bool = True):
+        """Yeni iş almayı durdur; çalışan işler bitince kapan"""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "inflight": len(self._inflight)
+        }
+
+    def _run(self):
+        last_heartbeat = datetime.utcnow()
+        heartbeat_every = max(1, self.queue.visibility_timeout // 3)
+
+        while not self._stop.is_set():
+            try:
+                with self._lock:
+                    free_slots = self.concurrency - len(self._inflight)
+
+                leases = self.queue.lease(self.worker_id, limit=free_slots, kinds=list(self._handlers))
+                for lease in leases:
+                    with self._lock:
+                        self._inflight[lease.id] = lease
+                    self._executor.submit(self._execute, lease)
+
+                if (datetime.utcnow() - last_heartbeat).total_seconds() >= heartbeat_every:
+                    with self._lock:
+                        inflight = list(self._inflight.values())
+                    self.queue.extend(inflight)
+                    last_heartbeat = datetime.utcnow()
+
+                if leases and len(leases) == free_slots:
+                    continue  # Kuyrukta iş olabilir, hemen tekrar dene
+
+            except Exception as e:
+                logger.error(f"Queue poll error: {e}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _execute(self, lease: LeasedJob):
+        try:
+            handler = self._handlers[lease.kind]
+            logger.info(f"Job {lease.id} ({lease.kind}) attempt {lease.attempts}/{lease.max_attempts}")
+            handler(lease)
+            self.queue.complete(lease)
+
+        except Exception as e:
+            logger.error(f"Job {lease.id} ({lease.kind}) failed: {e}")
+            try:
+                self.queue.fail(lease, str(e))
+            except Exception as ack_error:
+                logger.error(f"Job {lease.id} failure could not be recorded: {ack_error}")
+
+        finally:
+            with self._lock:
+                self._inflight.pop(lease.id, None)
+            # Boşalan slot için yeni iş çek
+            self._wakeup.set()
+
+# Global queue instances
+job_queue = JobQueue()
+queue_worker = QueueWorker(job_queue)
@@ -0,0 +1,804 @@
+import os
+import time
+import uuid
+import pickle
+import functools
+import random
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future, InvalidStateError
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import multiprocessing
+
+from models import JobStatus
+from ocr_cache import ocr_cache, OCRResultCache
+from storage import artifact_path
+from ocr_backends import ocr_backends, supports_pages, OCR_SHADOW_BACKEND, OCR_SHADOW_SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# İş motoru konfigürasyonu
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+OCR_MP_START_METHOD = os.getenv("OCR_MP_START_METHOD", "spawn")
+OCR_PERSIST_THREADS = int(os.getenv("OCR_PERSIST_THREADS", "2"))
+OCR_JOB_HISTORY = int(os.getenv("OCR_JOB_HISTORY", "1000"))
+OCR_JOB_TIMEOUT = float(os.getenv("OCR_JOB_TIMEOUT", "600"))  # saniye, 0 = sınırsız
+
+# Alan ayrıştırma mikro-batch'i: OCR'ı biten batch upload belgeleri en fazla bu kadar
+# beklenerek tek worker adımında (tek nlp.pipe çağrısı) ayrıştırılır
+OCR_EXTRACTION_BATCH_SIZE = int(os.getenv("OCR_EXTRACTION_BATCH_SIZE", "16"))
+OCR_EXTRACTION_BATCH_WAIT_MS = float(os.getenv("OCR_EXTRACTION_BATCH_WAIT_MS", "200"))
+
+# Worker'ın belgeyi bölerken bulduğu taranmış sayfa bildirimi (ana process sayfayı hemen dağıtır)
+PAGE_PENDING = "page_pending"
+
+@dataclass
+class DocumentPages:
+    """Sayfalara dağıtılan belgenin durumu (bölme sonucu ve biten sayfalar)"""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    dispatched: Set[int] = field(default_factory=set)
+    results: List[Any] = field(default_factory=list)
+    split: Optional[Dict[str, Any]] = None  # run_document_job sonucu: pages, pending, lang, timings
+    assembled: bool = False
+
+@dataclass
+class OCRJob:
+    id: str
+    invoice_id: int
+    file_path: str
+    file_type: str
+    status: JobStatus = JobStatus.QUEUED
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    cache_key: Optional[str] = None
+    cache_hit: bool = False
+    batch_id: Optional[str] = None
+    backend: Optional[str] = None  # OCR motoru (ocr_backends kaydındaki ad)
+    tax_number: Optional[str] = None  # OCR'dan önce bilinen tedarikçi vergi numarası (dil kararı için)
+    future: Optional[Future] = field(default=None, repr=False)
+    document: Optional[DocumentPages] = field(default=None, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """İş (sonucun kaydedilmesi dahil) bitene kadar bekle"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "invoice_id": self.invoice_id,
+            "status": self.status.value,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+            "cache_hit": self.cache_hit,
+            "backend": self.backend
+        }
+
+# Worker process'ten ana process'e aşama bildirimleri
+_progress_queue = None
+_current_job_id: Optional[str] = None
+
+def _init_worker(progress_queue=None):
+    """
+    Worker process başlangıcı - OCR motoru ve extractor bir kez yüklenir
+    """
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    import ocr
+    import field_extractor  # noqa: F401
+
+    ocr.ocr_engine.on_stage = report_stage
+    ocr.ocr_engine.tesseract.warm_up(ocr.ocr_engine.tesseract_config)
+
+def report_stage(stage: str):
+    """Çalışan işin aşamasını ana process'e bildir (bloklamaz)"""
+    if _progress_queue is not None and _current_job_id is not None:
+        try:
+            _progress_queue.put_nowait((_current_job_id, stage))
+        except Exception:
+            pass
+
+def report_page(page: int, lang: Optional[str]):
+    """Bölme sürerken bulunan taranmış sayfayı ana process'e bildir (bloklamaz)"""
+    if _progress_queue is not None and _current_job_id is not None:
+        try:
+            _progress_queue.put_nowait((_current_job_id, PAGE_PENDING, page, lang))
+        except Exception:
+            pass  # Bölme sonucu dönünce sayfa yine dağıtılır
+
+class WorkerError(Exception):
+    """Worker process'te oluşan ve ana process'e olduğu gibi taşınamayan hata"""
+
+def _portable_errors(func):
+    """
+    Worker fonksiyonunun hatasını ana process'e taşınabilir hale getir
+
+    Unpickle edilemeyen bir istisna (ör. argümansız __init__ tanımlayan
+    pytesseract.TesseractNotFoundError) process pool'u bozar ve sonraki tüm
+    işler başarısız olur; böyle hatalar mesajı korunarak WorkerError'a çevrilir.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not _is_picklable(e):
+                raise WorkerError(f"{type(e).__name__}: {e}") from None
+            raise
+    return wrapper
+
+def _is_picklable(error: Exception) -> bool:
+    try:
+        pickle.loads(pickle.dumps(error))
+        return True
+    except Exception:
+        return False
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+def _page_artifact_path(engine, file_path: str, page: int) -> Optional[str]:
+    """Sayfanın ön işlenmiş görüntüsünün yolu (motorun mevcut ön işleme konfigürasyonu için)"""
+    from ocr import OCR_STORE_ARTIFACTS
+
+    if not OCR_STORE_ARTIFACTS or not hasattr(engine, 'artifact_key'):
+        return None
+    return artifact_path(file_path, engine.artifact_key(), page)
+
+@_portable_errors
+def run_document_job(file_path: str, file_type: str, job_id: Optional[str] = None,
+                     backend: Optional[str] = None, tax_number: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Worker process içinde çalışır: belgeyi sayfalara ayırır
+
+    OCR gereken sayfa sayısı en fazla bir ise (veya motor sayfa bazında
+    çalışmıyorsa) OCR burada tamamlanır ve {"ocr_result", "timings"} döner
+    (alanlar ana process'in topladığı ayrıştırma batch'inde çıkarılır); aksi halde metin katmanından okunan sayfalar, OCR
+    bekleyen sayfa numaraları ve belge için seçilen dil paketi döner
+    ({"pages", "pending", "lang"}) ve sayfalar pool'a dağıtılır. PDF'lerde
+    taranmış sayfa bulunduğu anda ana process'e bildirilir; sayfanın OCR'ı
+    kalan sayfaların metin katmanı okunurken başlar. Dil, ilk taranmış
+    sayfada o ana kadar okunan metinden (veya tax_number ile bilinen
+    tedarikçinin kayıtlı kararından) seçilir. Hatalar yakalanmaz; iş
+    başarısız olur ve kuyrukta yeniden denenir.
+    """
+    global _current_job_id
+    engine = ocr_backends.get(backend)
+
+    _current_job_id = job_id
+    file_content = _read_file(file_path)
+
+    if not supports_pages(engine):
+        started = time.perf_counter()
+        ocr_result = engine.process_document(file_content, file_type)
+        return {"ocr_result": ocr_result, "timings": {"ocr_ms": _elapsed_ms(started)}}
+
+    started = time.perf_counter()
+    language: List[str] = []
+    reported = _progress_queue is not None and job_id is not None
+
+    def on_pending(page: int, read: List[Any]):
+        if not language:
+            language.append(engine.detect_language(
+                file_content, file_type, read, [page], _page_artifact_path(engine, file_path, page), tax_number
+            )[0])
+        if reported:
+            report_page(page, language[0])
+
+    pages, pending = engine.split_pages(file_content, file_type, on_pending=on_pending)
+    if language:
+        lang = language[0]
+    else:
+        lang, _ = engine.detect_language(
+            file_content, file_type, pages, pending,
+            _page_artifact_path(engine, file_path, pending[0]) if pending else None, tax_number
+        )
+    timings = {"split_ms": _elapsed_ms(started)}
+
+    # Bildirilen sayfalar ana process'te zaten dağıtılıyor
+    if len(pending) > 1 or (language and reported):
+        return {"pages": pages, "pending": pending, "lang": lang, "timings": timings}
+
+    pages += [
+        engine.process_page(file_content, file_type, page, _page_artifact_path(engine, file_path, page), lang)
+        for page in pending
+    ]
+    return {"ocr_result": engine.assemble(pages), "timings": timings}
+
+@_portable_errors
+def run_page_job(file_path: str, file_type: str, page: int, job_id: Optional[str] = None,
+                 lang: Optional[str] = None, backend: Optional[str] = None):
+    """
+    Worker process içinde çalışır: tek sayfayı ön işler ve OCR yapar
+    """
+    global _current_job_id
+    engine = ocr_backends.get(backend)
+
+    _current_job_id = job_id
+    return engine.process_page(_read_file(file_path), file_type, page,
+                               _page_artifact_path(engine, file_path, page), lang)
+
+@_portable_errors
+def run_assembly_job(pages: List[Any], job_id: Optional[str] = None, backend: Optional[str] = None,
+                     timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Worker process içinde çalışır: sayfaları sırayla birleştirir
+    """
+    engine = ocr_backends.get(backend)
+    return {"ocr_result": engine.assemble(pages), "timings": timings}
+
+def run_extraction_job(ocr_result, job_id: Optional[str] = None,
+                       timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """
+    Tek belgenin alanlarını ayrıştır (gölge mod karşılaştırması için)
+    """
+    global _current_job_id
+    from field_extractor import field_extractor
+
+    _current_job_id = job_id
+    report_stage('extraction')
+
+    started = time.perf_counter()
+    extracted_fields = field_extractor.extract_all_fields(ocr_result.raw_text, getattr(ocr_result, 'words', None))
+    return extraction_result(ocr_result, extracted_fields, timings, _elapsed_ms(started))
+
+@_portable_errors
+def run_extraction_batch(documents: List[Tuple[str, Optional[List[Dict]]]],
+                         job_ids: List[Optional[str]]) -> List[Dict[str, Any]]:
+    """
+    Worker process içinde çalışır: birden çok belgenin alanlarını ayrıştırır
+
+    Belgeler (raw_text, words) olarak gelir; OCR sonucunun geri kalanı ana
+    process'te kalır. NER gereken belgeler tek nlp.pipe çağrısında işlenir.
+    Belge başına {"extracted_fields", "extraction_ms"} döner; süre batch
+    süresinin belge başına payıdır.
+    """
+    global _current_job_id
+    from field_extractor import field_extractor
+
+    for job_id in job_ids:
+        _current_job_id = job_id
+        report_stage('extraction')
+
+    started = time.perf_counter()
+    extracted = field_extractor.extract_batch([text for text, _ in documents], [words for _, words in documents])
+    share = round(_elapsed_ms(started) / max(1, len(documents)), 1)
+    return [{"extracted_fields": fields, "extraction_ms": share} for fields in extracted]
+
+def extraction_result(ocr_result, extracted_fields: Dict[str, Any], timings: Optional[Dict[str, float]],
+                      extraction_ms: float) -> Dict[str, Any]:
+    """
+    İş sonucu: {"ocr_result", "extracted_fields", "timings"}
+
+    Aşama süreleri de döner: sayfa sonucu veren motorlarda OCR süresi
+    bölme / dil tespiti ile sayfa sürelerinin toplamıdır (iş süresi; kuyruk
+    beklemesi dahil değil), diğerlerinde verilen ocr_ms kullanılır.
+    """
+    timings = {**_stage_timings(ocr_result, timings), "extraction_ms": extraction_ms}
+    timings["total_ms"] = round(sum(timings.get(key, 0.0) for key in ("ocr_ms", "extraction_ms")), 1)
+
+    return {
+        "ocr_result": ocr_result,
+        "extracted_fields": extracted_fields,
+        "timings": timings
+    }
+
+@_portable_errors
+def run_shadow_job(backend: str, file_path: str, file_type: str) -> Dict[str, Any]:
+    """
+    Worker process içinde çalışır: aday motoru belgenin tamamında çalıştırır (gölge mod)
+
+    Sonuç faturaya yazılmaz; sadece ana motorla karşılaştırılır.
+    """
+    engine = ocr_backends.get(backend)
+
+    started = time.perf_counter()
+    ocr_result = engine.process_document(_read_file(file_path), file_type)
+    return run_extraction_job(ocr_result, timings={"ocr_ms": _elapsed_ms(started)})
+
+def _stage_timings(ocr_result, timings: Optional[Dict[str, float]]) -> Dict[str, float]:
+    timings = dict(timings or {})
+    pages = getattr(ocr_result, 'pages', None) or []
+    if pages:
+        # Saklanmış görüntüsü kullanılan sayfada ön işleme yapılmadı
+        preprocessing = [page.get('preprocessing') or {} for page in pages]
+        timings["preprocessing_ms"] = round(
+            sum(info.get('elapsed_ms', 0.0) for info in preprocessing if not info.get('reused')), 1
+        )
+        timings["ocr_ms"] = round(timings.get("split_ms", 0.0) + sum(page.get('elapsed_ms', 0.0) for page in pages), 1)
+    return timings
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def is_cacheable(ocr_result) -> bool:
+    """Hatalı veya boş OCR sonuçları cache'e yazılmaz"""
+    return getattr(ocr_result, 'error', None) is None and ocr_result.confidence > 0
+
+class OCRJobEngine:
+    """
+    Process pool tabanlı OCR iş motoru
+
+    OCR işleri CPU-bound olduğu için ayrı process'lerde çalışır; sonuçların
+    veritabanına yazılması küçük bir thread pool'da yapılır. Böylece event
+    loop hiçbir zaman OCR veya DB işlemi için bloklanmaz.
+    """
+
+    def __init__(self, max_workers: int = OCR_WORKERS, start_method: str = OCR_MP_START_METHOD,
+                 cache: Optional[OCRResultCache] = ocr_cache, shadow_backend: str = OCR_SHADOW_BACKEND,
+                 shadow_sample_rate: float = OCR_SHADOW_SAMPLE_RATE):
+        self.max_workers = max(1, max_workers)
+        self.start_method = start_method
+        self.cache = cache
+        self.on_complete: Optional[Callable[[OCRJob, Dict[str, Any]], None]] = None
+        self.on_progress: Optional[Callable[[OCRJob, str], None]] = None
+
+        # Gölge mod: on_shadow(job, ana sonuç, aday sonuç) persist pool'da çağrılır
+        self.shadow_backend = shadow_backend
+        self.shadow_sample_rate = shadow_sample_rate
+        self.on_shadow: Optional[Callable[[OCRJob, Dict[str, Any], Dict[str, Any]], None]] = None
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._progress_thread: Optional[threading.Thread] = None
+        self._persist_pool: Optional[ThreadPoolExecutor] = None
+        self._jobs: Dict[str, OCRJob] = {}
+        self._lock = threading.Lock()
+
+        # OCR'ı bitip alan ayrıştırmasını bekleyen işler (job, ocr_result, timings)
+        self._extraction_batch: List[Tuple[OCRJob, Any, Optional[Dict[str, float]]]] = []
+        self._extraction_timer: Optional[threading.Timer] = None
+
+    def start(self):
+        """Process pool'u başlat (idempotent)"""
+        with self._lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._progress_queue = context.Queue()
+                self._progress_thread = threading.Thread(
+                    target=self._relay_progress, args=(self._progress_queue,),
+                    name="ocr-progress", daemon=True
+                )
+                self._progress_thread.start()
+
+                self._pool = self._new_pool()
+                self._persist_pool = ThreadPoolExecutor(
+                    max_workers=OCR_PERSIST_THREADS,
+                    thread_name_prefix="ocr-persist"
+                )
+                logger.info(f"OCR job engine started with {self.max_workers} workers")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context(self.start_method),
+            initializer=_init_worker,
+            initargs=(self._progress_queue,)
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Pool'ları kapat"""
+        # Toplanmakta olan ayrıştırma batch'i beklemeden gönderilir
+        batch = self._take_extraction_batch()
+        if batch:
+            self._submit_extraction(batch)
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        # Önce OCR process'leri; bitenlerin sonuçları persist pool'da kaydedilebilsin
+        if pool:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+        with self._lock:
+            persist_pool, self._persist_pool = self._persist_pool, None
+
+        if persist_pool:
+            persist_pool.shutdown(wait=wait)
+
+        with self._lock:
+            progress_queue, self._progress_queue = self._progress_queue, None
+            progress_thread, self._progress_thread = self._progress_thread, None
+
+        if progress_queue is not None:
+            progress_queue.put(None)
+            progress_thread.join()
+            progress_queue.close()
+
+    def submit(self, invoice_id: int, file_path: str, file_type: str,
+               job_id: Optional[str] = None, content_hash: Optional[str] = None,
+               batch_id: Optional[str] = None, backend: Optional[str] = None,
+               tax_number: Optional[str] = None) -> OCRJob:
+        """
+        OCR işini pool'a gönder; aynı doküman ve konfigürasyon için cache'teki sonucu kullan
+
+        backend verilmezse varsayılan motor; bilinmeyen motor adı UnknownBackend fırlatır.
+        tax_number (önceki faturadan bilinen tedarikçi) dil tespitinde pilot OCR'ı atlatır.
+        """
+        self.start()
+
+        job = OCRJob(
+            id=job_id or str(uuid.uuid4()),
+            invoice_id=invoice_id,
+            file_path=file_path,
+            file_type=file_type,
+            batch_id=batch_id,
+            backend=ocr_backends.resolve(backend),
+            tax_number=tax_number
+        )
+
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim_history()
+
+        cached = None
+        if self.cache is not None and content_hash:
+            engine = ocr_backends.get(job.backend)
+            job.cache_key = self.cache.make_key(content_hash, engine.cache_fingerprint())
+            cached = self.cache.get(job.cache_key)
+
+        if cached is not None:
+            job.cache_hit = True
+            job.future = Future()
+            job.future.add_done_callback(lambda fut: self._on_future_done(job, fut))
+            self._extract(job, cached, None)
+        else:
+            self._start_document(job)
+
+        logger.info(f"OCR job {job.id} queued for invoice {invoice_id} (cache {'hit' if job.cache_hit else 'miss'})")
+        return job
+
+    def run(self, invoice_id: int, file_path: str, file_type: str,
+            job_id: Optional[str] = None, content_hash: Optional[str] = None,
+            batch_id: Optional[str] = None, backend: Optional[str] = None,
+            tax_number: Optional[str] = None, timeout: float = OCR_JOB_TIMEOUT) -> OCRJob:
+        """
+        OCR işini pool'a gönder ve bitmesini bekle (çağıran thread bloklanır)
+
+        İş timeout saniyede bitmezse başarısız sayılır (kuyrukta yeniden
+        denenir); takılan worker process'in pool'u yenisiyle değiştirilir.
+        """
+        job = self.submit(invoice_id, file_path, file_type, job_id=job_id,
+                          content_hash=content_hash, batch_id=batch_id, backend=backend, tax_number=tax_number)
+        if not job.wait(timeout or None):
+            self._expire(job, timeout)
+            job.wait()
+
+        if job.status != JobStatus.DONE:
+            raise RuntimeError(job.error or f"OCR job {job.id} failed")
+        return job
+
+    def _expire(self, job: OCRJob, timeout: float):
+        """Süresi dolan işi başarısız say; geç gelen adım sonuçları _chain'de yok sayılır"""
+        future = job.future
+        if future is None or future.done():
+            return  # Sonuç kaydediliyor
+        try:
+            future.set_exception(TimeoutError(f"OCR job {job.id} exceeded {timeout:g}s"))
+        except InvalidStateError:
+            return  # Aynı anda tamamlandı
+        self._retire_pool(timeout)
+
+    def _retire_pool(self, timeout: float):
+        """
+        Takılan işin pool'unu yenisiyle değiştir
+
+        Yeni adımlar yeni pool'a gider. Eski pool'daki diğer adımlar bir iş
+        süresi (timeout) kadar beklenir; hâlâ çalışan (takılan) process'ler sonlandırılır.
+        """
+        with self._lock:
+            pool = self._pool
+            if pool is None:
+                return
+            self._pool = self._new_pool()
+        logger.warning("OCR job timed out, replacing the worker pool")
+        threading.Thread(target=self._drain_pool, args=(pool, timeout), name="ocr-pool-drain", daemon=True).start()
+
+    def _drain_pool(self, pool: ProcessPoolExecutor, timeout: float):
+        # ProcessPoolExecutor çalışan bir görevi iptal edemez; process'ler doğrudan sonlandırılır
+        processes = list((getattr(pool, '_processes', None) or {}).values())
+        pool.shutdown(wait=False)
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in processes:
+            if process.is_alive():
+                logger.warning(f"Terminating hung OCR worker process {process.pid}")
+                process.terminate()
+
+    def get(self, job_id: str) -> Optional[OCRJob]:
+        """İş durumunu getir"""
+        job = self._jobs.get(job_id)
+        if job and job.status == JobStatus.QUEUED and job.future is not None and job.future.running():
+            job.status = JobStatus.RUNNING
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Durum bazında iş sayıları"""
+        counts = {status.value: 0 for status in JobStatus}
+        for job_id in list(self._jobs):
+            job = self.get(job_id)
+            if job:
+                counts[job.status.value] += 1
+
+        return {
+            "workers": self.max_workers,
+            "running": self._pool is not None,
+            "jobs": counts,
+            "cache": self.cache.stats() if self.cache is not None else None
+        }
+
+    def _start_document(self, job: OCRJob):
+        """
+        Belgeyi sayfalara ayır, OCR sayfalarını pool'a dağıt ve sonuçları birleştir
+
+        Adımlar future callback'leriyle zincirlenir; hiçbir thread beklemede
+        kalmaz. Worker'ın bölme sırasında bildirdiği sayfalar bölme bitmeden
+        dağıtılır. Sonuç, job.future üzerinden tek bir iş gibi tamamlanır.
+        """
+        job.document = DocumentPages()
+        job.future = Future()
+        job.future.add_done_callback(lambda fut: self._on_future_done(job, fut))
+        self._chain(job, self._pool.submit(run_document_job, job.file_path, job.file_type, job.id, job.backend,
+                                           job.tax_number),
+                    self._on_document_split)
+
+    def _on_document_split(self, job: OCRJob, result: Dict[str, Any]):
+        if "pending" not in result:
+            self._extract(job, result["ocr_result"], result["timings"])
+            return
+
+        with job.document.lock:
+            job.document.split = result
+            early = len(job.document.dispatched)
+
+        logger.info(f"OCR job {job.id}: {len(result['pending'])} pages dispatched to worker pool "
+                    f"({early} during split)")
+        for page in result["pending"]:
+            self._dispatch_page(job, page, result.get("lang"))
+        self._maybe_assemble(job)
+
+    def _dispatch_page(self, job: OCRJob, page: int, lang: Optional[str]):
+        # Aynı sayfa hem bölme sırasındaki bildirimle hem bölme sonucuyla gelebilir
+        document, future = job.document, job.future
+        if document is None or future is None or future.done():
+            return
+        with document.lock:
+            if page in document.dispatched:
+                return
+            document.dispatched.add(page)
+
+        try:
+            page_future = self._pool.submit(run_page_job, job.file_path, job.file_type, page, job.id,
+                                            lang, job.backend)
+        except (AttributeError, RuntimeError) as e:
+            if not future.done():
+                future.set_exception(RuntimeError(f"OCR job engine unavailable: {e}"))
+            return
+        self._chain(job, page_future, self._on_page_done)
+
+    def _on_page_done(self, job: OCRJob, page_result):
+        with job.document.lock:
+            job.document.results.append(page_result)
+        self._maybe_assemble(job)
+
+    def _maybe_assemble(self, job: OCRJob):
+        # Bölme sonucu geldiyse ve tüm OCR sayfaları bittiyse sayfaları sırayla birleştir
+        document = job.document
+        with document.lock:
+            split = document.split
+            if split is None or document.assembled or len(document.results) < len(split["pending"]):
+                return
+            document.assembled = True
+            pages = list(split["pages"]) + document.results
+
+        self._chain(job, self._pool.submit(run_assembly_job, pages, job.id, job.backend, split.get("timings")),
+                    lambda job, result: self._extract(job, result["ocr_result"], result["timings"]))
+
+    def _extract(self, job: OCRJob, ocr_result, timings: Optional[Dict[str, float]]):
+        """
+        OCR'ı biten işi alan ayrıştırma batch'ine ekle
+
+        Batch upload belgeleri (batch_id'li işler) OCR_EXTRACTION_BATCH_WAIT_MS
+        boyunca toplanır ve tek worker adımında ayrıştırılır; batch
+        OCR_EXTRACTION_BATCH_SIZE'a ulaşınca hemen gönderilir. Tekil işler
+        beklemez (o ana kadar toplananlarla birlikte gönderilir).
+        """
+        with self._lock:
+            self._extraction_batch.append((job, ocr_result, timings))
+            flush = (job.batch_id is None or OCR_EXTRACTION_BATCH_WAIT_MS <= 0
+                     or len(self._extraction_batch) >= OCR_EXTRACTION_BATCH_SIZE)
+            if not flush and self._extraction_timer is None:
+                self._extraction_timer = threading.Timer(OCR_EXTRACTION_BATCH_WAIT_MS / 1000, self._flush_extraction)
+                self._extraction_timer.daemon = True
+                self._extraction_timer.start()
+
+        if flush:
+            self._flush_extraction()
+
+    def _flush_extraction(self):
+        batch = self._take_extraction_batch()
+        if batch:
+            self._submit_extraction(batch)
+
+    def _take_extraction_batch(self) -> List[Tuple[OCRJob, Any, Optional[Dict[str, float]]]]:
+        with self._lock:
+            batch, self._extraction_batch = self._extraction_batch, []
+            timer, self._extraction_timer = self._extraction_timer, None
+        if timer is not None:
+            timer.cancel()
+        return batch
+
+    def _submit_extraction(self, batch: List[Tuple[OCRJob, Any, Optional[Dict[str, float]]]]):
+        # Beklerken süresi dolan (başarısız sayılan) işler ayrıştırılmaz
+        batch = [item for item in batch if item[0].future is not None and not item[0].future.done()]
+        if not batch:
+            return
+
+        documents = [(ocr_result.raw_text, getattr(ocr_result, 'words', None)) for _, ocr_result, _ in batch]
+        try:
+            fut = self._pool.submit(run_extraction_batch, documents, [job.id for job, _, _ in batch])
+        except (AttributeError, RuntimeError) as e:
+            fut = Future()
+            fut.set_exception(RuntimeError(f"OCR job engine unavailable: {e}"))
+        fut.add_done_callback(lambda fut: self._on_extraction_done(batch, fut))
+        logger.info(f"Extracting fields for {len(batch)} OCR jobs in one batch")
+
+    def _on_extraction_done(self, batch: List[Tuple[OCRJob, Any, Optional[Dict[str, float]]]], fut: Future):
+        for index, (job, ocr_result, timings) in enumerate(batch):
+            future = job.future
+            if future is None or future.done():
+                continue
+            try:
+                exc = fut.exception()
+                if exc is not None:
+                    raise exc
+                extracted = fut.result()[index]
+                future.set_result(extraction_result(ocr_result, extracted["extracted_fields"], timings,
+                                                    extracted["extraction_ms"]))
+            except InvalidStateError:
+                pass  # Aynı anda süresi doldu
+            except BaseException as e:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _chain(self, job: OCRJob, fut: Future, handler: Callable[[OCRJob, Any], None]):
+        # Adım bitince sonraki adımı başlat; herhangi bir adım hata verirse iş başarısız olur
+        def callback(fut: Future):
+            if job.future is None or job.future.done():
+                return
+            try:
+                exc = fut.exception()
+                if exc is not None:
+                    raise exc
+                handler(job, fut.result())
+            except BaseException as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+        fut.add_done_callback(callback)
+
+    def _relay_progress(self, progress_queue):
+        # Worker process'lerden gelen aşama bildirimlerini on_progress'e aktar
+        while True:
+            message = progress_queue.get()
+            if message is None:
+                break
+
+            job_id, stage, *data = message
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            if stage == PAGE_PENDING:
+                self._dispatch_page(job, *data)
+                continue
+            if self.on_progress is None:
+                continue
+            if job.status == JobStatus.QUEUED:
+                job.status = JobStatus.RUNNING
+            try:
+                self.on_progress(job, stage)
+            except Exception as e:
+                logger.warning(f"Progress handler failed for OCR job {job_id}: {e}")
+
+    def _on_future_done(self, job: OCRJob, fut: Future):
+        # Bu callback pool'un yönetim thread'inde çalışır; DB işlemini persist pool'a devret
+        persist_pool = self._persist_pool
+        try:
+            if persist_pool is None:
+                raise RuntimeError("engine is shut down")
+            persist_pool.submit(self._finalize, job, fut)
+        except RuntimeError:
+            logger.warning(f"OCR job {job.id} finished during shutdown, result discarded")
+            job.status = JobStatus.FAILED
+            job.error = "OCR job engine shut down"
+            job._done.set()
+
+    def _finalize(self, job: OCRJob, fut: Future):
+        try:
+            exc = fut.exception()
+            if exc is not None:
+                raise exc
+
+            result = fut.result()
+
+            # Motorun yakalayıp sonuca yazdığı hata da iş hatasıdır (kuyrukta yeniden denenir)
+            ocr_error = getattr(result["ocr_result"], 'error', None)
+            if ocr_error:
+                raise RuntimeError(f"OCR failed: {ocr_error}")
+
+            if job.cache_key and not job.cache_hit and is_cacheable(result["ocr_result"]):
+                self.cache.put(job.cache_key, result["ocr_result"])
+
+            if self.on_complete:
+                self.on_complete(job, result)
+
+            job.status = JobStatus.DONE
+            logger.info(f"OCR job {job.id} done for invoice {job.invoice_id}")
+
+            if not job.cache_hit:
+                self._maybe_shadow(job, result)
+
+        except BaseException as e:
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            logger.error(f"OCR job {job.id} failed for invoice {job.invoice_id}: {e}")
+
+        finally:
+            job.finished_at = datetime.utcnow()
+            job.future = None
+            job.document = None
+            job._done.set()
+
+    def _maybe_shadow(self, job: OCRJob, result: Dict[str, Any]):
+        """
+        Gölge mod: örneklenen işlerde aday motoru aynı belgede çalıştır
+
+        Aday sonuç faturaya yazılmaz; ana sonuçla birlikte on_shadow'a verilir.
+        Önbellekten gelen sonuçlar örneklenmez (karşılaştırılacak OCR süresi yok).
+        """
+        candidate = self.shadow_backend
+        if (not candidate or candidate == job.backend or self.on_shadow is None
+                or random.random() >= self.shadow_sample_rate):
+            return
+
+        def on_shadow_done(fut: Future):
+            if fut.exception() is not None:
+                logger.warning(f"Shadow OCR ({candidate}) failed for invoice {job.invoice_id}: {fut.exception()}")
+                return
+            try:
+                self._persist_pool.submit(self._report_shadow, job, result, fut.result())
+            except (AttributeError, RuntimeError):
+                pass  # İş motoru kapandı
+
+        try:
+            shadow = self._pool.submit(run_shadow_job, candidate, job.file_path, job.file_type)
+        except (AttributeError, RuntimeError):
+            return  # İş motoru kapanıyor
+        shadow.add_done_callback(on_shadow_done)
+
+    def _report_shadow(self, job: OCRJob, primary: Dict[str, Any], candidate: Dict[str, Any]):
+        try:
+            self.on_shadow(job, primary, candidate)
+        except Exception as e:
+            logger.warning(f"Shadow comparison handler failed for OCR job {job.id}: {e}")
+
+    def _trim_history(self):
+        # Bitmiş işlerin en eskilerini bellekten at
+        if len(self._jobs) <= OCR_JOB_HISTORY:
+            return
+        finished = [
+            job_id for job_id, job in self._jobs.items()
+            if job.status in (JobStatus.DONE, JobStatus.FAILED)
+        ]
+        for job_id in finished[:len(self._jobs) - OCR_JOB_HISTORY]:
+            del self._jobs[job_id]
+
+# Global job engine instance
+job_engine = OCRJobEngine()
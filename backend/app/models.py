@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -18,6 +18,14 @@ class InvoiceStatus(str, Enum):
     ERP_CONFIRMED = "erp_confirmed"
     ERROR = "error"
 
+# Kuyruk işi durumları
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    DEAD = "dead"  # Deneme hakkı bitti (dead-letter)
+
 # Database Models
 class Invoice(Base):
     __tablename__ = "invoices"
@@ -26,6 +34,9 @@ class Invoice(Base):
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)
     file_type = Column(String, nullable=False)  # PDF, JPG, PNG
+    content_hash = Column(String(64), index=True)  # Dosyanın SHA-256 özeti
+    duplicate_of = Column(Integer, ForeignKey("invoices.id"))  # Sonuçları kullanılan önceki fatura
+    batch_id = Column(String(36), index=True)  # Toplu yükleme kimliği
     status = Column(String, default=InvoiceStatus.UPLOADED)
     
     # OCR sonuçları
@@ -45,6 +56,9 @@ class Invoice(Base):
     # Ek veriler JSON formatında
     extracted_fields = Column(JSON)
     validation_data = Column(JSON)
+    ocr_words = Column(JSON)  # Kelime kutuları: text, conf, left, top, width, height, block, par, line
+    ocr_pages = Column(JSON)  # Sayfa sonuçları: page, source, text, confidence, elapsed_ms, artifact
+    preprocessed_image = Column(String)  # İlk OCR sayfasının ön işlenmiş (G4 TIFF) görüntüsü
     
     # ERP entegrasyon
     erp_id = Column(String)  # ERP sistemindeki ID
@@ -60,6 +74,18 @@ class Invoice(Base):
     # İlişkiler
     line_items = relationship("InvoiceLineItem", back_populates="invoice", cascade="all, delete-orphan")
     validations = relationship("ValidationRecord", back_populates="invoice", cascade="all, delete-orphan")
+    
+    # Listeleme (keyset pagination) ve filtre indexleri
+    __table_args__ = (
+        Index("ix_invoices_created_id", "created_at", "id"),
+        Index("ix_invoices_status_created_id", "status", "created_at", "id"),
+        Index("ix_invoices_tax_number_created_id", "company_tax_number", "created_at", "id"),
+        # Firma filtresi önek araması: lower(company_name) LIKE 'abc%'
+        Index("ix_invoices_company_name_prefix", func.lower(company_name).label("company_name_lower"),
+              postgresql_ops={"company_name_lower": "text_pattern_ops"}),
+        Index("ix_invoices_invoice_date", "invoice_date"),
+        Index("ix_invoices_invoice_number", "invoice_number"),
+    )
 
 class InvoiceLineItem(Base):
     __tablename__ = "invoice_line_items"
@@ -110,6 +136,54 @@ class ERPIntegrationLog(Base):
     
     created_at = Column(DateTime, default=func.now())
 
+class OCRBackendComparison(Base):
+    __tablename__ = "ocr_backend_comparisons"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    
+    primary_backend = Column(String, nullable=False)
+    candidate_backend = Column(String, nullable=False, index=True)
+    primary_timings = Column(JSON)  # preprocessing_ms, ocr_ms, extraction_ms, total_ms
+    candidate_timings = Column(JSON)
+    primary_confidence = Column(Float)
+    candidate_confidence = Column(Float)
+    
+    # Alan uyumu (field_extractor çıktıları)
+    fields_compared = Column(Integer, default=0)
+    fields_agreed = Column(Integer, default=0)
+    agreement = Column(Float)
+    details = Column(JSON)  # Alan bazında primary / candidate değerleri
+    
+    created_at = Column(DateTime, default=func.now())
+
+class QueuedJob(Base):
+    __tablename__ = "job_queue"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # ocr, erp
+    invoice_id = Column(Integer, ForeignKey("invoices.id"))
+    payload = Column(JSON)
+    status = Column(String, default=JobStatus.QUEUED, nullable=False)
+    
+    # Teslim garantisi (at-least-once)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    available_at = Column(DateTime, default=func.now(), nullable=False)
+    lease_owner = Column(String)  # İşi alan worker
+    lease_token = Column(String)
+    lease_expires_at = Column(DateTime)
+    last_error = Column(Text)
+    
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        Index("ix_job_queue_status_available", "status", "available_at"),
+        Index("ix_job_queue_invoice_kind", "invoice_id", "kind"),
+    )
+
 # Pydantic Schemas (API için)
 class InvoiceBase(BaseModel):
     filename: str
@@ -131,6 +205,11 @@ class InvoiceResponse(InvoiceBase):
     currency: str = "TRY"
     confidence_score: float = 0.0
     created_at: datetime
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    batch_id: Optional[str] = None
+    from_previous_result: bool = False  # OCR atlandı, önceki sonuç kullanıldı
+    job_id: Optional[int] = None  # Kuyruğa alınan OCR işi
     
     class Config:
         from_attributes = True
@@ -168,4 +247,35 @@ class ERPResponse(BaseModel):
     success: bool
     erp_id: Optional[str] = None
     message: str
-    data: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    data: Optional[Dict[str, Any]] = None
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    invoice_id: Optional[int] = None
+    status: str
+    attempts: int
+    max_attempts: int
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class BatchFileStatus(BaseModel):
+    filename: str
+    status: str  # queued, duplicate, rejected
+    invoice_id: Optional[int] = None
+    job_id: Optional[int] = None
+    content_hash: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    error: Optional[str] = None
+
+class BatchUploadResponse(BaseModel):
+    batch_id: str
+    total: int
+    queued: int
+    duplicates: int
+    rejected: int
+    files: List[BatchFileStatus]
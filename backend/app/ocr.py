@@ -1,1087 +1,1435 @@
-import pytesseractimport pytesseractimport pytesseract
-
+import pytesseract
+import pdfplumber
 from PIL import Image
-
-import cv2from PIL import Imagefrom PIL import Image
-
+import cv2
 import numpy as np
-
-import ioimport cv2import cv2
-
+import io
+import os
 import re
-
-import jsonimport numpy as npimport numpy as np
-
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-
-from typing import Dict, List, Optional, Tupleimport ioimport io
-
-from dataclasses import dataclass
-
-import loggingimport reimport re
-
-
-
-# Windows Tesseract path'ini ayarlaimport jsonimport json
-
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-from datetime import datetimefrom datetime import datetime
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from functools import lru_cache
+import logging
+
+from ocr_cache import OCRResultCache, OCR_CACHE_DIR
+from field_patterns import LineIndex, LineIndexer, PatternRegistry
+
+# In-process Tesseract API (opsiyonel)
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
+
+# Tesseract binary'si: verilmezse PATH'teki tesseract (Windows: C:\Program Files\Tesseract-OCR\tesseract.exe)
+TESSERACT_CMD = os.getenv("TESSERACT_CMD")
+if TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
 # Logging setup
-
-logging.basicConfig(level=logging.INFO)from typing import Dict, List, Optional, Tuplefrom typing import Dict, List, Optional, Tuple
-
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-from dataclasses import dataclassfrom dataclasses import dataclass
+# Tesseract çalıştırma yöntemi: auto (tesserocr varsa onu kullan), tesserocr, pytesseract
+OCR_TESSERACT_BACKEND = os.getenv("OCR_TESSERACT_BACKEND", "auto")
+# Thread başına açık tutulan tesserocr handle sayısı (konfigürasyon başına bir handle)
+OCR_TESSERACT_HANDLES = int(os.getenv("OCR_TESSERACT_HANDLES", "4"))
+
+# PDF konfigürasyonu
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "300"))  # Metin katmanı olmayan sayfalar için
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "20"))  # Bunun altı "metin yok" sayılır
+OCR_PAGE_THREADS = int(os.getenv("OCR_PAGE_THREADS", "2"))
+
+# Görüntü kalitesine göre ön işleme yolu seç (false: her zaman tam zincir)
+OCR_ADAPTIVE_PREPROCESS = os.getenv("OCR_ADAPTIVE_PREPROCESS", "true").lower() in ("1", "true", "yes")
+
+# OCR öncesi görüntüyü bu baskın karakter yüksekliğine (piksel) ölçekle (0: kapalı)
+OCR_TARGET_TEXT_HEIGHT = int(os.getenv("OCR_TARGET_TEXT_HEIGHT", "24"))
+
+# Eğik / döndürülmüş taramaları OCR öncesi düzelt
+OCR_DESKEW = os.getenv("OCR_DESKEW", "true").lower() in ("1", "true", "yes")
+
+# Belge dili: aday Tesseract dil paketleri arasından belge başına seçilir
+OCR_DEFAULT_LANGUAGE = os.getenv("OCR_DEFAULT_LANGUAGE", "eng")  # Tespit kapalıysa / karar verilemezse
+OCR_LANGUAGES = [lang.strip() for lang in os.getenv("OCR_LANGUAGES", "tur,eng").split(",") if lang.strip()]
+OCR_LANGUAGE_DETECTION = os.getenv("OCR_LANGUAGE_DETECTION", "true").lower() in ("1", "true", "yes")
+OCR_LANGUAGE_CACHE_ITEMS = int(os.getenv("OCR_LANGUAGE_CACHE_ITEMS", "1024"))
+# Tedarikçi dil kararları OCR sonuç cache'inin dışında (kardeş dizinde) tutulur;
+# sonuç cache'inin boyut sınırı ve istatistikleri bu girdileri saymaz
+OCR_LANGUAGE_CACHE_DIR = os.getenv(
+    "OCR_LANGUAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.normpath(OCR_CACHE_DIR)), "ocr_language_cache")
+)
+
+# Dil tespiti ipuçları: dile özgü harfler ve sık geçen fatura kelimeleri
+LANGUAGE_HINTS = {
+    'tur': {
+        'chars': set('çğışöüÇĞİŞÖÜ'),
+        'words': {'fatura', 'tarih', 'tarihi', 'toplam', 'tutar', 'tutarı', 'vergi', 'dairesi', 'kdv',
+                  'ödenecek', 'adet', 'miktar', 'birim', 'fiyat', 'firma', 'unvan', 'satıcı', 'alıcı',
+                  'genel', 'ara', 'matrah', 'açıklama', 'sayın', 'vade', 'hesap', 'sıra'}
+    },
+    'eng': {
+        'chars': set(),
+        'words': {'invoice', 'date', 'total', 'amount', 'tax', 'vat', 'due', 'qty', 'quantity',
+                  'description', 'price', 'number', 'unit', 'subtotal', 'bill', 'ship', 'payment',
+                  'customer', 'seller', 'buyer', 'balance', 'item', 'terms'}
+    }
+}
+
+# Ön işlenmiş sayfa görüntülerini (CCITT G4 TIFF) sakla ve yeniden işlemede kullan
+OCR_STORE_ARTIFACTS = os.getenv("OCR_STORE_ARTIFACTS", "true").lower() in ("1", "true", "yes")
+
+# Hızlı yol: önce sadece başlık / toplam bloklarını oku, zorunlu alan eksikse tam sayfa
+OCR_ROI_FAST_PATH = os.getenv("OCR_ROI_FAST_PATH", "false").lower() in ("1", "true", "yes")
+OCR_ROI_REQUIRED_FIELDS = [f.strip() for f in os.getenv("OCR_ROI_REQUIRED_FIELDS", "invoice_number,date,total_amount").split(",") if f.strip()]
+
+# image_to_data / GetTSVText kolonları
+TSV_COLUMNS = ['level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+               'left', 'top', 'width', 'height', 'conf', 'text']
 
 @dataclass
-
-class OCRResult:import loggingimport logging
-
+class OCRResult:
     raw_text: str
-
     confidence: float
-
     extracted_fields: Dict[str, any]
+    preprocessed_image: Optional[str] = None  # İlk OCR sayfasının ön işlenmiş görüntü dosyası
+    error: Optional[str] = None
+    words: List[Dict] = field(default_factory=list)  # Kelime kutuları ve güven skorları
+    pages: List[Dict] = field(default_factory=list)  # Sayfa sonuçları: page, source, text, confidence, elapsed_ms
 
-    preprocessed_image: Optional[bytes] = None# Windows Tesseract path'ini ayarla# Windows Tesseract path'ini ayarla
-
-
-
-class AIInvoiceOCR:pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+@dataclass
+class PageResult:
+    page: int
+    text: str
+    confidence: float
+    words: List[Dict]
+    source: str  # text_layer veya ocr
+    elapsed_ms: float = 0.0
+    preprocessing: Dict = field(default_factory=dict)  # Seçilen ön işleme yolu ve kalite ölçümü
+    artifact: Optional[str] = None  # Ön işlenmiş görüntü dosyası
+    lang: Optional[str] = None  # OCR'da kullanılan dil paketi
+
+    def summary(self) -> Dict:
+        return {
+            'page': self.page,
+            'source': self.source,
+            'text': self.text,
+            'confidence': round(self.confidence, 3),
+            'elapsed_ms': round(self.elapsed_ms, 1),
+            'preprocessing': self.preprocessing,
+            'artifact': self.artifact,
+            'lang': self.lang
+        }
 
+@lru_cache(maxsize=1)
+def get_tesseract_version() -> str:
+    """Kurulu Tesseract sürümü (process başına bir kez sorgulanır)"""
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+def parse_tesseract_config(config: str) -> Dict:
+    """'--oem 3 --psm 6 -l eng -c key=value' -> dil, psm, oem ve değişkenler"""
+    lang = re.search(r'-l\s+(\S+)', config)
+    psm = re.search(r'--psm\s+(\d+)', config)
+    oem = re.search(r'--oem\s+(\d+)', config)
+    return {
+        'lang': lang.group(1) if lang else 'eng',
+        'psm': int(psm.group(1)) if psm else 3,
+        'oem': int(oem.group(1)) if oem else 3,
+        'variables': dict(re.findall(r'-c\s+(\w+)=(\S+)', config))
+    }
+
+class TesseractRunner:
+    """
+    Tesseract tanıma çağrılarının tek giriş noktası
+
+    tesserocr kuruluysa her konfigürasyon için bir API handle (thread başına)
+    bir kez açılır; dil verisi bellekte kalır ve numpy buffer'ı doğrudan
+    verilir. Aksi halde (veya handle açılamazsa) pytesseract ile tesseract
+    binary'si çağrılır.
+
+    Handle'lar sahibi olan thread'in yerel deposunda tutulur: thread başına
+    en fazla max_handles tanesi açık kalır (en eski kullanılan kapatılır),
+    thread bitince handle'ları da serbest kalır. Handle'ı sadece sahibi
+    olan thread kapatır.
+    """
+
+    def __init__(self, backend: str = OCR_TESSERACT_BACKEND, max_handles: int = OCR_TESSERACT_HANDLES):
+        self.backend = self._select_backend(backend)
+        self.max_handles = max(1, max_handles)
+        self._local = threading.local()
+
+    @staticmethod
+    def _select_backend(backend: str) -> str:
+        if backend in ('auto', 'tesserocr') and TESSEROCR_AVAILABLE:
+            return 'tesserocr'
+        if backend == 'tesserocr':
+            logger.warning("tesserocr not installed, falling back to pytesseract")
+        return 'pytesseract'
+
+    def version(self) -> str:
+        if self.backend == 'tesserocr':
+            return tesserocr.tesseract_version().splitlines()[0]
+        return get_tesseract_version()
+
+    def warm_up(self, config: str):
+        """Worker başlangıcında API handle'ını aç (dil verisini yükle)"""
+        if self.backend == 'tesserocr':
+            try:
+                self._get_api(config)
+            except Exception as e:
+                self._disable_tesserocr(e)
+
+    def image_to_data(self, image: np.ndarray, config: str) -> Dict[str, List]:
+        """Tek tanıma geçişi; pytesseract.Output.DICT formatında sonuç"""
+        if self.backend == 'tesserocr':
+            try:
+                return self._tesserocr_data(image, config)
+            except RuntimeError as e:
+                self._disable_tesserocr(e)
+
+        # Başka bir thread pytesseract'a geçtiyse bu thread'in handle'larını kapat
+        self._release_apis()
+        return pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, config=config)
+
+    def _thread_apis(self) -> 'OrderedDict[str, tesserocr.PyTessBaseAPI]':
+        # Handle'lar thread'ler arasında paylaşılmaz
+        apis = getattr(self._local, 'apis', None)
+        if apis is None:
+            apis = self._local.apis = OrderedDict()
+        return apis
+
+    def _get_api(self, config: str):
+        apis = self._thread_apis()
+        api = apis.get(config)
+        if api is not None:
+            apis.move_to_end(config)
+            return api
+
+        options = parse_tesseract_config(config)
+        api = tesserocr.PyTessBaseAPI(
+            lang=options['lang'],
+            psm=options['psm'],
+            oem=options['oem']
+        )
+        for name, value in options['variables'].items():
+            api.SetVariable(name, value)
+        apis[config] = api
+        logger.info(f"Tesseract API initialized in-process ({options['lang']}, psm={options['psm']})")
+
+        while len(apis) > self.max_handles:
+            _, evicted = apis.popitem(last=False)
+            evicted.End()
+        return api
+
+    def _release_apis(self):
+        """Bu thread'in açık handle'larını kapat"""
+        apis = getattr(self._local, 'apis', None)
+        while apis:
+            _, api = apis.popitem()
+            api.End()
+
+    def _tesserocr_data(self, image: np.ndarray, config: str) -> Dict[str, List]:
+        api = self._get_api(config)
+
+        image = np.ascontiguousarray(image)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+        api.Recognize()
+
+        data = {column: [] for column in TSV_COLUMNS}
+        for row in api.GetTSVText(0).splitlines():
+            values = row.split('\t')
+            if len(values) < len(TSV_COLUMNS):
+                values += [''] * (len(TSV_COLUMNS) - len(values))
+            for column, value in zip(TSV_COLUMNS, values):
+                if column == 'text':
+                    data[column].append(value)
+                elif column == 'conf':
+                    data[column].append(float(value))
+                else:
+                    data[column].append(int(value))
+
+        api.Clear()
+        return data
+
+    def _disable_tesserocr(self, error: Exception):
+        # Diğer thread'lerin handle'ları kullanımda olabilir; her thread kendi
+        # handle'larını bir sonraki image_to_data çağrısında kapatır
+        if self.backend == 'tesserocr':
+            logger.warning(f"In-process Tesseract unavailable, using pytesseract: {error}")
+        self.backend = 'pytesseract'
+        self._release_apis()
+
+class AIInvoiceOCR:
     def __init__(self):
-
         # Tesseract konfigürasyonu - İngilizce (daha stabil)
+        self.tesseract_config = f'--oem 3 --psm 6 -l {OCR_DEFAULT_LANGUAGE}'
+
+        # Tesseract çalıştırıcı (in-process API veya binary)
+        self.tesseract = TesseractRunner()
+
+        # Sayfa OCR'ı için process ömrü boyunca açık kalan thread pool (ilk kullanımda açılır)
+        self._page_pool: Optional[ThreadPoolExecutor] = None
+        self._page_pool_pid: Optional[int] = None
+        self._page_pool_lock = threading.Lock()
+
+        # Ön işleme parametreleri
+        self.preprocess_params = {
+            'clahe_clip_limit': 3.0,
+            'clahe_tile_grid': 8,
+            'median_blur': 3,
+            # Kalite ölçümü ve yol seçimi eşikleri
+            'adaptive': OCR_ADAPTIVE_PREPROCESS,
+            'probe_max_side': 512,
+            'binary_min_fraction': 0.97,
+            'contrast_min': 100,
+            'sharpness_min': 100,
+            'noise_max': 6.0,
+            # Çözünürlük normalizasyonu
+            'target_text_height': OCR_TARGET_TEXT_HEIGHT,
+            'text_probe_max_side': 1200,
+            'min_scale': 0.2,
+            'max_scale': 3.0,
+            'scale_tolerance': 0.15,
+            # Eğiklik ve yön düzeltme
+            'deskew': OCR_DESKEW,
+            'deskew_max_side': 1000,
+            'deskew_max_points': 20000,
+            'deskew_max_angle': 15.0,
+            'deskew_min_angle': 0.5,      # Bunun altındaki eğiklik düzeltilmez
+            'orientation_ratio': 1.3,     # Dikey profil yataydan bu kadar keskinse sayfa 90° dönük
+            'orientation_min_balance': 0.1
+        }
 
-        self.tesseract_config = r'--oem 3 --psm 6 -l eng'
-
-        # Logging setup# Logging setup
-
-        # AI destekli fatura tanıma sistemi
-
-        self.ai_patterns = self._initialize_ai_patterns()logging.basicConfig(level=logging.INFO)logging.basicConfig(level=logging.INFO)
+        # Belge dili tespiti: pilot şerit OCR'ı ve tedarikçi bazında kalıcı karar
+        self.language_params = {
+            'detection': OCR_LANGUAGE_DETECTION,
+            'candidates': OCR_LANGUAGES,
+            'pilot_fraction': 0.25,   # Pilot OCR için sayfanın üst şeridi
+            'min_evidence': 6,        # Bundan az ipucu varsa karar verilmez
+            'min_share': 0.2          # İpuçlarının bu kadarını alan her dil seçilir
+        }
+        self.language_cache = OCRResultCache(cache_dir=OCR_LANGUAGE_CACHE_DIR, memory_items=OCR_LANGUAGE_CACHE_ITEMS)
+
+        # Sayfa düzeni analizi ve bölge (ROI) hızlı yolu
+        self.roi_params = {
+            'enabled': OCR_ROI_FAST_PATH,
+            'required_fields': OCR_ROI_REQUIRED_FIELDS,
+            'layout_max_side': 1000,
+            'header_fraction': 0.3,   # Sayfanın üst kısmı: firma, fatura no, tarih, VKN
+            'footer_fraction': 0.4,   # Alt kısım: ara toplam, KDV, genel toplam
+            'max_area_fraction': 0.6, # Bölgeler sayfanın bu kadarını kaplıyorsa doğrudan tam sayfa
+            'padding': 8
+        }
 
-        
+        # AI destekli fatura tanıma sistemi (pattern'ler yüklemede bir kez derlenir)
+        self.ai_patterns = self._initialize_ai_patterns()
+        self.field_patterns = PatternRegistry({
+            field_name: config['primary'] for field_name, config in self.ai_patterns.items()
+        })
+        # Context clue -> satır indeksi (belge başına bir kez kurulur, alanlar arasında paylaşılır)
+        self.context_indexer = LineIndexer(
+            clue for config in self.ai_patterns.values() for clue in config['context_clues']
+        )
 
-    def _initialize_ai_patterns(self) -> Dict:logger = logging.getLogger(__name__)logger = logging.getLogger(__name__)
+        # İşleme aşaması bildirimi (worker process'te iş motoru tarafından atanır)
+        self.on_stage: Optional[Callable[[str], None]] = None
 
+    def _initialize_ai_patterns(self) -> Dict:
         """AI destekli pattern sistemi"""
-
         return {
-
             'invoice_number': {
-
-                'primary': [@dataclass@dataclass
-
+                'primary': [
                     r'(TR[\d\.]+)',  # TR1.2 gibi
-
-                    r'([A-Z]{2,5}[\-\.\s]*\d+[\.\d]*)',  # Fatura no formatlarıclass OCRResult:class OCRResult:
-
+                    r'([A-Z]{2,5}[\-\.\s]*\d+[\.\d]*)',  # Fatura no formatları
                     r'(?:fatura|invoice)[\s\:]*([A-Z0-9\-\.\/]+)',
-
-                    r'(?:no|number)[\s\:]*([A-Z0-9\-\.\/]+)'    raw_text: str    raw_text: str
-
+                    r'(?:no|number)[\s\:]*([A-Z0-9\-\.\/]+)'
                 ],
-
-                'context_clues': ['fatura', 'invoice', 'belge', 'document', 'TR'],    confidence: float    confidence: float
-
+                'context_clues': ['fatura', 'invoice', 'belge', 'document', 'TR'],
                 'validation': lambda x: len(x) > 2 and any(c.isdigit() for c in x)
-
-            },    extracted_fields: Dict[str, any]    extracted_fields: Dict[str, any]
-
+            },
             'date': {
-
-                'primary': [    preprocessed_image: Optional[bytes] = None    preprocessed_image: Optional[bytes] = None
-
+                'primary': [
                     r'(\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4})',  # 08-12-2015
-
                     r'(\d{4}[\-\/\.]\d{1,2}[\-\/\.]\d{1,2})',   # 2015-12-08
-
                 ],
-
-                'context_clues': ['tarih', 'date', 'düzenlenme'],class AIInvoiceOCR:class AIInvoiceOCR:
-
+                'context_clues': ['tarih', 'date', 'düzenlenme'],
                 'validation': lambda x: self._validate_date(x)
-
-            },    def __init__(self):    def __init__(self):
-
+            },
             'total_amount': {
-
-                'primary': [        # Tesseract konfigürasyonu - İngilizce (daha stabil)        # Tesseract konfigürasyonu - İngilizce (daha stabil)
-
+                'primary': [
                     r'(\d{1,3}(?:[\.,]\d{3})*[\.,]\d{2})\s*(?:TL|TRY|₺)',
-
-                    r'(?:toplam|total|tutar)[\s\:]*(\d+[\.,\d]*)',        self.tesseract_config = r'--oem 3 --psm 6 -l eng'        self.tesseract_config = r'--oem 3 --psm 6 -l eng'
-
+                    r'(?:toplam|total|tutar)[\s\:]*(\d+[\.,\d]*)',
                     r'(\d+[\.,]\d{2})\s*(?:TL|TRY)'
-
-                ],                
-
+                ],
                 'context_clues': ['toplam', 'total', 'tutar', 'ödenecek', 'TL', 'TRY'],
-
-                'validation': lambda x: self._validate_amount(x)        # AI destekli fatura tanıma sistemi        # AI destekli fatura tanıma sistemi
-
+                'validation': lambda x: self._validate_amount(x)
             },
-
-            'company_name': {        self.ai_patterns = self._initialize_ai_patterns()        self.ai_patterns = self._initialize_ai_patterns()
-
+            'company_name': {
                 'primary': [
-
-                    r'^([A-Z][A-Z\s]{2,30})',  # İlk satırdaki büyük harfli metin                
-
+                    r'^([A-Z][A-Z\s]{2,30})',  # İlk satırdaki büyük harfli metin
                     r'([A-Z][A-Za-z\s]{3,50})(?:\s+(?:LTD|A\.Ş|SAN|TİC))',
-
-                ],    def _initialize_ai_patterns(self) -> Dict:    def _initialize_ai_patterns(self) -> Dict:
-
+                ],
                 'context_clues': ['firma', 'company', 'unvan'],
-
-                'validation': lambda x: len(x) > 2 and x[0].isupper()        """AI destekli pattern sistemi"""        """AI destekli pattern sistemi"""
-
+                'validation': lambda x: len(x) > 2 and x[0].isupper()
             },
-
-            'ettn': {        return {        return {
-
+            'ettn': {
                 'primary': [
-
-                    r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})'            'invoice_number': {            'invoice_number': {
-
+                    r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})'
                 ],
-
-                'context_clues': ['ETTN', 'ettn'],                'primary': [                'primary': [
-
+                'context_clues': ['ETTN', 'ettn'],
                 'validation': lambda x: len(x) == 36 and x.count('-') == 4
-
-            }                    r'(TR[\d\.]+)',  # TR1.2 gibi                    r'(TR[\d\.]+)',  # TR1.2 gibi
-
+            }
         }
 
-                    r'([A-Z]{2,5}[\-\.\s]*\d+[\.\d]*)',  # Fatura no formatları                    r'([A-Z]{2,5}[\-\.\s]*\d+[\.\d]*)',  # Fatura no formatları
-
     def _validate_date(self, date_str: str) -> bool:
-
-        """Tarih validasyonu"""                    r'(?:fatura|invoice)[\s\:]*([A-Z0-9\-\.\/]+)',                    r'(?:fatura|invoice)[\s\:]*([A-Z0-9\-\.\/]+)',
-
+        """Tarih validasyonu"""
         try:
-
-            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']                    r'(?:no|number)[\s\:]*([A-Z0-9\-\.\/]+)'                    r'(?:no|number)[\s\:]*([A-Z0-9\-\.\/]+)'
-
+            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']
             for fmt in formats:
-
-                try:                ],                ],
-
+                try:
                     datetime.strptime(date_str, fmt)
-
-                    return True                'context_clues': ['fatura', 'invoice', 'belge', 'document', 'TR'],                'context_clues': ['fatura', 'invoice', 'belge', 'document', 'TR'],
-
+                    return True
                 except:
-
-                    continue                'validation': lambda x: len(x) > 2 and any(c.isdigit() for c in x)                'validation': lambda x: len(x) > 2 and any(c.isdigit() for c in x)
-
+                    continue
             return False
-
-        except:            },            },
-
+        except:
             return False
 
-            'date': {            'date': {
-
     def _validate_amount(self, amount_str: str) -> bool:
-
-        """Tutar validasyonu"""                'primary': [                'primary': [
-
+        """Tutar validasyonu"""
         try:
-
-            # Sayı içeriyor ve makul bir tutar aralığında                    r'(\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4})',  # 08-12-2015                    r'(\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4})',  # 08-12-2015
-
+            # Sayı içeriyor ve makul bir tutar aralığında
             clean = re.sub(r'[^\d\.,]', '', amount_str)
-
-            if ',' in clean:                    r'(\d{4}[\-\/\.]\d{1,2}[\-\/\.]\d{1,2})',   # 2015-12-08                    r'(\d{4}[\-\/\.]\d{1,2}[\-\/\.]\d{1,2})',   # 2015-12-08
-
+            if ',' in clean:
                 clean = clean.replace(',', '.')
-
-            value = float(clean)                ],                ],
-
+            value = float(clean)
             return 0.01 <= value <= 999999.99
-
-        except:                'context_clues': ['tarih', 'date', 'düzenlenme'],                'context_clues': ['tarih', 'date', 'düzenlenme'],
-
+        except:
             return False
 
-                'validation': lambda x: self._validate_date(x)                'validation': lambda x: self._validate_date(x)
-
-    def preprocess_image(self, image: Image.Image) -> Tuple[Image.Image, float]:
-
-        """Görüntüyü OCR için optimize eder"""            },            },
-
+    def preprocess_image(self, image: Image.Image) -> Tuple[np.ndarray, float, Dict]:
+        """
+        Görüntüyü OCR için optimize eder
+
+        Önce ucuz bir kalite ölçümü yapılır ve görüntüye göre bir yol seçilir;
+        temiz dijital görüntüler ve zaten ikili (fax) taramalar gereksiz
+        CLAHE / median aşamalarına girmez. Görüntü ölçümden önce baskın metin
+        yüksekliğine göre yeniden örneklenir ve eğiklik / yön düzeltilir;
+        kullanılan ölçek ve döndürme bilgi sözlüğünde döner.
+        """
+        started = time.perf_counter()
         try:
+            img_array = np.array(image)
 
-            img_array = np.array(image)            'total_amount': {            'total_amount': {
-
-            
-
-            # Gri tonlama                'primary': [                'primary': [
-
+            # Gri tonlama
             if len(img_array.shape) == 3:
-
-                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)                    r'(\d{1,3}(?:[\.,]\d{3})*[\.,]\d{2})\s*(?:TL|TRY|₺)',                    r'(\d{1,3}(?:[\.,]\d{3})*[\.,]\d{2})\s*(?:TL|TRY|₺)',
-
+                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+            elif img_array.dtype == bool:
+                gray = img_array.astype(np.uint8) * 255  # PIL '1' modu
             else:
+                gray = img_array
 
-                gray = img_array                    r'(?:toplam|total|tutar)[\s\:]*(\d+[\.,\d]*)',                    r'(?:toplam|total|tutar)[\s\:]*(\d+[\.,\d]*)',
+            params = self.preprocess_params
+            gray, scale, text_height = self.normalize_resolution(gray)
+            gray, rotation, skew = self.correct_orientation(gray) if params['deskew'] else (gray, 0, 0.0)
 
-            
+            probe = self.probe_image_quality(gray) if params['adaptive'] else {}
+            route = self._select_route(probe) if probe else 'full'
 
-            # Kontrast artırma                    r'(\d+[\.,]\d{2})\s*(?:TL|TRY)'                    r'(\d+[\.,]\d{2})\s*(?:TL|TRY)'
+            if route == 'binary':
+                # Zaten iki seviyeli: sadece sabit eşik
+                _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
 
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            elif route == 'clean':
+                # Yüksek kontrast, az gürültü: doğrudan Otsu
+                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-            enhanced = clahe.apply(gray)                ],                ],
+            elif route == 'denoise':
+                # Kontrast yeterli, gürültü var: median + Otsu
+                denoised = cv2.medianBlur(gray, params['median_blur'])
+                _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-            
-
-            # Gürültü giderme                'context_clues': ['toplam', 'total', 'tutar', 'ödenecek', 'TL', 'TRY'],                'context_clues': ['toplam', 'total', 'tutar', 'ödenecek', 'TL', 'TRY'],
+            else:
+                # Kontrast artırma
+                tile = params['clahe_tile_grid']
+                clahe = cv2.createCLAHE(clipLimit=params['clahe_clip_limit'], tileGridSize=(tile, tile))
+                enhanced = clahe.apply(gray)
+
+                # Gürültü giderme
+                denoised = cv2.medianBlur(enhanced, params['median_blur'])
+
+                # Threshold
+                _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+            info = {
+                'route': route,
+                'probe': probe,
+                'scale': scale,
+                'text_height': text_height,
+                'rotation': rotation,
+                'skew': skew,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+            }
+            return binary, 0.85, info
 
-            denoised = cv2.medianBlur(enhanced, 3)
+        except Exception as e:
+            logger.error(f"Image preprocessing error: {e}")
+            return np.array(image.convert('L')), 0.5, {'route': 'none', 'error': str(e)}
+
+    def normalize_resolution(self, gray: np.ndarray) -> Tuple[np.ndarray, float, Optional[float]]:
+        """
+        Görüntüyü hedef metin yüksekliğine yeniden örnekle
+
+        Büyük telefon fotoğraflarında karakterler yüzlerce piksel olabilir;
+        Tesseract bunları daha yavaş ve daha kötü okur. Düşük çözünürlüklü
+        taramalar ise büyütülür. Dönen ölçek ile kelime kutuları orijinal
+        koordinatlara geri çevrilir.
+        """
+        params = self.preprocess_params
+        target = params['target_text_height']
+        if not target:
+            return gray, 1.0, None
+
+        text_height = self.estimate_text_height(gray)
+        if not text_height:
+            return gray, 1.0, None
+
+        scale = min(max(target / text_height, params['min_scale']), params['max_scale'])
+        if abs(scale - 1.0) < params['scale_tolerance']:
+            return gray, 1.0, text_height
+
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        resized = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+        return resized, round(scale, 4), text_height
+
+    def estimate_text_height(self, gray: np.ndarray) -> Optional[float]:
+        """
+        Baskın karakter yüksekliği (piksel)
+
+        Seyreltilmiş görüntüde bağlı bileşenler çıkarılır; çizgi, çerçeve ve
+        dolu bloklar boyut / doluluk oranıyla elenir, kalanların medyan
+        yüksekliği alınır. Yeterli bileşen yoksa None döner.
+        """
+        height, width = gray.shape[:2]
+        step = max(1, max(height, width) // self.preprocess_params['text_probe_max_side'])
+        sample = np.ascontiguousarray(gray[::step, ::step])
+
+        _, inverted = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(inverted, connectivity=8)
+
+        w = stats[1:, cv2.CC_STAT_WIDTH]
+        h = stats[1:, cv2.CC_STAT_HEIGHT]
+        fill = stats[1:, cv2.CC_STAT_AREA] / np.maximum(w * h, 1)
+        glyphs = (h >= 3) & (h <= sample.shape[0] // 10) & (w <= h * 4) & (fill > 0.1) & (fill < 0.95)
+
+        if np.count_nonzero(glyphs) < 20:
+            return None
+        return float(np.median(h[glyphs])) * step
+
+    def correct_orientation(self, gray: np.ndarray) -> Tuple[np.ndarray, int, float]:
+        """
+        90/180° yön ve küçük açılı eğiklik düzeltmesi
+
+        Seyreltilmiş görüntüdeki mürekkep noktalarının satır izdüşümü profili
+        açılar üzerinde vektörel olarak hesaplanır; metin satırlarına hizalı
+        açıda profil en keskin halini alır. Dikey profil daha keskinse sayfa
+        90° dönüktür; satırlardaki üst / alt uzantı dengesi 180° ters
+        sayfaları ayırır. Döndürme (saat yönünde derece) ve eğiklik açısı döner.
+        """
+        params = self.preprocess_params
+        points = self._ink_points(gray)
+        if points is None:
+            return gray, 0, 0.0
+
+        xs, ys = points
+        coarse = np.arange(-params['deskew_max_angle'], params['deskew_max_angle'] + 0.5, 1.0)
+        angle, horizontal, h_profile = self._projection_profile(xs, ys, coarse)
+        _, vertical, v_profile = self._projection_profile(ys, xs, coarse)
+
+        # Yön: satırların hangi eksende olduğu ve uzantıların hangi tarafta kaldığı
+        rotation = 0
+        if vertical > horizontal * params['orientation_ratio']:
+            # Uzantılar düşük x tarafındaysa metnin üstü sola bakıyor
+            rotation = 90 if self._ascender_balance(v_profile) >= 0 else 270
+        elif self._ascender_balance(h_profile) < -params['orientation_min_balance']:
+            rotation = 180
+
+        if rotation:
+            gray = cv2.rotate(gray, {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180,
+                                     270: cv2.ROTATE_90_COUNTERCLOCKWISE}[rotation])
+            xs, ys = self._ink_points(gray)
+            angle, _, _ = self._projection_profile(xs, ys, coarse)
+
+        # Eğiklik: kaba aramanın etrafında 0.1° adımla ince arama
+        angle, _, _ = self._projection_profile(xs, ys, np.arange(angle - 1.0, angle + 1.05, 0.1))
+        angle = round(float(angle), 2)
+
+        if abs(angle) < params['deskew_min_angle']:
+            return gray, rotation, 0.0
+
+        height, width = gray.shape[:2]
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+        deskewed = cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                  borderMode=cv2.BORDER_REPLICATE)
+        return deskewed, rotation, angle
+
+    def _ink_points(self, gray: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Seyreltilmiş görüntüde mürekkep piksellerinin (x, y) koordinatları"""
+        params = self.preprocess_params
+        height, width = gray.shape[:2]
+        step = max(1, max(height, width) // params['deskew_max_side'])
+        sample = np.ascontiguousarray(gray[::step, ::step])
+
+        _, inverted = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        ys, xs = np.nonzero(inverted)
+        if len(xs) < 100:
+            return None
+
+        stride = max(1, len(xs) // params['deskew_max_points'])
+        return xs[::stride].astype(np.float32), ys[::stride].astype(np.float32)
+
+    def _projection_profile(self, xs: np.ndarray, ys: np.ndarray,
+                            angles: np.ndarray) -> Tuple[float, float, np.ndarray]:
+        """
+        Her açı için satır profili; en keskin açı, skoru ve profili
+
+        Skor, kareler toplamının aynı noktaların profil boyunca düzgün
+        dağılımına oranıdır; böylece farklı uzunluktaki eksenler karşılaştırılabilir.
+        """
+        radians = np.deg2rad(angles).astype(np.float32)[:, None]
+        rows = ys[None, :] * np.cos(radians) + xs[None, :] * np.sin(radians)
+        rows = np.rint(rows - rows.min(axis=1, keepdims=True)).astype(np.int64)
+
+        bins = int(rows.max()) + 1
+        offsets = np.arange(len(angles), dtype=np.int64)[:, None] * bins
+        profiles = np.bincount((rows + offsets).ravel(), minlength=len(angles) * bins).reshape(len(angles), bins)
+
+        filled = profiles > 0
+        spans = bins - filled.argmax(axis=1) - filled[:, ::-1].argmax(axis=1)
+        scores = (profiles.astype(np.float64) ** 2).sum(axis=1) * spans / float(len(xs)) ** 2
+        best = int(np.argmax(scores))
+        return float(angles[best]), float(scores[best]), profiles[best]
+
+    def _ascender_balance(self, profile: np.ndarray) -> float:
+        """
+        Satır profilinde üst uzantı - alt uzantı dengesi
+
+        Latin alfabesinde üst uzantılı harfler (b, d, k, l, büyük harfler) alt
+        uzantılılardan (g, p, y) fazladır; dik sayfada her satırın gövde
+        bandının üstünde altına göre daha çok mürekkep kalır. Pozitif değer
+        dik, negatif değer ters sayfa demektir.
+        """
+        if not profile.any():
+            return 0.0
 
-                            'validation': lambda x: self._validate_amount(x)                'validation': lambda x: self._validate_amount(x)
+        above = below = 0.0
+        in_line = np.flatnonzero(profile > profile.max() * 0.05)
+        for line in np.split(in_line, np.flatnonzero(np.diff(in_line) > 1) + 1):
+            values = profile[line]
+            core = np.flatnonzero(values >= values.max() * 0.5)
+            above += values[:core[0]].sum()
+            below += values[core[-1] + 1:].sum()
 
-            # Threshold
+        total = above + below
+        return float((above - below) / total) if total else 0.0
 
-            _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)            },            },
+    def probe_image_quality(self, gray: np.ndarray) -> Dict[str, float]:
+        """
+        Ucuz görüntü kalitesi ölçümü
 
-            
+        Kontrast seyreltilmiş görüntüde; iki-seviyelilik, netlik (Laplacian
+        varyansı) ve gürültü tam çözünürlükteki merkez kesitte ölçülür, çünkü
+        küçültme bulanıklığı ve gürültüyü gizler.
+        """
+        params = self.preprocess_params
+        height, width = gray.shape[:2]
 
-            # PIL'e geri çevir            'company_name': {            'company_name': {
+        # Seyreltilmiş örnek (yeniden örnekleme maliyeti olmadan)
+        step = max(1, max(height, width) // params['probe_max_side'])
+        small = np.ascontiguousarray(gray[::step, ::step])
 
-            processed_image = Image.fromarray(binary)
+        side = params['probe_max_side']
+        top, left = max(0, (height - side) // 2), max(0, (width - side) // 2)
+        crop = gray[top:top + side, left:left + side]
 
-                            'primary': [                'primary': [
+        # Kontrast: %5 - %95 yüzdelik aralığı (histogramdan)
+        cumulative = np.cumsum(cv2.calcHist([small], [0], None, [256], [0, 256]).ravel()) / small.size
+        low, high = np.searchsorted(cumulative, 0.05), np.searchsorted(cumulative, 0.95)
 
-            return processed_image, 0.85
+        histogram = cv2.calcHist([crop], [0], None, [256], [0, 256]).ravel()
+        extremes = (histogram[:33].sum() + histogram[223:].sum()) / crop.size
+        noise = cv2.absdiff(crop, cv2.medianBlur(crop, 3)).mean()
 
-                                r'^([A-Z][A-Z\s]{2,30})',  # İlk satırdaki büyük harfli metin                    r'^([A-Z][A-Z\s]{2,30})',  # İlk satırdaki büyük harfli metin
+        return {
+            'sharpness': round(float(cv2.Laplacian(crop, cv2.CV_64F).var()), 1),
+            'contrast': float(high - low),
+            'noise': round(float(noise), 2),
+            'bimodality': round(float(extremes), 3)
+        }
 
+    def _select_route(self, probe: Dict[str, float]) -> str:
+        params = self.preprocess_params
+        if probe['bimodality'] >= params['binary_min_fraction']:
+            return 'binary'
+        if probe['contrast'] < params['contrast_min'] or probe['sharpness'] < params['sharpness_min']:
+            return 'full'  # Düşük kontrast / bulanık (telefon fotoğrafı)
+        if probe['noise'] > params['noise_max']:
+            return 'denoise'
+        return 'clean'
+
+    def extract_text_from_image(self, image: Image.Image, artifact_path: Optional[str] = None,
+                                lang: Optional[str] = None) -> Tuple[str, float, List[Dict], Dict]:
+        """Tesseract ile OCR - metin, kelime kutuları ve güven skoru tek geçişte"""
+        # Ön işleme
+        self._report_stage('preprocessing')
+        processed_image, quality, preprocessing = self.preprocess_image(image)
+
+        # Ön işlenmiş görüntü yeniden işleme için saklanır
+        if artifact_path and 'error' not in preprocessing:
+            self.save_artifact(artifact_path, processed_image, quality, preprocessing)
+
+        return self.recognize(processed_image, quality, preprocessing, lang)
+
+    def recognize(self, processed_image: np.ndarray, quality: float, preprocessing: Dict,
+                  lang: Optional[str] = None) -> Tuple[str, float, List[Dict], Dict]:
+        """
+        Ön işlenmiş görüntüden OCR (lang verilmezse varsayılan dil paketi)
+
+        Tesseract hataları (eksik binary / dil paketi, tesserocr hatası) boş
+        sonuca çevrilmez; işi çalıştıran tarafa geçer, iş kuyrukta başarısız
+        sayılıp yeniden denenir.
+        """
+        config = self.config_for_language(lang)
+
+        # OCR (tek Tesseract çağrısı, TSV çıktısı)
+        self._report_stage('ocr')
+        words = None
+        if self.roi_params['enabled']:
+            words, preprocessing['roi'] = self._ocr_regions(processed_image, config)
+        if words is None:
+            words = self._ocr_words(processed_image, config)
+        text = self._text_from_words(words)
+
+        # Kutuları orijinal görüntü koordinatlarına çevir
+        self._words_to_original(words, preprocessing, processed_image.shape)
+
+        # Güven skoru hesapla
+        confidence = self._calculate_confidence(words, text)
+
+        logger.info(f"OCR completed - Text: {len(text)} chars, Words: {len(words)}, Confidence: {confidence:.3f}")
+
+        return text, confidence * quality, words, preprocessing
+
+    def artifact_key(self) -> str:
+        """Ön işleme çıktısını etkileyen konfigürasyonun kısa özeti (artifact dosya adı için)"""
+        payload = json.dumps({'preprocessing': self.preprocess_params, 'pdf_render_dpi': PDF_RENDER_DPI},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+    def save_artifact(self, path: str, binary: np.ndarray, quality: float, preprocessing: Dict) -> bool:
+        """
+        İkili görüntüyü CCITT G4 sıkıştırmalı TIFF olarak yaz
+
+        Ön işleme bilgisi (ölçek, döndürme, yol) TIFF açıklama etiketinde
+        saklanır; kelime kutuları yeniden işlemede de orijinal koordinatlara
+        çevrilebilir.
+        """
+        tmp_path = f"{path}.part"
+        try:
+            description = json.dumps({**preprocessing, 'quality': quality}, default=str)
+            Image.fromarray(binary > 127).save(tmp_path, 'TIFF', compression='group4',
+                                               tiffinfo={270: description})
+            os.replace(tmp_path, path)
+            return True
         except Exception as e:
+            logger.warning(f"Preprocessed image could not be stored ({path}): {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
 
-            logger.error(f"Image preprocessing error: {e}")                    r'([A-Z][A-Za-z\s]{3,50})(?:\s+(?:LTD|A\.Ş|SAN|TİC))',                    r'([A-Z][A-Za-z\s]{3,50})(?:\s+(?:LTD|A\.Ş|SAN|TİC))',
-
-            return image, 0.5
-
-                ],                ],
-
-    def extract_text_from_image(self, image: Image.Image) -> Tuple[str, float]:
-
-        """Tesseract ile OCR"""                'context_clues': ['firma', 'company', 'unvan'],                'context_clues': ['firma', 'company', 'unvan'],
-
+    def load_artifact(self, path: str) -> Optional[Tuple[np.ndarray, float, Dict]]:
+        """Saklanmış ön işlenmiş görüntü: (ikili görüntü, kalite, ön işleme bilgisi)"""
+        if not os.path.exists(path):
+            return None
         try:
-
-            # Ön işleme                'validation': lambda x: len(x) > 2 and x[0].isupper()                'validation': lambda x: len(x) > 2 and x[0].isupper()
-
-            processed_image, quality = self.preprocess_image(image)
-
-                        },            },
-
-            # OCR
-
-            text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)            'ettn': {            'ettn': {
-
-            
-
-            # Güven skoru hesapla                'primary': [                'primary': [
-
-            confidence = self._calculate_confidence(processed_image, text)
-
-                                r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})'                    r'([a-fA-F0-9]{8}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{4}-[a-fA-F0-9]{12})'
-
-            logger.info(f"OCR completed - Text: {len(text)} chars, Confidence: {confidence:.3f}")
-
-                            ],                ],
-
-            return text, confidence * quality
-
-                            'context_clues': ['ETTN', 'ettn'],                'context_clues': ['ETTN', 'ettn'],
-
+            with Image.open(path) as image:
+                preprocessing = json.loads(image.tag_v2.get(270) or '{}')
+                binary = np.array(image).astype(np.uint8) * 255
         except Exception as e:
-
-            logger.error(f"OCR error: {e}")                'validation': lambda x: len(x) == 36 and x.count('-') == 4                'validation': lambda x: len(x) == 36 and x.count('-') == 4
-
-            return "", 0.0
-
-            }            }
-
-    def _calculate_confidence(self, image: Image.Image, text: str) -> float:
-
-        """Güven skoru hesaplama"""        }        }
-
+            logger.warning(f"Preprocessed image could not be read ({path}): {e}")
+            return None
+
+        quality = preprocessing.pop('quality', 0.85)
+        preprocessing['reused'] = True
+        return binary, quality, preprocessing
+
+    def config_for_language(self, lang: Optional[str]) -> str:
+        """Varsayılan Tesseract konfigürasyonunu verilen dil paketiyle"""
+        if not lang:
+            return self.tesseract_config
+        return re.sub(r'-l\s+\S+', f'-l {lang}', self.tesseract_config)
+
+    def _ocr_words(self, image: np.ndarray, config: Optional[str] = None) -> List[Dict]:
+        data = self.tesseract.image_to_data(image, config or self.tesseract_config)
+        return self._words_from_data(data)
+
+    def _ocr_regions(self, binary: np.ndarray, config: Optional[str] = None) -> Tuple[Optional[List[Dict]], Dict]:
+        """
+        Hızlı yol: sadece başlık ve toplam bloklarını OCR'la
+
+        Merkezi üst veya alt bantta kalan bloklar seçilir; kalem tablosu gibi
+        sayfanın ortasını kaplayan bloklar atlanır. Seçilen bloklar dışı beyaza
+        boyanır ve tek Tesseract çağrısı yapılır; kelime koordinatları böylece
+        sayfa koordinatlarında kalır. Zorunlu
+        alanlardan biri bulunamazsa None döner ve tam sayfa okunur.
+        """
+        params = self.roi_params
+        blocks = self.detect_text_blocks(binary)
+        page_height = binary.shape[0]
+
+        regions = [
+            (x, y, w, h) for x, y, w, h in blocks
+            if y + h / 2 < page_height * params['header_fraction']
+            or y + h / 2 > page_height * (1 - params['footer_fraction'])
+        ]
+        area = sum(w * h for _, _, w, h in regions) / float(binary.size)
+        info = {'blocks': len(blocks), 'regions': len(regions), 'area': round(area, 3), 'used': False}
+
+        if not regions or area > params['max_area_fraction']:
+            return None, info
+
+        masked = np.full_like(binary, 255)
+        for x, y, w, h in regions:
+            masked[y:y + h, x:x + w] = binary[y:y + h, x:x + w]
+
+        words = self._ocr_words(masked, config)
+        fields = self.ai_extract_fields(self._text_from_words(words))
+        missing = [name for name in params['required_fields'] if not fields.get(name)]
+        if missing:
+            info['missing'] = missing
+            return None, info
+
+        info['used'] = True
+        return words, info
+
+    def detect_text_blocks(self, binary: np.ndarray) -> List[Tuple[int, int, int, int]]:
+        """
+        Morfolojik metin bloğu tespiti
+
+        Seyreltilmiş ikili görüntüde mürekkep pikselleri yatayda kelime
+        aralığı, dikeyde satır aralığı kadar genişletilir; birleşen her bileşen
+        bir blok sayılır. Bloklar (x, y, w, h) olarak tam çözünürlükte döner.
+        """
+        params = self.roi_params
+        height, width = binary.shape[:2]
+        step = max(1, max(height, width) // params['layout_max_side'])
+        ink = np.ascontiguousarray(binary[::step, ::step] < 128).astype(np.uint8)
+
+        # Normalize edilmiş metin yüksekliği blok çekirdeğinin birimi
+        unit = (self.preprocess_params['target_text_height'] or 24) / step
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, int(unit * 2)), max(3, int(unit * 1.5))))
+        merged = cv2.dilate(ink, kernel)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(merged, connectivity=8)
+        pad = params['padding']
+        blocks = []
+        for x, y, w, h, area in stats[1:]:
+            if h < unit * 0.5:
+                continue  # Tek başına yatay çizgi / leke
+            x0, y0 = max(0, x * step - pad), max(0, y * step - pad)
+            x1, y1 = min(width, (x + w) * step + pad), min(height, (y + h) * step + pad)
+            blocks.append((int(x0), int(y0), int(x1 - x0), int(y1 - y0)))
+
+        return sorted(blocks, key=lambda b: (b[1], b[0]))
+
+    def _words_from_data(self, data: Dict) -> List[Dict]:
+        """image_to_data çıktısından boş olmayan kelimeleri al"""
+        words = []
+        for i, word_text in enumerate(data['text']):
+            if not word_text or not word_text.strip():
+                continue
+            words.append({
+                'text': word_text.strip(),
+                'conf': round(float(data['conf'][i]), 2),
+                'left': int(data['left'][i]),
+                'top': int(data['top'][i]),
+                'width': int(data['width'][i]),
+                'height': int(data['height'][i]),
+                'block': int(data['block_num'][i]),
+                'par': int(data['par_num'][i]),
+                'line': int(data['line_num'][i])
+            })
+        return words
+
+    def _words_to_original(self, words: List[Dict], preprocessing: Dict, shape: Tuple[int, ...]):
+        """
+        Ön işlenmiş görüntüdeki kutuları orijinal görüntü koordinatlarına çevir
+
+        Ön işleme sırası ölçekleme, 90/180/270° döndürme ve eğiklik
+        düzeltmesidir; kutu köşeleri bu adımların tersinden geçirilir ve
+        orijinal görüntüde köşeleri kapsayan eksen hizalı kutu alınır.
+        shape, OCR'a giren (düzeltilmiş) görüntünün boyutudur.
+        """
+        scale = preprocessing.get('scale') or 1.0
+        rotation = preprocessing.get('rotation') or 0
+        skew = preprocessing.get('skew') or 0.0
+        if not words or (scale == 1.0 and not rotation and not skew):
+            return
+
+        height, width = shape[:2]
+        boxes = np.array([[word['left'], word['top'], word['width'], word['height']] for word in words],
+                         dtype=np.float64)
+        x0, y0 = boxes[:, 0], boxes[:, 1]
+        x1, y1 = x0 + boxes[:, 2], y0 + boxes[:, 3]
+        xs = np.stack([x0, x1, x1, x0], axis=1)
+        ys = np.stack([y0, y0, y1, y1], axis=1)
+
+        # Eğiklik: düzeltme matrisinin tersi (aynı merkez ve açı)
+        if skew:
+            matrix = cv2.invertAffineTransform(cv2.getRotationMatrix2D((width / 2, height / 2), -skew, 1.0))
+            xs, ys = (matrix[0, 0] * xs + matrix[0, 1] * ys + matrix[0, 2],
+                      matrix[1, 0] * xs + matrix[1, 1] * ys + matrix[1, 2])
+
+        # Yön: döndürmeden önceki görüntü 90/270°'de en ve boy yer değiştirmiş haldedir
+        if rotation == 90:
+            xs, ys = ys, width - xs
+        elif rotation == 180:
+            xs, ys = width - xs, height - ys
+        elif rotation == 270:
+            xs, ys = height - ys, xs
+
+        xs, ys = xs / scale, ys / scale
+        lefts, tops = np.maximum(xs.min(axis=1), 0), np.maximum(ys.min(axis=1), 0)
+        for word, left, top, right, bottom in zip(words, lefts, tops, xs.max(axis=1), ys.max(axis=1)):
+            word['left'], word['top'] = int(round(left)), int(round(top))
+            word['width'], word['height'] = int(round(right - left)), int(round(bottom - top))
+
+    def _text_from_words(self, words: List[Dict]) -> str:
+        """Kelimeleri satırlara dizerek image_to_string eşdeğeri metni üret"""
+        lines = []
+        current_key, current_block, current_line = None, None, []
+        for word in words:
+            key = (word['block'], word['par'], word['line'])
+            if key != current_key:
+                if current_line:
+                    lines.append(' '.join(current_line))
+                if current_block is not None and word['block'] != current_block:
+                    lines.append('')  # Bloklar arası boş satır
+                current_key, current_block, current_line = key, word['block'], []
+            current_line.append(word['text'])
+
+        if current_line:
+            lines.append(' '.join(current_line))
+        return '\n'.join(lines)
+
+    def _report_stage(self, stage: str):
+        if self.on_stage:
+            try:
+                self.on_stage(stage)
+            except Exception as e:
+                logger.debug(f"Stage report failed: {e}")
+
+    def _calculate_confidence(self, words: List[Dict], text: str) -> float:
+        """Güven skoru hesaplama"""
         try:
-
             # Tesseract confidence
-
-            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, 
-
-                                           config=self.tesseract_config)    def _validate_date(self, date_str: str) -> bool:    def _validate_date(self, date_str: str) -> bool:
-
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-
-                    """Tarih validasyonu"""        """Tarih validasyonu"""
+            confidences = [word['conf'] for word in words if word['conf'] > 0]
 
             if confidences:
-
-                base_conf = sum(confidences) / len(confidences) / 100.0        try:        try:
-
+                base_conf = sum(confidences) / len(confidences) / 100.0
             else:
+                base_conf = 0.3
 
-                base_conf = 0.3            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']
-
-            
-
-            # Metin kalitesi bonusu            for fmt in formats:            for fmt in formats:
-
+            # Metin kalitesi bonusu
             text_quality = self._assess_text_quality(text)
 
-                            try:                try:
-
             return min(base_conf * text_quality, 1.0)
 
-                                datetime.strptime(date_str, fmt)                    datetime.strptime(date_str, fmt)
-
         except:
+            return 0.3
 
-            return 0.3                    return True                    return True
-
-
-
-    def _assess_text_quality(self, text: str) -> float:                except:                except:
-
+    def _assess_text_quality(self, text: str) -> float:
         """Metin kalitesi değerlendirmesi"""
-
-        if not text:                    continue                    continue
-
+        if not text:
             return 0.1
 
-                    return False            return False
-
         quality_score = 0.5  # Base score
 
-                except:        except:
-
         # Uzunluk bonusu
-
-        if len(text) > 50:            return False            return False
-
+        if len(text) > 50:
             quality_score += 0.2
 
-        
-
         # Sayı varlığı (faturalarda önemli)
-
-        if re.search(r'\d+', text):    def _validate_amount(self, amount_str: str) -> bool:    def _validate_amount(self, amount_str: str) -> bool:
-
+        if re.search(r'\d+', text):
             quality_score += 0.2
 
-                """Tutar validasyonu"""        """Tutar validasyonu"""
-
         # Tarih pattern'i
-
-        if re.search(r'\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4}', text):        try:        try:
-
+        if re.search(r'\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4}', text):
             quality_score += 0.1
 
-                    # Sayı içeriyor ve makul bir tutar aralığında            # Sayı içeriyor ve makul bir tutar aralığında
-
         return min(quality_score, 1.0)
 
-            clean = re.sub(r'[^\d\.,]', '', amount_str)            clean = re.sub(r'[^\d\.,]', '', amount_str)
-
     def ai_extract_fields(self, text: str) -> Dict[str, any]:
-
-        """AI destekli alan çıkarma sistemi"""            if ',' in clean:            if ',' in clean:
-
+        """AI destekli alan çıkarma sistemi"""
         extracted = {}
 
-                        clean = clean.replace(',', '.')                clean = clean.replace(',', '.')
-
         try:
+            # Context araması için satır indeksi (ilk ihtiyaçta bir kez kurulur, alanlar paylaşır)
+            index = self.context_indexer.index(text)
 
-            # Her field için AI pattern matching            value = float(clean)            value = float(clean)
-
+            # Her field için AI pattern matching
             for field_name, config in self.ai_patterns.items():
-
-                result = self._ai_field_extraction(text, field_name, config)            return 0.01 <= value <= 999999.99            return 0.01 <= value <= 999999.99
-
+                result = self._ai_field_extraction(text, field_name, config, index)
                 extracted[field_name] = result
 
-                    except:        except:
-
             # AI post-processing
-
-            extracted = self._ai_post_process(text, extracted)            return False            return False
-
-            
+            extracted = self._ai_post_process(text, extracted)
 
             logger.info(f"AI extraction completed: {len([v for v in extracted.values() if v])} fields found")
 
-            
-
-        except Exception as e:    def preprocess_image(self, image: Image.Image) -> Tuple[Image.Image, float]:    def preprocess_image(self, image: Image.Image) -> Tuple[Image.Image, float]:
-
+        except Exception as e:
             logger.error(f"AI extraction error: {e}")
 
-                    """Görüntüyü OCR için optimize eder"""        """Görüntüyü OCR için optimize eder"""
-
         return extracted
 
-        try:        try:
-
-    def _ai_field_extraction(self, text: str, field_name: str, config: Dict) -> Optional[str]:
-
-        """Tek field için AI extraction"""            img_array = np.array(image)            img_array = np.array(image)
-
-        
-
-        # Primary pattern'leri dene                        
-
-        for pattern in config['primary']:
-
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)            # Gri tonlama            # Gri tonlama
-
-            for match in matches:
-
-                if config['validation'](match):            if len(img_array.shape) == 3:            if len(img_array.shape) == 3:
-
-                    logger.debug(f"Found {field_name}: {match}")
-
-                    return match                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)                gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-
-        
-
-        # Context-based search            else:            else:
+    def _ai_field_extraction(self, text: str, field_name: str, config: Dict,
+                             index: Optional[LineIndex] = None) -> Optional[str]:
+        """Tek field için AI extraction"""
+
+        # Primary pattern'leri dene (doğrulanan ilk eşleşmede durur)
+        found = self.field_patterns.first(field_name, text, config['validation'])
+        if found:
+            pattern, match = found
+            value = pattern.value(match)
+            logger.debug(f"Found {field_name}: {value}")
+            return value
+
+        # Context-based search
+        return self._context_based_search(text, field_name, config, index)
+
+    def _context_based_search(self, text: str, field_name: str, config: Dict,
+                              index: Optional[LineIndex] = None) -> Optional[str]:
+        """
+        Context tabanlı akıllı arama
+
+        Sadece context clue geçen satırlara (indeksten) bakılır; her satır
+        için önceki ve sonraki iki satırla birlikte değer aranır.
+        """
+        if index is None:
+            index = self.context_indexer.index(text)
+
+        for line in index.lines_with(config['context_clues']):
+            # Pencerede satır sonu yok; MULTILINE derlenmiş pattern'ler burada da aynı sonucu verir
+            found = self.field_patterns.first(field_name, index.window(line), config['validation'])
+            if found:
+                pattern, match = found
+                return pattern.value(match)
 
-        return self._context_based_search(text, field_name, config)
-
-                gray = img_array                gray = img_array
-
-    def _context_based_search(self, text: str, field_name: str, config: Dict) -> Optional[str]:
+        return None
 
-        """Context tabanlı akıllı arama"""                        
+    def _ai_post_process(self, text: str, extracted: Dict) -> Dict:
+        """AI post-processing iyileştirmeleri"""
 
-        
+        # Elektrik faturası özel işlemleri
+        if any(word in text.lower() for word in ['elektrik', 'kwh', 'enerji']):
+            extracted['invoice_type'] = 'electricity'
 
-        lines = text.split('\n')            # Kontrast artırma            # Kontrast artırma
+            # KWH tüketimi
+            kwh_match = re.search(r'(\d+(?:[\.,]\d+)?)\s*KWH', text, re.IGNORECASE)
+            if kwh_match:
+                extracted['consumption'] = f"{kwh_match.group(1)} KWH"
 
-        context_clues = config['context_clues']
+        # Fatura numarası iyileştirme
+        if not extracted.get('invoice_number'):
+            # TR ile başlayan herhangi bir değer
+            tr_match = re.search(r'(TR[\d\.]+)', text)
+            if tr_match:
+                extracted['invoice_number'] = tr_match.group(1)
 
-                    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+        # Firma adı iyileştirme
+        if not extracted.get('company_name'):
+            lines = text.split('\n')
+            for line in lines[:3]:  # İlk 3 satır
+                line = line.strip()
+                if len(line) > 3 and line[0].isupper() and not re.search(r'\d{3,}', line):
+                    extracted['company_name'] = line[:40]
+                    break
 
-        for i, line in enumerate(lines):
+        # Tarih normalize etme
+        if extracted.get('date'):
+            extracted['date'] = self._normalize_date(extracted['date'])
 
-            line_lower = line.lower()            enhanced = clahe.apply(gray)            enhanced = clahe.apply(gray)
+        # Tutar normalize etme
+        if extracted.get('total_amount'):
+            extracted['total_amount'] = self._normalize_amount(extracted['total_amount'])
 
-            
+        return extracted
 
-            # Context clue bulundu mu?                        
+    def _normalize_date(self, date_str: str) -> str:
+        """Tarih formatını normalize et"""
+        try:
+            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']
+            for fmt in formats:
+                try:
+                    date_obj = datetime.strptime(date_str, fmt)
+                    return date_obj.strftime('%Y-%m-%d')
+                except:
+                    continue
+            return date_str
+        except:
+            return date_str
 
-            for clue in context_clues:
+    def _normalize_amount(self, amount_str: str) -> float:
+        """Tutar formatını normalize et"""
+        try:
+            # Türk format: 1.234,56 -> 1234.56
+            clean = amount_str.replace('.', '').replace(',', '.')
+            clean = re.sub(r'[^\d\.]', '', clean)
+            return float(clean) if clean else 0.0
+        except:
+            return 0.0
 
-                if clue.lower() in line_lower:            # Gürültü giderme            # Gürültü giderme
+    def cache_fingerprint(self) -> Dict:
+        """OCR sonucunu etkileyen konfigürasyon (cache anahtarı için)"""
+        return {
+            'engine': type(self).__name__,
+            'tesseract_config': self.tesseract_config,
+            'preprocessing': self.preprocess_params,
+            'roi': self.roi_params,
+            'language': {key: self.language_params[key] for key in ('detection', 'candidates')},
+            'tesseract_backend': self.tesseract.backend,
+            'tesseract_version': self.tesseract.version()
+        }
 
-                    # Bu satır ve komşu satırlarda değer ara
+    def ocr_page(self, image: Image.Image, page: int = 1, artifact_path: Optional[str] = None,
+                 lang: Optional[str] = None) -> PageResult:
+        """Tek sayfayı OCR ile oku; kelimeler sayfa numarasıyla işaretlenir"""
+        started = time.perf_counter()
+        text, confidence, words, preprocessing = self.extract_text_from_image(image, artifact_path, lang)
+        return self._ocr_page_result(page, started, text, confidence, words, preprocessing, artifact_path, lang)
+
+    def _ocr_page_result(self, page: int, started: float, text: str, confidence: float, words: List[Dict],
+                         preprocessing: Dict, artifact_path: Optional[str], lang: Optional[str]) -> PageResult:
+        for word in words:
+            word['page'] = page
+        if artifact_path and not os.path.exists(artifact_path):
+            artifact_path = None
+        return PageResult(page=page, text=text, confidence=confidence, words=words, source='ocr',
+                          elapsed_ms=(time.perf_counter() - started) * 1000,
+                          preprocessing=preprocessing, artifact=artifact_path,
+                          lang=parse_tesseract_config(self.config_for_language(lang))['lang'])
+
+    def split_pages(self, file_content: bytes, file_type: str,
+                    on_pending: Optional[Callable[[int, List[PageResult]], None]] = None
+                    ) -> Tuple[List[PageResult], List[int]]:
+        """
+        Belgeyi sayfalara ayır
+
+        PDF'lerde metin katmanı olan sayfalar burada doğrudan okunur (kelime
+        koordinatlarıyla); yalnızca kullanılabilir metni olmayan sayfaların
+        numaraları OCR için döner. Resimlerde her kare (çok sayfalı TIFF) bir
+        OCR sayfasıdır. on_pending, PDF'de taranmış bir sayfa bulunduğu anda
+        (sayfa no, o ana kadar okunan sayfalar) ile çağrılır; çağıran OCR'ı
+        kalan sayfaların metin katmanı okunurken başlatabilir.
+        """
+        if file_type != 'pdf':
+            with Image.open(io.BytesIO(file_content)) as image:
+                return [], list(range(1, getattr(image, 'n_frames', 1) + 1))
+
+        done, pending = [], []
+        scale = PDF_RENDER_DPI / 72.0  # PDF point -> render pikseli
+
+        with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+            for page_no, page in enumerate(pdf.pages, start=1):
+                started = time.perf_counter()
+                words = self._text_layer_words(page, page_no, scale)
+                text = self._text_from_words(words)
+
+                if len(re.sub(r'\s', '', text)) >= PDF_MIN_TEXT_CHARS:
+                    done.append(PageResult(page=page_no, text=text, confidence=1.0, words=words,
+                                           source='text_layer',
+                                           elapsed_ms=(time.perf_counter() - started) * 1000))
+                else:
+                    pending.append(page_no)  # Taranmış sayfa
+                    if on_pending:
+                        on_pending(page_no, done)
+
+        logger.info(f"Document split - text layer pages: {len(done)}, OCR pages: {len(pending)}")
+        return done, pending
+
+    def detect_language(self, file_content: bytes, file_type: str, pages: List[PageResult],
+                        pending: List[int], artifact_path: Optional[str] = None,
+                        tax_number: Optional[str] = None) -> Tuple[str, Dict]:
+        """
+        Belgenin OCR sayfaları için Tesseract dil paketi
+
+        Metin katmanından okunan sayfalar varsa karar bu metinden verilir (ek
+        maliyet yok). Tedarikçi OCR'dan önce biliniyorsa (metin katmanındaki
+        veya çağıranın verdiği, önceki faturadan bilinen vergi numarası) ve
+        tedarikçi için kayıtlı bir karar varsa pilot OCR yapılmaz. Aksi halde
+        ilk OCR sayfasının üst şeridi aday dillerin hepsiyle okunur ve şerit
+        metnindeki ipuçlarına göre seçilen dil, şeritte vergi numarası varsa
+        tedarikçi için saklanır. Sayfanın ön işlenmiş görüntüsü artifact
+        olarak yazılır, sayfa OCR'ı tekrar ön işleme yapmaz.
+        """
+        params = self.language_params
+        default = parse_tesseract_config(self.tesseract_config)['lang']
+        if not params['detection'] or not pending:
+            return default, {'source': 'default'}
+
+        started = time.perf_counter()
+        text_layer = '\n'.join(page.text for page in pages)
+        lang = self.choose_language(text_layer)
+        if lang:
+            return lang, {'source': 'text_layer', 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+
+        supplier = self._supplier_key(tax_number) if tax_number else self._supplier_key_from_text(text_layer)
+        cached = self.language_cache.get(supplier) if supplier else None
+        if cached:
+            info = {'source': 'supplier', 'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)}
+            logger.info(f"Document language: {cached} (supplier, {info['elapsed_ms']} ms)")
+            return cached, info
+
+        artifact = self.load_artifact(artifact_path) if artifact_path else None
+        if artifact is not None:
+            binary = artifact[0]
+        else:
+            binary, quality, preprocessing = self.preprocess_image(
+                self.load_page_image(file_content, file_type, pending[0])
+            )
+            if artifact_path and 'error' not in preprocessing:
+                self.save_artifact(artifact_path, binary, quality, preprocessing)
 
-                    search_lines = lines[max(0,i-1):min(len(lines),i+3)]            denoised = cv2.medianBlur(enhanced, 3)            denoised = cv2.medianBlur(enhanced, 3)
+        strip = binary[:max(1, int(binary.shape[0] * params['pilot_fraction']))]
+        pilot_config = self.config_for_language('+'.join(params['candidates']))
+        try:
+            pilot = self._text_from_words(self._ocr_words(strip, pilot_config))
+        except Exception as e:
+            logger.warning(f"Language pilot OCR failed, using {default}: {e}")
+            return default, {'source': 'default', 'error': str(e)}
 
-                    search_text = ' '.join(search_lines)
+        lang = self.choose_language(pilot)
+        supplier = supplier or self._supplier_key_from_text(pilot)
+        if lang and supplier:
+            self.language_cache.put(supplier, lang)
 
-                                            
+        info = {
+            'source': 'pilot' if lang else 'default',
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+        }
+        logger.info(f"Document language: {lang or default} ({info['source']}, {info['elapsed_ms']} ms)")
+        return lang or default, info
+
+    def choose_language(self, text: str) -> Optional[str]:
+        """
+        Metindeki dile özgü harf ve kelime ipuçlarından dil paketi ('tur', 'eng', 'tur+eng')
+
+        İpuçlarının en az min_share kadarını alan her aday seçilir (en güçlü
+        dil önce); yeterli ipucu yoksa None döner.
+        """
+        params = self.language_params
+        tokens = re.findall(r'\w+', text.replace('İ', 'i').lower())
+
+        scores = {}
+        for lang in params['candidates']:
+            hints = LANGUAGE_HINTS.get(lang)
+            if hints:
+                scores[lang] = (sum(text.count(char) for char in hints['chars'])
+                                + 3 * sum(1 for token in tokens if token in hints['words']))
+
+        total = sum(scores.values())
+        if total < params['min_evidence']:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return '+'.join(lang for lang, score in ranked if score >= total * params['min_share'])
+
+    def _supplier_key_from_text(self, text: str) -> Optional[str]:
+        """Metindeki (metin katmanı veya pilot şerit) vergi numarasından tedarikçi cache anahtarı"""
+        match = re.search(r'(?:vkn|v\.k\.n|vergi\s*(?:no|numarası)|tax\s*(?:no|id))[\s:.]*(\d{10,11})',
+                          text, re.IGNORECASE)
+        return self._supplier_key(match.group(1)) if match else None
+
+    def _supplier_key(self, tax_number: str) -> Optional[str]:
+        """Tedarikçi vergi numarasından dil kararı cache anahtarı"""
+        digits = re.sub(r'\D', '', tax_number)
+        if len(digits) not in (10, 11):
+            return None
+        return OCRResultCache.make_key(
+            digits, {'kind': 'language', 'candidates': self.language_params['candidates']}
+        )
+
+    def load_page_image(self, file_content: bytes, file_type: str, page: int) -> Image.Image:
+        """OCR için tek sayfanın görüntüsü (PDF sayfası rasterize edilir)"""
+        if file_type == 'pdf':
+            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+                return pdf.pages[page - 1].to_image(resolution=PDF_RENDER_DPI).original
+
+        image = Image.open(io.BytesIO(file_content))
+        if page > 1:
+            image.seek(page - 1)
+        image.load()
+        return image
+
+    def process_page(self, file_content: bytes, file_type: str, page: int,
+                     artifact_path: Optional[str] = None, lang: Optional[str] = None) -> PageResult:
+        """
+        Tek sayfayı yükle, ön işle ve OCR yap
+
+        Sayfanın ön işlenmiş görüntüsü daha önce saklanmışsa orijinal
+        çözülmez / rasterize edilmez; doğrudan OCR yapılır.
+        """
+        started = time.perf_counter()
+        artifact = self.load_artifact(artifact_path) if artifact_path else None
+        if artifact is not None:
+            text, confidence, words, preprocessing = self.recognize(*artifact, lang=lang)
+            return self._ocr_page_result(page, started, text, confidence, words, preprocessing,
+                                         artifact_path, lang)
+
+        result = self.ocr_page(self.load_page_image(file_content, file_type, page), page, artifact_path, lang)
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        return result
+
+    def _text_layer_words(self, page, page_no: int, scale: float) -> List[Dict]:
+        """pdfplumber kelimelerini OCR kelime formatına (render pikseli) çevir"""
+        raw_words = page.extract_words(keep_blank_chars=False, use_text_flow=True)
+        if not raw_words:
+            return []
+
+        # Aynı satırdaki kelimeleri dikey konuma göre grupla
+        heights = sorted(word['bottom'] - word['top'] for word in raw_words)
+        tolerance = max(heights[len(heights) // 2] / 2, 1.0)
+
+        words, line, line_top = [], 0, None
+        for word in sorted(raw_words, key=lambda w: (round(w['top']), w['x0'])):
+            if line_top is None or abs(word['top'] - line_top) > tolerance:
+                line += 1
+                line_top = word['top']
+            words.append({
+                'text': word['text'],
+                'conf': 100.0,
+                'left': int(word['x0'] * scale),
+                'top': int(word['top'] * scale),
+                'width': int((word['x1'] - word['x0']) * scale),
+                'height': int((word['bottom'] - word['top']) * scale),
+                'block': 1,
+                'par': 1,
+                'line': line,
+                'page': page_no
+            })
+        return words
+
+    def assemble(self, pages: List[PageResult]) -> OCRResult:
+        """Sayfa sonuçlarını sayfa sırasıyla birleştir ve alanları çıkar"""
+        pages = sorted(pages, key=lambda page: page.page)
+        raw_text = '\n\n'.join(page.text for page in pages if page.text.strip())
+        words = [word for page in pages for word in page.words]
+
+        # Belge güveni: sayfa güvenlerinin metin uzunluğuna göre ağırlıklı ortalaması
+        total_chars = sum(len(page.text) for page in pages)
+        confidence = (
+            sum(page.confidence * len(page.text) for page in pages) / total_chars
+            if total_chars else 0.0
+        )
+
+        if not raw_text.strip():
+            logger.warning("No text extracted from document")
+            return OCRResult(
+                raw_text="OCR could not extract any text",
+                confidence=0.0,
+                extracted_fields={},
+                preprocessed_image=next((page.artifact for page in pages if page.artifact), None),
+                pages=[page.summary() for page in pages]
+            )
 
-                    for pattern in config['primary']:
+        logger.info(f"Raw text extracted: {len(raw_text)} characters from {len(pages)} pages")
+
+        # AI ile alanları çıkar
+        extracted_fields = self.ai_extract_fields(raw_text)
+
+        # Sonuçları logla
+        found_fields = [k for k, v in extracted_fields.items() if v]
+        logger.info(f"AI found fields: {', '.join(found_fields)}")
+
+        return OCRResult(
+            raw_text=raw_text,
+            confidence=confidence,
+            extracted_fields=extracted_fields,
+            preprocessed_image=next((page.artifact for page in pages if page.artifact), None),
+            words=words,
+            pages=[page.summary() for page in pages]
+        )
+
+    def error_result(self, error: Exception) -> OCRResult:
+        logger.error(f"AI OCR processing error: {error}")
+        return OCRResult(
+            raw_text=f"AI OCR Error: {str(error)}",
+            confidence=0.0,
+            extracted_fields={},
+            error=str(error)
+        )
 
-                        matches = re.findall(pattern, search_text, re.IGNORECASE)            # Threshold            # Threshold
+    def process_document(self, file_content: bytes, file_type: str) -> OCRResult:
+        """
+        Ana AI destekli OCR işlemi
+
+        OCR gereken sayfalar bu process'in sayfa thread pool'unda, kalan
+        sayfaların metin katmanı okunurken işlenir; iş motoru aynı adımları
+        sayfa başına worker pool'a dağıtır.
+        """
+        futures = {}
+        try:
+            logger.info(f"AI OCR Processing - Size: {len(file_content)} bytes")
 
-                        for match in matches:
+            executor = self.page_pool()
+            language: List[str] = []
 
-                            if config['validation'](match):            _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)            _, binary = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            def start_page(page: int, read: List[PageResult]):
+                # Dil ilk taranmış sayfada, o ana kadar okunan metinden (yoksa pilot şeritten) seçilir
+                if not language:
+                    language.append(self.detect_language(file_content, file_type, read, [page])[0])
+                futures[page] = executor.submit(self.process_page, file_content, file_type, page,
+                                                lang=language[0])
 
-                                return match
+            pages, pending = self.split_pages(file_content, file_type, on_pending=start_page)
+            for page in pending:
+                if page not in futures:
+                    start_page(page, pages)  # Resim kareleri
+            pages.extend(futures[page].result() for page in pending)
 
-                                
+            return self.assemble(pages)
 
-        return None
-
-            # PIL'e geri çevir            # PIL'e geri çevir
-
-    def _ai_post_process(self, text: str, extracted: Dict) -> Dict:
-
-        """AI post-processing iyileştirmeleri"""            processed_image = Image.fromarray(binary)            processed_image = Image.fromarray(binary)
-
-        
-
-        # Elektrik faturası özel işlemleri                        
-
-        if any(word in text.lower() for word in ['elektrik', 'kwh', 'enerji']):
-
-            extracted['invoice_type'] = 'electricity'            return processed_image, 0.85            return processed_image, 0.85
-
-            
-
-            # KWH tüketimi                        
-
-            kwh_match = re.search(r'(\d+(?:[\.,]\d+)?)\s*KWH', text, re.IGNORECASE)
-
-            if kwh_match:        except Exception as e:        except Exception as e:
-
-                extracted['consumption'] = f"{kwh_match.group(1)} KWH"
-
-                    logger.error(f"Image preprocessing error: {e}")            logger.error(f"Image preprocessing error: {e}")
-
-        # Fatura numarası iyileştirme
-
-        if not extracted.get('invoice_number'):            return image, 0.5            return image, 0.5
-
-            # TR ile başlayan herhangi bir değer
-
-            tr_match = re.search(r'(TR[\d\.]+)', text)
-
-            if tr_match:
-
-                extracted['invoice_number'] = tr_match.group(1)    def extract_text_from_image(self, image: Image.Image) -> Tuple[str, float]:    def extract_text_from_image(self, image: Image.Image) -> Tuple[str, float]:
-
-        
-
-        # Firma adı iyileştirme        """Tesseract ile OCR"""        """Tesseract ile OCR"""
-
-        if not extracted.get('company_name'):
-
-            lines = text.split('\n')        try:        try:
-
-            for line in lines[:3]:  # İlk 3 satır
-
-                line = line.strip()            # Ön işleme            # Ön işleme
-
-                if len(line) > 3 and line[0].isupper() and not re.search(r'\d{3,}', line):
-
-                    extracted['company_name'] = line[:40]            processed_image, quality = self.preprocess_image(image)            processed_image, quality = self.preprocess_image(image)
-
-                    break
-
-                                
-
-        # Tarih normalize etme
-
-        if extracted.get('date'):            # OCR            # OCR
-
-            extracted['date'] = self._normalize_date(extracted['date'])
-
-                    text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)            text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
-
-        # Tutar normalize etme
-
-        if extracted.get('total_amount'):                        
-
-            extracted['total_amount'] = self._normalize_amount(extracted['total_amount'])
-
-                    # Güven skoru hesapla            # Güven skoru hesapla
-
-        return extracted
-
-            confidence = self._calculate_confidence(processed_image, text)            confidence = self._calculate_confidence(processed_image, text)
-
-    def _normalize_date(self, date_str: str) -> str:
-
-        """Tarih formatını normalize et"""                        
-
-        try:
-
-            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']            logger.info(f"OCR completed - Text: {len(text)} chars, Confidence: {confidence:.3f}")            logger.info(f"OCR completed - Text: {len(text)} chars, Confidence: {confidence:.3f}")
-
-            for fmt in formats:
-
-                try:                        
-
-                    date_obj = datetime.strptime(date_str, fmt)
-
-                    return date_obj.strftime('%Y-%m-%d')            return text, confidence * quality            return text, confidence * quality
-
-                except:
-
-                    continue                        
-
-            return date_str
-
-        except:        except Exception as e:        except Exception as e:
-
-            return date_str
-
-            logger.error(f"OCR error: {e}")            logger.error(f"OCR error: {e}")
-
-    def _normalize_amount(self, amount_str: str) -> float:
-
-        """Tutar formatını normalize et"""            return "", 0.0            return "", 0.0
-
-        try:
-
-            # Türk format: 1.234,56 -> 1234.56
-
-            clean = amount_str.replace('.', '').replace(',', '.')
-
-            clean = re.sub(r'[^\d\.]', '', clean)    def _calculate_confidence(self, image: Image.Image, text: str) -> float:    def _calculate_confidence(self, image: Image.Image, text: str) -> float:
-
-            return float(clean) if clean else 0.0
-
-        except:        """Güven skoru hesaplama"""        """Güven skoru hesaplama"""
-
-            return 0.0
-
-        try:        try:
-
-    def process_document(self, file_content: bytes, file_type: str) -> OCRResult:
-
-        """Ana AI destekli OCR işlemi"""            # Tesseract confidence            # Tesseract confidence
-
-        try:
-
-            logger.info(f"AI OCR Processing - Size: {len(file_content)} bytes")            data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT,             data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, 
-
-            
-
-            # Resim yükle                                           config=self.tesseract_config)                                           config=self.tesseract_config)
-
-            image = Image.open(io.BytesIO(file_content))
-
-                        confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-
-            # OCR ile metin çıkar
-
-            raw_text, confidence = self.extract_text_from_image(image)                        
-
-            
-
-            if not raw_text.strip():            if confidences:            if confidences:
-
-                logger.warning("No text extracted from image")
-
-                return OCRResult(                base_conf = sum(confidences) / len(confidences) / 100.0                base_conf = sum(confidences) / len(confidences) / 100.0
-
-                    raw_text="OCR could not extract any text",
-
-                    confidence=0.0,            else:            else:
-
-                    extracted_fields={}
-
-                )                base_conf = 0.3                base_conf = 0.3
-
-            
-
-            logger.info(f"Raw text extracted: {len(raw_text)} characters")                        
-
-            
-
-            # AI ile alanları çıkar            # Metin kalitesi bonusu            # Metin kalitesi bonusu
-
-            extracted_fields = self.ai_extract_fields(raw_text)
-
-                        text_quality = self._assess_text_quality(text)            text_quality = self._assess_text_quality(text)
-
-            # Sonuçları logla
-
-            found_fields = [k for k, v in extracted_fields.items() if v]                        
-
-            logger.info(f"AI found fields: {', '.join(found_fields)}")
-
-                        return min(base_conf * text_quality, 1.0)            return min(base_conf * text_quality, 1.0)
-
-            return OCRResult(
-
-                raw_text=raw_text,                        
-
-                confidence=confidence,
-
-                extracted_fields=extracted_fields        except:        except:
-
-            )
-
-                        return 0.3            return 0.3
-
-        except Exception as e:
-
-            logger.error(f"AI OCR processing error: {e}")
-
-            return OCRResult(
-
-                raw_text=f"AI OCR Error: {str(e)}",    def _assess_text_quality(self, text: str) -> float:    def _assess_text_quality(self, text: str) -> float:
-
-                confidence=0.0,
-
-                extracted_fields={}        """Metin kalitesi değerlendirmesi"""        """Metin kalitesi değerlendirmesi"""
-
-            )
-
-        if not text:        if not text:
+        except Exception as e:
+            # Başlamamış sayfalar ortak pool'da boşuna çalışmasın
+            for future in futures.values():
+                future.cancel()
+            return self.error_result(e)
+
+    def page_pool(self) -> ThreadPoolExecutor:
+        """
+        Sayfa OCR thread pool'u; handle'lar (TesseractRunner) thread'lerle birlikte yaşar
+
+        Pool fork'la kopyalanmaz: worker process ilk kullanımda kendi pool'unu açar.
+        """
+        with self._page_pool_lock:
+            if self._page_pool is None or self._page_pool_pid != os.getpid():
+                self._page_pool = ThreadPoolExecutor(max_workers=max(1, OCR_PAGE_THREADS),
+                                                     thread_name_prefix='ocr-page')
+                self._page_pool_pid = os.getpid()
+            return self._page_pool
 
 # Global AI OCR instance
-
-ocr_engine = AIInvoiceOCR()            return 0.1            return 0.1
-
-                
-
-        quality_score = 0.5  # Base score        quality_score = 0.5  # Base score
-
-                
-
-        # Uzunluk bonusu        # Uzunluk bonusu
-
-        if len(text) > 50:        if len(text) > 50:
-
-            quality_score += 0.2            quality_score += 0.2
-
-                
-
-        # Sayı varlığı (faturalarda önemli)        # Sayı varlığı (faturalarda önemli)
-
-        if re.search(r'\d+', text):        if re.search(r'\d+', text):
-
-            quality_score += 0.2            quality_score += 0.2
-
-                
-
-        # Tarih pattern'i        # Tarih pattern'i
-
-        if re.search(r'\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4}', text):        if re.search(r'\d{1,2}[\-\/\.]\d{1,2}[\-\/\.]\d{2,4}', text):
-
-            quality_score += 0.1            quality_score += 0.1
-
-                
-
-        return min(quality_score, 1.0)        return min(quality_score, 1.0)
-
-
-
-    def ai_extract_fields(self, text: str) -> Dict[str, any]:    def ai_extract_fields(self, text: str) -> Dict[str, any]:
-
-        """AI destekli alan çıkarma sistemi"""        """AI destekli alan çıkarma sistemi"""
-
-        extracted = {}        extracted = {}
-
-                
-
-        try:        try:
-
-            # Her field için AI pattern matching            # Her field için AI pattern matching
-
-            for field_name, config in self.ai_patterns.items():            for field_name, config in self.ai_patterns.items():
-
-                result = self._ai_field_extraction(text, field_name, config)                result = self._ai_field_extraction(text, field_name, config)
-
-                extracted[field_name] = result                extracted[field_name] = result
-
-                        
-
-            # AI post-processing            # AI post-processing
-
-            extracted = self._ai_post_process(text, extracted)            extracted = self._ai_post_process(text, extracted)
-
-                        
-
-            logger.info(f"AI extraction completed: {len([v for v in extracted.values() if v])} fields found")            logger.info(f"AI extraction completed: {len([v for v in extracted.values() if v])} fields found")
-
-                        
-
-        except Exception as e:        except Exception as e:
-
-            logger.error(f"AI extraction error: {e}")            logger.error(f"AI extraction error: {e}")
-
-                        
-
-        return extracted        return extracted
-
-
-
-    def _ai_field_extraction(self, text: str, field_name: str, config: Dict) -> Optional[str]:    def _ai_field_extraction(self, text: str, field_name: str, config: Dict) -> Optional[str]:
-
-        """Tek field için AI extraction"""        """Tek field için AI extraction"""
-
-                
-
-        # Primary pattern'leri dene        # Primary pattern'leri dene
-
-        for pattern in config['primary']:        for pattern in config['primary']:
-
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
-
-            for match in matches:            for match in matches:
-
-                if config['validation'](match):                if config['validation'](match):
-
-                    logger.debug(f"Found {field_name}: {match}")                    logger.debug(f"Found {field_name}: {match}")
-
-                    return match                    return match
-
-                
-
-        # Context-based search        # Context-based search
-
-        return self._context_based_search(text, field_name, config)        return self._context_based_search(text, field_name, config)
-
-
-
-    def _context_based_search(self, text: str, field_name: str, config: Dict) -> Optional[str]:    def _context_based_search(self, text: str, field_name: str, config: Dict) -> Optional[str]:
-
-        """Context tabanlı akıllı arama"""        """Context tabanlı akıllı arama"""
-
-                
-
-        lines = text.split('\n')        lines = text.split('\n')
-
-        context_clues = config['context_clues']        context_clues = config['context_clues']
-
-                
-
-        for i, line in enumerate(lines):        for i, line in enumerate(lines):
-
-            line_lower = line.lower()            line_lower = line.lower()
-
-                        
-
-            # Context clue bulundu mu?            # Context clue bulundu mu?
-
-            for clue in context_clues:            for clue in context_clues:
-
-                if clue.lower() in line_lower:                if clue.lower() in line_lower:
-
-                    # Bu satır ve komşu satırlarda değer ara                    # Bu satır ve komşu satırlarda değer ara
-
-                    search_lines = lines[max(0,i-1):min(len(lines),i+3)]                    search_lines = lines[max(0,i-1):min(len(lines),i+3)]
-
-                    search_text = ' '.join(search_lines)                    search_text = ' '.join(search_lines)
-
-                                        
-
-                    for pattern in config['primary']:                    for pattern in config['primary']:
-
-                        matches = re.findall(pattern, search_text, re.IGNORECASE)                        matches = re.findall(pattern, search_text, re.IGNORECASE)
-
-                        for match in matches:                        for match in matches:
-
-                            if config['validation'](match):                            if config['validation'](match):
-
-                                return match                                return match
-
-                
-
-        return None        return None
-
-
-
-    def _ai_post_process(self, text: str, extracted: Dict) -> Dict:    def _ai_post_process(self, text: str, extracted: Dict) -> Dict:
-
-        """AI post-processing iyileştirmeleri"""        """AI post-processing iyileştirmeleri"""
-
-                
-
-        # Elektrik faturası özel işlemleri        # Elektrik faturası özel işlemleri
-
-        if any(word in text.lower() for word in ['elektrik', 'kwh', 'enerji']):        if any(word in text.lower() for word in ['elektrik', 'kwh', 'enerji']):
-
-            extracted['invoice_type'] = 'electricity'            extracted['invoice_type'] = 'electricity'
-
-                        
-
-            # KWH tüketimi            # KWH tüketimi
-
-            kwh_match = re.search(r'(\d+(?:[\.,]\d+)?)\s*KWH', text, re.IGNORECASE)            kwh_match = re.search(r'(\d+(?:[\.,]\d+)?)\s*KWH', text, re.IGNORECASE)
-
-            if kwh_match:            if kwh_match:
-
-                extracted['consumption'] = f"{kwh_match.group(1)} KWH"                extracted['consumption'] = f"{kwh_match.group(1)} KWH"
-
-                
-
-        # Fatura numarası iyileştirme        # Fatura numarası iyileştirme
-
-        if not extracted.get('invoice_number'):        if not extracted.get('invoice_number'):
-
-            # TR ile başlayan herhangi bir değer            # TR ile başlayan herhangi bir değer
-
-            tr_match = re.search(r'(TR[\d\.]+)', text)            tr_match = re.search(r'(TR[\d\.]+)', text)
-
-            if tr_match:            if tr_match:
-
-                extracted['invoice_number'] = tr_match.group(1)                extracted['invoice_number'] = tr_match.group(1)
-
-                
-
-        # Firma adı iyileştirme        # Firma adı iyileştirme
-
-        if not extracted.get('company_name'):        if not extracted.get('company_name'):
-
-            lines = text.split('\n')            lines = text.split('\n')
-
-            for line in lines[:3]:  # İlk 3 satır            for line in lines[:3]:  # İlk 3 satır
-
-                line = line.strip()                line = line.strip()
-
-                if len(line) > 3 and line[0].isupper() and not re.search(r'\d{3,}', line):                if len(line) > 3 and line[0].isupper() and not re.search(r'\d{3,}', line):
-
-                    extracted['company_name'] = line[:40]                    extracted['company_name'] = line[:40]
-
-                    break                    break
-
-                
-
-        # Tarih normalize etme        # Tarih normalize etme
-
-        if extracted.get('date'):        if extracted.get('date'):
-
-            extracted['date'] = self._normalize_date(extracted['date'])            extracted['date'] = self._normalize_date(extracted['date'])
-
-                
-
-        # Tutar normalize etme        # Tutar normalize etme
-
-        if extracted.get('total_amount'):        if extracted.get('total_amount'):
-
-            extracted['total_amount'] = self._normalize_amount(extracted['total_amount'])            extracted['total_amount'] = self._normalize_amount(extracted['total_amount'])
-
-                
-
-        return extracted        return extracted
-
-
-
-    def _normalize_date(self, date_str: str) -> str:    def _normalize_date(self, date_str: str) -> str:
-
-        """Tarih formatını normalize et"""        """Tarih formatını normalize et"""
-
-        try:        try:
-
-            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']            formats = ['%d-%m-%Y', '%d/%m/%Y', '%d.%m.%Y', '%Y-%m-%d']
-
-            for fmt in formats:            for fmt in formats:
-
-                try:                try:
-
-                    date_obj = datetime.strptime(date_str, fmt)                    date_obj = datetime.strptime(date_str, fmt)
-
-                    return date_obj.strftime('%Y-%m-%d')                    return date_obj.strftime('%Y-%m-%d')
-
-                except:                except:
-
-                    continue                    continue
-
-            return date_str            return date_str
-
-        except:        except:
-
-            return date_str            return date_str
-
-
-
-    def _normalize_amount(self, amount_str: str) -> float:    def _normalize_amount(self, amount_str: str) -> float:
-
-        """Tutar formatını normalize et"""        """Tutar formatını normalize et"""
-
-        try:        try:
-
-            # Türk format: 1.234,56 -> 1234.56            # Türk format: 1.234,56 -> 1234.56
-
-            clean = amount_str.replace('.', '').replace(',', '.')            clean = amount_str.replace('.', '').replace(',', '.')
-
-            clean = re.sub(r'[^\d\.]', '', clean)            clean = re.sub(r'[^\d\.]', '', clean)
-
-            return float(clean) if clean else 0.0            return float(clean) if clean else 0.0
-
-        except:        except:
-
-            return 0.0            return 0.0
-
-
-
-    def process_document(self, file_content: bytes, file_type: str) -> OCRResult:    def process_document(self, file_content: bytes, file_type: str) -> OCRResult:
-
-        """Ana AI destekli OCR işlemi"""        """Ana AI destekli OCR işlemi"""
-
-        try:        try:
-
-            logger.info(f"AI OCR Processing - Size: {len(file_content)} bytes")            logger.info(f"AI OCR Processing - Size: {len(file_content)} bytes")
-
-                        
-
-            # Resim yükle            # Resim yükle
-
-            image = Image.open(io.BytesIO(file_content))            image = Image.open(io.BytesIO(file_content))
-
-                        
-
-            # OCR ile metin çıkar            # OCR ile metin çıkar
-
-            raw_text, confidence = self.extract_text_from_image(image)            raw_text, confidence = self.extract_text_from_image(image)
-
-                        
-
-            if not raw_text.strip():            if not raw_text.strip():
-
-                logger.warning("No text extracted from image")                logger.warning("No text extracted from image")
-
-                return OCRResult(                return OCRResult(
-
-                    raw_text="OCR could not extract any text",                    raw_text="OCR could not extract any text",
-
-                    confidence=0.0,                    confidence=0.0,
-
-                    extracted_fields={}                    extracted_fields={}
-
-                )                )
-
-                        
-
-            logger.info(f"Raw text extracted: {len(raw_text)} characters")            logger.info(f"Raw text extracted: {len(raw_text)} characters")
-
-                        
-
-            # AI ile alanları çıkar            # AI ile alanları çıkar
-
-            extracted_fields = self.ai_extract_fields(raw_text)            extracted_fields = self.ai_extract_fields(raw_text)
-
-                        
-
-            # Sonuçları logla            # Sonuçları logla
-
-            found_fields = [k for k, v in extracted_fields.items() if v]            found_fields = [k for k, v in extracted_fields.items() if v]
-
-            logger.info(f"AI found fields: {', '.join(found_fields)}")            logger.info(f"AI found fields: {', '.join(found_fields)}")
-
-                        
-
-            return OCRResult(            return OCRResult(
-
-                raw_text=raw_text,                raw_text=raw_text,
-
-                confidence=confidence,                confidence=confidence,
-
-                extracted_fields=extracted_fields                extracted_fields=extracted_fields
-
-            )            )
-
-                        
-
-        except Exception as e:        except Exception as e:
-
-            logger.error(f"AI OCR processing error: {e}")            logger.error(f"AI OCR processing error: {e}")
-
-            return OCRResult(            return OCRResult(
-
-                raw_text=f"AI OCR Error: {str(e)}",                raw_text=f"AI OCR Error: {str(e)}",
-
-                confidence=0.0,                confidence=0.0,
-
-                extracted_fields={}                extracted_fields={}
-
-            )            )
-
-
-
-# Global AI OCR instance# Global AI OCR instance
-
-ocr_engine = AIInvoiceOCR()ocr_engine = AIInvoiceOCR()
\ No newline at end of file
+ocr_engine = AIInvoiceOCR()
@@ -0,0 +1,105 @@
+import os
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# OCR motoru seçimi (deployment başına; istek bazında da verilebilir)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "ai")
+
+# Gölge mod: aday motor trafiğin bir örneğinde ayrıca çalıştırılır ve sonuçlar karşılaştırılır
+OCR_SHADOW_BACKEND = os.getenv("OCR_SHADOW_BACKEND", "")
+OCR_SHADOW_SAMPLE_RATE = float(os.getenv("OCR_SHADOW_SAMPLE_RATE", "0.05"))
+
+# Karşılaştırmaya girmeyen alanlar
+COMPARISON_SKIP_FIELDS = {"line_items"}
+
+class UnknownBackend(Exception):
+    pass
+
+class OCRBackendRegistry:
+    """
+    İsim -> OCR motoru kaydı
+
+    Bir motor process_document(file_content, file_type) -> OCRResult ve
+    cache_fingerprint() sağlar. split_pages / process_page / assemble de
+    sağlayan motorların sayfaları iş motorunda worker pool'a dağıtılır.
+    Motorlar ilk kullanımda oluşturulur; worker process'te sadece gereken
+    motorun modeli / dil verisi yüklenir.
+    """
+
+    def __init__(self, default: str = OCR_BACKEND):
+        self.default = default
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def names(self) -> List[str]:
+        return sorted(self._factories)
+
+    def resolve(self, name: Optional[str] = None) -> str:
+        """Motor adını doğrula; verilmezse varsayılan motor"""
+        name = name or self.default
+        if name not in self._factories:
+            raise UnknownBackend(f"Unknown OCR backend '{name}' (available: {', '.join(self.names())})")
+        return name
+
+    def get(self, name: Optional[str] = None) -> Any:
+        name = self.resolve(name)
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+def supports_pages(backend: Any) -> bool:
+    """Motor sayfa bazında çalıştırılabiliyor mu"""
+    return all(hasattr(backend, method) for method in ("split_pages", "process_page", "assemble"))
+
+def _comparable(value: Any) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return " ".join(str(value).split()).lower()
+
+def compare_fields(primary: Dict[str, Any], candidate: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    İki field_extractor çıktısının alan bazında uyumu
+
+    Her iki tarafta da boş olan alanlar karşılaştırmaya girmez; sadece bir
+    tarafta bulunan alan uyumsuz sayılır.
+    """
+    fields = {}
+    for name in sorted((set(primary) | set(candidate)) - COMPARISON_SKIP_FIELDS):
+        left = _comparable(getattr(primary.get(name), "value", None))
+        right = _comparable(getattr(candidate.get(name), "value", None))
+        if left is None and right is None:
+            continue
+        fields[name] = {"primary": left, "candidate": right, "match": left == right}
+
+    agreed = sum(1 for field in fields.values() if field["match"])
+    return {
+        "compared": len(fields),
+        "agreed": agreed,
+        "agreement": round(agreed / len(fields), 3) if fields else None,
+        "fields": fields
+    }
+
+def _ai_backend():
+    from ocr import ocr_engine
+    return ocr_engine
+
+def _legacy_backend():
+    from ocr_backup import ocr_engine
+    return ocr_engine
+
+# Global registry
+ocr_backends = OCRBackendRegistry()
+ocr_backends.register("ai", _ai_backend)          # ocr.AIInvoiceOCR
+ocr_backends.register("legacy", _legacy_backend)  # ocr_backup.InvoiceOCR
@@ -10,23 +10,6 @@ from typing import Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
 import logging
 
-# Windows Tesseract path'ini ayarla
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-# Logging setup
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)act
-from PIL import Image
-import cv2
-import numpy as np
-import pdfplumber
-import io
-import re
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Union
-from dataclasses import dataclass
-import logging
-
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,6 +20,7 @@ class OCRResult:
     confidence: float
     extracted_fields: Dict[str, any]
     preprocessed_image: Optional[bytes] = None
+    error: Optional[str] = None  # İş motoru hatalı sonucu başarısız iş sayar
 
 class InvoiceOCR:
     def __init__(self):
@@ -136,39 +120,30 @@ class InvoiceOCR:
 
     def extract_text_from_pdf(self, pdf_bytes: bytes) -> str:
         """
-        PDF'den metin çıkarır
+        PDF'den metin çıkarır (hatalar process_document'a geçer)
         """
-        try:
-            text = ""
-            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            return text
-        except Exception as e:
-            logger.error(f"PDF text extraction error: {e}")
-            return ""
+        text = ""
+        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    text += page_text + "\n"
+        return text
 
     def extract_text_from_image(self, image: Image.Image) -> Tuple[str, float]:
         """
-        Görüntüden OCR ile metin çıkarır
+        Görüntüden OCR ile metin çıkarır (Tesseract hataları process_document'a geçer)
         """
-        try:
-            # Görüntüyü ön işleme
-            processed_image, quality = self.preprocess_image(image)
-            
-            # Tesseract ile OCR
-            text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
-            
-            # Güven skoru hesapla
-            confidence = self._calculate_ocr_confidence(processed_image)
-            
-            return text, confidence * quality
-            
-        except Exception as e:
-            logger.error(f"OCR error: {e}")
-            return "", 0.0
+        # Görüntüyü ön işleme
+        processed_image, quality = self.preprocess_image(image)
+        
+        # Tesseract ile OCR
+        text = pytesseract.image_to_string(processed_image, config=self.tesseract_config)
+        
+        # Güven skoru hesapla
+        confidence = self._calculate_ocr_confidence(processed_image)
+        
+        return text, confidence * quality
 
     def _calculate_ocr_confidence(self, image: Image.Image) -> float:
         """
@@ -325,6 +300,15 @@ class InvoiceOCR:
             logger.debug(f"Number parsing error: {e}")
             return None
 
+    def cache_fingerprint(self) -> Dict:
+        """
+        OCR sonucunu etkileyen konfigürasyon (cache anahtarı için)
+        """
+        return {
+            'engine': type(self).__name__,
+            'tesseract_config': self.tesseract_config
+        }
+
     def process_document(self, file_content: bytes, file_type: str) -> OCRResult:
         """
         Ana OCR işlemi - PDF veya resim dosyasını işler
@@ -354,7 +338,8 @@ class InvoiceOCR:
             return OCRResult(
                 raw_text="",
                 confidence=0.0,
-                extracted_fields={}
+                extracted_fields={},
+                error=str(e)
             )
 
 # Global OCR instance
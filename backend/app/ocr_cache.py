@@ -0,0 +1,178 @@
+import os
+import json
+import zlib
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Cache konfigürasyonu
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "ocr_cache")
+OCR_CACHE_MEMORY_ITEMS = int(os.getenv("OCR_CACHE_MEMORY_ITEMS", "256"))
+OCR_CACHE_DISK_BYTES = int(os.getenv("OCR_CACHE_DISK_BYTES", 512 * 1024 * 1024))
+
+# Kayıt formatı değişirse eski girdiler geçersiz olsun
+CACHE_FORMAT_VERSION = 2
+
+class OCRResultCache:
+    """
+    İki katmanlı OCR sonuç cache'i
+
+    Bellekte sınırlı bir LRU katmanı ve diskte sıkıştırılmış girdilerden oluşan
+    ikinci bir katman. Anahtar; doküman hash'i ile OCR motoru konfigürasyonunun
+    (Tesseract config, ön işleme parametreleri, Tesseract sürümü) özetidir.
+    """
+
+    def __init__(self, cache_dir: str = OCR_CACHE_DIR, memory_items: int = OCR_CACHE_MEMORY_ITEMS,
+                 disk_max_bytes: int = OCR_CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.disk_max_bytes = disk_max_bytes
+
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(content_hash: str, fingerprint: Dict[str, Any]) -> str:
+        """Doküman hash'i + motor konfigürasyonundan cache anahtarı üret"""
+        material = json.dumps(
+            {"v": CACHE_FORMAT_VERSION, "content": content_hash, "engine": fingerprint},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return self._memory[key]
+
+        value = self._read_disk(key)
+
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._remember(key, value)
+            self._counters["writes"] += 1
+
+        try:
+            self._write_disk(key, value)
+        except Exception as e:
+            logger.warning(f"OCR cache disk write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        stats["disk_bytes"] = self._disk_usage()
+        return stats
+
+    def _remember(self, key: str, value: Any):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            os.utime(path)  # LRU sırası için erişim zamanını güncelle
+            return value
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Corrupt OCR cache entry {key[:12]} removed: {e}")
+            self._remove(path)
+            return None
+
+    def _write_disk(self, key: str, value: Any):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 6)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += len(data)
+
+        if self._disk_usage() > self.disk_max_bytes:
+            self._evict_disk()
+
+    def _disk_usage(self) -> int:
+        with self._lock:
+            if self._disk_bytes is not None:
+                return self._disk_bytes
+
+        total = sum(size for _, _, size in self._scan_disk())
+        with self._lock:
+            self._disk_bytes = total
+        return total
+
+    def _scan_disk(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.bin'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _evict_disk(self):
+        """En eski erişilen girdileri limitin %90'ına inene kadar sil"""
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, _, size in entries)
+        target = int(self.disk_max_bytes * 0.9)
+
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                evicted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self._counters["evictions"] += evicted
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+# Global cache instance
+ocr_cache = OCRResultCache()
@@ -0,0 +1,376 @@
+import os
+import hashlib
+import logging
+import tempfile
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, List, Optional
+
+from fastapi import UploadFile, Request
+from starlette.concurrency import run_in_threadpool
+from python_multipart.exceptions import FormParserError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+# Upload konfigürasyonu
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", "500"))
+MAX_BATCH_UPLOAD_BYTES = int(os.getenv("MAX_BATCH_UPLOAD_BYTES", 500 * 1024 * 1024))
+
+# Multipart zarfı için tolerans (boundary, header'lar, dosya dışı alanlar)
+UPLOAD_ENVELOPE_BYTES = 64 * 1024
+
+# Dosya imzaları (magic bytes) -> dosya türü
+FILE_SIGNATURES = [
+    (b'%PDF-', 'pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'II*\x00', 'tiff'),
+    (b'MM\x00*', 'tiff'),
+]
+SNIFF_BYTES = max(len(signature) for signature, _ in FILE_SIGNATURES)
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+# Tek bir ZIP üyesini açarken / okurken oluşabilen hatalar
+# (şifreli üye, desteklenmeyen sıkıştırma, bozuk veri, CRC uyuşmazlığı)
+ZIP_MEMBER_ERRORS = (RuntimeError, NotImplementedError, zipfile.BadZipFile, zlib.error, EOFError)
+
+class UploadTooLarge(Exception):
+    pass
+
+class TooManyFiles(Exception):
+    pass
+
+class UnsupportedFileType(Exception):
+    pass
+
+class InvalidUpload(Exception):
+    pass
+
+@dataclass
+class StoredUpload:
+    path: str
+    file_type: str
+    size: int
+    sha256: str
+    created: bool = False  # Dosya bu upload ile diske yazıldı (daha önce yoktu)
+
+@dataclass
+class ReceivedUpload:
+    filename: Optional[str]
+    content_type: Optional[str]
+    stored: StoredUpload
+
+@dataclass
+class BatchEntry:
+    filename: str
+    stored: Optional[StoredUpload] = None
+    error: Optional[str] = None
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """
+    Dosyanın ilk byte'larından gerçek türünü belirle
+    """
+    for signature, file_type in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    return None
+
+def content_path(digest: str, file_type: str, base_dir: str = UPLOAD_DIR) -> str:
+    """
+    SHA-256 özetinden dosya yolu: uploads/ab/abcdef....pdf
+    """
+    return os.path.join(base_dir, digest[:2], f"{digest}.{file_type}")
+
+def artifact_path(file_path: str, key: str, page: int) -> str:
+    """
+    Orijinalin yanındaki ön işlenmiş sayfa görüntüsü: uploads/ab/abcdef....<key>.p1.tif
+    """
+    return f"{os.path.splitext(file_path)[0]}.{key}.p{page}.tif"
+
+class _UploadWriter:
+    """
+    Parça parça gelen içeriği geçici dosyaya yaz; boyut sınırı, SHA-256 ve tür tespiti aynı geçişte
+    """
+
+    def __init__(self, dest_dir: str, max_bytes: int):
+        self.dest_dir = dest_dir
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        fd, self.tmp_path = tempfile.mkstemp(dir=dest_dir, suffix='.part')
+        self.out = os.fdopen(fd, 'wb')
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds {self.max_bytes} bytes")
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+
+        self.hasher.update(chunk)
+        self.out.write(chunk)
+
+    def finish(self) -> StoredUpload:
+        self.out.close()
+        file_type = sniff_file_type(self.head)
+        if file_type is None:
+            raise UnsupportedFileType("Unrecognized file signature")
+
+        # İçerik adresli yol: aynı byte'lar her zaman aynı dosyaya düşer
+        digest = self.hasher.hexdigest()
+        file_path = content_path(digest, file_type, self.dest_dir)
+        created = not os.path.exists(file_path)
+        if created:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.replace(self.tmp_path, file_path)
+        else:
+            os.remove(self.tmp_path)
+
+        return StoredUpload(path=file_path, file_type=file_type, size=self.size, sha256=digest, created=created)
+
+    def discard(self):
+        self.out.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+def _copy_stream(source: BinaryIO, dest_dir: str, max_bytes: int) -> StoredUpload:
+    """
+    Kaynağı parça parça diske yaz
+    """
+    writer = _UploadWriter(dest_dir, max_bytes)
+    try:
+        while True:
+            chunk = source.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+        return writer.finish()
+
+    except BaseException:
+        writer.discard()
+        raise
+
+def _store_entry(filename: str, source: BinaryIO, dest_dir: str, max_bytes: int) -> BatchEntry:
+    try:
+        return BatchEntry(filename=filename, stored=_copy_stream(source, dest_dir, max_bytes))
+    except UploadTooLarge:
+        return BatchEntry(filename=filename, error=f"File exceeds {max_bytes} bytes")
+    except UnsupportedFileType:
+        return BatchEntry(filename=filename, error="Unsupported file type")
+
+def _store_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, filename: str,
+                  dest_dir: str, max_bytes: int) -> BatchEntry:
+    """
+    ZIP üyesini açıp yaz; şifreli veya bozuk üye sadece kendi kaydında reddedilir
+    """
+    try:
+        # Üye boyutu sınırı açılırken uygulanır (zip bomb koruması)
+        with archive.open(info) as member:
+            return _store_entry(filename, member, dest_dir, max_bytes)
+    except ZIP_MEMBER_ERRORS as e:
+        return BatchEntry(filename=filename, error=f"Unreadable ZIP member: {e}")
+
+def _zip_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Arşivdeki fatura adayı üyeler (klasörler ve gizli / macOS dosyaları hariç)"""
+    return [
+        info for info in archive.infolist()
+        if not (info.is_dir() or info.filename.startswith('__MACOSX/')
+                or os.path.basename(info.filename).startswith('.'))
+    ]
+
+def _is_zip(source: BinaryIO) -> bool:
+    head = source.read(len(ZIP_SIGNATURE))
+    source.seek(0)
+    return head == ZIP_SIGNATURE
+
+def _count_batch_entries(files: List[UploadFile]) -> int:
+    """Batch'in üreteceği kayıt sayısı (ZIP'lerde sadece merkez dizin okunur)"""
+    count = 0
+    for upload in files:
+        if not _is_zip(upload.file):
+            count += 1
+            continue
+        try:
+            with zipfile.ZipFile(upload.file) as archive:
+                count += len(_zip_members(archive))
+        except zipfile.BadZipFile:
+            count += 1  # Hatalı arşiv tek kayıt olarak reddedilir
+        upload.file.seek(0)
+    return count
+
+def _store_batch(files: List[UploadFile], dest_dir: str, max_bytes: int, max_files: int) -> List[BatchEntry]:
+    """
+    Batch dosyalarını sırayla diske yaz; ZIP arşivleri üye üye açılarak akıtılır
+
+    Dosya sayısı sınırı yazmaya başlamadan kontrol edilir; sınırı aşan
+    batch'ten diskte hiçbir dosya kalmaz. Batch beklenmedik bir hatayla
+    yarıda kalırsa bu batch'in diske yeni yazdığı dosyalar silinir.
+    """
+    if _count_batch_entries(files) > max_files:
+        raise TooManyFiles(f"Batch exceeds {max_files} files")
+
+    entries: List[BatchEntry] = []
+    try:
+        for upload in files:
+            source = upload.file
+            if not _is_zip(source):
+                entries.append(_store_entry(upload.filename, source, dest_dir, max_bytes))
+                continue
+
+            try:
+                with zipfile.ZipFile(source) as archive:
+                    for info in _zip_members(archive):
+                        entries.append(_store_member(archive, info, f"{upload.filename}/{info.filename}",
+                                                     dest_dir, max_bytes))
+            except zipfile.BadZipFile as e:
+                entries.append(BatchEntry(filename=upload.filename, error=f"Invalid ZIP archive: {e}"))
+
+    except BaseException:
+        _discard_created(entries)
+        raise
+
+    return entries
+
+def _discard_created(entries: List[BatchEntry]):
+    """Yarıda kalan batch'in diske yeni yazdığı dosyaları sil (önceden var olanlara dokunma)"""
+    for entry in entries:
+        if entry.stored and entry.stored.created and os.path.exists(entry.stored.path):
+            os.remove(entry.stored.path)
+
+async def save_batch(files: List[UploadFile], dest_dir: str = UPLOAD_DIR,
+                     max_bytes: int = MAX_UPLOAD_BYTES, max_files: int = MAX_BATCH_FILES) -> List[BatchEntry]:
+    """
+    Çoklu upload / ZIP dosyalarını event loop dışında, sabit bellekle kaydet
+    """
+    entries = await run_in_threadpool(_store_batch, files, dest_dir, max_bytes, max_files)
+    stored = sum(1 for entry in entries if entry.stored)
+    logger.info(f"Stored batch: {stored}/{len(entries)} files accepted")
+    return entries
+
+class _MultipartFileReceiver:
+    """
+    Multipart gövdesindeki tek dosya alanını ayrıştırıcı callback'lerinden toplar
+
+    Callback'ler senkron çalışır; dosya verisi burada biriktirilir ve her
+    ağ parçasından sonra thread pool'da diske yazılır.
+    """
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.started = False  # Dosya alanının başlıkları okundu
+        self.ended = False    # Dosya alanı bitti
+        self.pending: List[bytes] = []
+
+        self._in_file = False
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b''
+        self._header_value = b''
+
+    def callbacks(self) -> Dict:
+        return {
+            'on_part_begin': self.on_part_begin,
+            'on_header_field': self.on_header_field,
+            'on_header_value': self.on_header_value,
+            'on_header_end': self.on_header_end,
+            'on_headers_finished': self.on_headers_finished,
+            'on_part_data': self.on_part_data,
+            'on_part_end': self.on_part_end
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b''
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        name = options.get(b'name', b'').decode('utf-8', 'replace')
+
+        # Sadece istenen alandaki ilk dosya kaydedilir; diğer alanlar atlanır
+        self._in_file = not self.started and name == self.field_name and b'filename' in options
+        if self._in_file:
+            self.started = True
+            self.filename = options[b'filename'].decode('utf-8', 'replace')
+            content_type = self._headers.get(b'content-type')
+            self.content_type = content_type.decode('latin-1') if content_type else None
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_file:
+            self.pending.append(data[start:end])
+
+    def on_part_end(self):
+        if self._in_file:
+            self._in_file = False
+            self.ended = True
+
+    def take(self) -> bytes:
+        data, self.pending = b''.join(self.pending), []
+        return data
+
+async def receive_upload(request: Request, field_name: str = 'file', dest_dir: str = UPLOAD_DIR,
+                         max_bytes: int = MAX_UPLOAD_BYTES) -> ReceivedUpload:
+    """
+    Multipart isteğin gövdesini ağdan geldikçe ayrıştır ve dosyayı doğrudan diske yaz
+
+    Gövde önceden geçici dosyaya alınmaz; boyut sınırı her parçada
+    uygulanır, Content-Length göndermeyen (chunked) istekler de sınırı
+    aştığı anda kesilir. Dosya alanı bitince gövdenin geri kalanı okunmaz.
+    """
+    content_type, params = parse_options_header(request.headers.get('content-type', ''))
+    if content_type != b'multipart/form-data' or b'boundary' not in params:
+        raise InvalidUpload("Expected a multipart/form-data request")
+
+    receiver = _MultipartFileReceiver(field_name)
+    parser = MultipartParser(params[b'boundary'], receiver.callbacks())
+    writer: Optional[_UploadWriter] = None
+    received = 0
+
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes + UPLOAD_ENVELOPE_BYTES:
+                raise UploadTooLarge(f"Request exceeds {max_bytes} bytes")
+
+            parser.write(chunk)
+            if receiver.started and writer is None:
+                writer = await run_in_threadpool(_UploadWriter, dest_dir, max_bytes)
+            if receiver.pending:
+                await run_in_threadpool(writer.write, receiver.take())
+            if receiver.ended:
+                break
+
+        if writer is None or not receiver.ended:
+            raise InvalidUpload(f"Multipart field '{field_name}' with a file is missing or incomplete")
+
+        stored = await run_in_threadpool(writer.finish)
+
+    except FormParserError as e:
+        if writer is not None:
+            await run_in_threadpool(writer.discard)
+        raise InvalidUpload(f"Malformed multipart body: {e}")
+    except BaseException:
+        if writer is not None:
+            await run_in_threadpool(writer.discard)
+        raise
+
+    logger.info(f"Stored upload {receiver.filename}: {stored.size} bytes, {stored.file_type}, sha256={stored.sha256[:12]}")
+    return ReceivedUpload(filename=receiver.filename, content_type=receiver.content_type, stored=stored)
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
@@ -0,0 +1,107 @@
+import os
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Aynı satır sayılan taban çizgisi farkı (medyan kelime yüksekliği katı)
+TABLE_ROW_TOLERANCE = float(os.getenv("TABLE_ROW_TOLERANCE", "0.5"))
+
+# Sütun / başlık hücresi ayıran yatay boşluk (medyan kelime yüksekliği katı)
+TABLE_COLUMN_GAP = float(os.getenv("TABLE_COLUMN_GAP", "1.0"))
+
+@dataclass
+class LayoutRow:
+    page: int
+    top: int
+    bottom: int
+    words: List[Dict] = field(default_factory=list)  # Soldan sağa
+
+    @property
+    def text(self) -> str:
+        return ' '.join(word['text'] for word in self.words)
+
+    @property
+    def left(self) -> int:
+        return min(word['left'] for word in self.words)
+
+    @property
+    def right(self) -> int:
+        return max(word['left'] + word['width'] for word in self.words)
+
+def median_height(words: List[Dict]) -> float:
+    if not words:
+        return 0.0
+    return float(np.median([word['height'] for word in words])) or 1.0
+
+def cluster_rows(words: List[Dict], tolerance: float = TABLE_ROW_TOLERANCE) -> List[LayoutRow]:
+    """
+    Kelime kutularını taban çizgisine (top + height) göre satırlara grupla
+
+    Sayfa başına kelimeler taban çizgisine göre sıralanır; ardışık iki kelime
+    arasındaki fark medyan yüksekliğin tolerance katını aşınca yeni satır
+    başlar. Satırlar sayfa ve yukarıdan aşağı sırada döner.
+    """
+    rows: List[LayoutRow] = []
+    if not words:
+        return rows
+
+    pages = np.array([word.get('page', 1) for word in words])
+    for page in np.unique(pages):
+        page_words = [words[i] for i in np.flatnonzero(pages == page)]
+        top = np.array([word['top'] for word in page_words])
+        height = np.array([word['height'] for word in page_words])
+        left = np.array([word['left'] for word in page_words])
+        baseline = top + height
+
+        order = np.argsort(baseline, kind='stable')
+        limit = max(float(np.median(height)), 1.0) * tolerance
+        row_ids = np.concatenate(([0], np.cumsum(np.diff(baseline[order]) > limit)))
+
+        starts = np.flatnonzero(np.diff(np.concatenate(([-1], row_ids))))
+        for members in np.split(order, starts[1:]):
+            members = members[np.argsort(left[members], kind='stable')]
+            rows.append(LayoutRow(
+                page=int(page),
+                top=int(top[members].min()),
+                bottom=int(baseline[members].max()),
+                words=[page_words[i] for i in members]
+            ))
+
+    return rows
+
+def cluster_positions(positions: np.ndarray, gap: float) -> np.ndarray:
+    """
+    Tek boyutlu konumları aralarındaki boşluğa göre kümele
+
+    Sıralı konumlarda gap'ten büyük her boşluk yeni küme başlatır. Her
+    konumun küme numarası (soldan sağa 0, 1, ...) giriş sırasıyla döner.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if positions.size == 0:
+        return np.zeros(0, dtype=int)
+
+    order = np.argsort(positions, kind='stable')
+    sorted_ids = np.concatenate(([0], np.cumsum(np.diff(positions[order]) > gap)))
+    labels = np.empty(positions.size, dtype=int)
+    labels[order] = sorted_ids
+    return labels
+
+def split_cells(row: LayoutRow, gap: float) -> List[List[Dict]]:
+    """Satırdaki kelimeleri aralarındaki yatay boşluğa göre hücrelere ayır (başlık satırları için)"""
+    cells: List[List[Dict]] = []
+    previous_right: Optional[int] = None
+    for word in row.words:
+        if previous_right is None or word['left'] - previous_right > gap:
+            cells.append([])
+        cells[-1].append(word)
+        previous_right = word['left'] + word['width']
+    return cells
+
+def assign_columns(words: List[Dict], boundaries: np.ndarray) -> np.ndarray:
+    """Kelime merkezlerini sütun sınırlarına göre sütun numarasına çevir"""
+    centers = np.array([word['left'] + word['width'] / 2 for word in words], dtype=float)
+    return np.searchsorted(boundaries, centers)
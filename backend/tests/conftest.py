@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Uygulama modülleri ortam değişkenlerini import sırasında okur; testler geçici
+# bir SQLite veritabanı ve dizinlerle çalışır (TEST_DATABASE_URL ile değiştirilebilir)
+TEST_DIR = tempfile.mkdtemp(prefix="invoice-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{os.path.join(TEST_DIR, 'test.db')}")
+os.environ["UPLOAD_DIR"] = os.path.join(TEST_DIR, "uploads")
+os.environ["OCR_CACHE_DIR"] = os.path.join(TEST_DIR, "ocr_cache")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+@pytest.fixture
+def db():
+    """Boş tablolarla veritabanı oturumu; test sonunda tablolar silinir"""
+    from database import engine, SessionLocal
+    from models import Base
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def make_invoice(db):
+    """Test faturası oluşturur"""
+    from models import Invoice
+
+    def make(**values):
+        invoice = Invoice(**{"filename": "invoice.pdf", "file_path": "invoice.pdf", "file_type": "pdf", **values})
+        db.add(invoice)
+        db.commit()
+        return invoice
+
+    return make
@@ -0,0 +1,108 @@
+import re
+
+import pytest
+
+from field_extractor import field_extractor
+from field_patterns import LINE_START, TEXT_START, FieldPattern, FieldScanner
+
+INVOICE = """ABC ENERJİ SANAYİ VE TİCARET A.Ş.
+Vergi No: 1234567890
+Fatura No: ABC2024000123
+Tarih: 15.03.2024
+Vade Tarihi: 15.04.2024
+Ürün 2 100,00 200,00
+Ara Toplam: 250,00 TL
+KDV %18: 45,00 TL
+Genel Toplam: 295,00 TL
+IBAN: TR330006100519786457841326"""
+
+TEXTS = [
+    INVOICE,
+    # Tek satır metin (PDF metin katmanı)
+    INVOICE.replace("\n", " "),
+    # Değer etiketten pencereden daha uzakta (noktalı kılavuz çizgisi)
+    "Fatura No " + "." * 300 + " INV-1\nToplam " + ". " * 120 + "1.234,56 TL",
+    # Pencere sınırına denk gelen uzun değer
+    "Unvan: " + "A" * 400 + "\nTOPLAM 12,50",
+    "company XYZ Trading\ninvoice number INV-77/2023\ndate 02.01.2023\ntotal 1.234,56 TRY",
+    "Market fişi\nFİŞ NO: 0042\n08/12/2015\nTOPLAM 12,50",
+    "",
+]
+
+def extract(text, scanned):
+    cleaned = field_extractor._preprocess_text(text)
+    scan = field_extractor.field_scanner.scan(cleaned) if scanned else None
+    results = {
+        field: field_extractor._extract_field_with_confidence(cleaned, field, scan)
+        for field in field_extractor.advanced_patterns
+    }
+    results.update(field_extractor._apply_special_rules(cleaned, scan))
+    return {
+        field: (result.value, result.confidence, result.source_text)
+        for field, result in results.items() if result
+    }
+
+@pytest.mark.parametrize("text", TEXTS, ids=["invoice", "single-line", "far-value", "long-value",
+                                             "english", "receipt", "empty"])
+def test_scanner_matches_per_pattern_results(text):
+    assert extract(text, scanned=True) == extract(text, scanned=False)
+
+def test_far_value_is_found():
+    results = extract(TEXTS[2], scanned=True)
+
+    assert results["invoice_number"][0] == "INV-1"
+    assert results["total_amount"][0] == 1234.56
+
+def test_labels_are_written_in_preprocessed_form():
+    # Etiketler _preprocess_text çıktısında aranır; Türkçe karakterli etiket hiç eşleşmez
+    for field, labels in field_extractor.field_labels.items():
+        for label in labels:
+            if label not in (TEXT_START, LINE_START):
+                assert field_extractor._preprocess_text(label) == label, (field, label)
+
+def test_scan_merges_overlapping_windows():
+    scanner = FieldScanner({"total": ["toplam"]}, window=10)
+
+    spans = scanner.scan("toplam toplam" + " " * 30 + "toplam").spans("total")
+
+    assert spans == [(0, 17), (43, 49)]
+
+def test_scan_reports_missing_and_unlabelled_fields():
+    scanner = FieldScanner({"total": ["toplam"]}, window=10)
+    scan = scanner.scan("fatura")
+
+    assert scan.spans("total") == []
+    assert scan.spans("other") is None
+
+def test_scan_keeps_prefix_labels():
+    scanner = FieldScanner({"tax": ["vergi"], "net": ["vergisiz"]}, window=5)
+
+    scan = scanner.scan("VERGISIZ")
+
+    assert scan.spans("tax") == [(0, 5)]
+    assert scan.spans("net") == [(0, 5)]
+
+def test_scan_lookbehind_and_line_anchors():
+    scanner = FieldScanner({"amount": ["tl"], "line": [LINE_START], "start": [TEXT_START]},
+                           window=4, lookbehind={"amount": 6})
+    text = "abc\n250,00 TL"
+
+    scan = scanner.scan(text)
+
+    assert scan.spans("amount") == [(5, 13)]
+    assert scan.spans("line") == [(0, 8)]
+    assert scan.spans("start") == [(0, 4)]
+
+def test_pattern_rematches_value_cut_at_window_end():
+    pattern = FieldPattern("total", 0, re.compile(r"toplam[:\s]*([0-9.,]+)"), 1)
+    text = "toplam 1.234.567,89"
+
+    match = pattern.first(text, spans=[(0, 10)])
+
+    assert pattern.value(match) == "1.234.567,89"
+
+def test_pattern_falls_back_to_full_text_when_window_has_no_match():
+    pattern = FieldPattern("total", 0, re.compile(r"toplam[:.\s]*([0-9.,]+)"), 1)
+    text = "toplam" + "." * 50 + "12,50"
+
+    assert pattern.value(pattern.first(text, spans=[(0, 10)])) == "12,50"
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models import InvoiceStatus
+
+BASE = datetime(2024, 3, 1, 12, 0, 0)
+
+@pytest.fixture
+def client(db):
+    return TestClient(main.app)
+
+@pytest.fixture
+def invoices(make_invoice):
+    """Beş fatura; ikisi aynı created_at değerini paylaşır (id ile ayrılır)"""
+    created = [BASE, BASE + timedelta(minutes=1), BASE + timedelta(minutes=1),
+               BASE + timedelta(minutes=2), BASE + timedelta(minutes=3)]
+    statuses = [InvoiceStatus.UPLOADED, InvoiceStatus.OCR_PROCESSED, InvoiceStatus.UPLOADED,
+                InvoiceStatus.ERROR, InvoiceStatus.OCR_PROCESSED]
+    return [
+        make_invoice(created_at=created_at, status=status, company_name=f"Firma {n}",
+                     invoice_date=BASE + timedelta(days=n)).id
+        for n, (created_at, status) in enumerate(zip(created, statuses))
+    ]
+
+def pages(client, **params):
+    """Tüm sayfaları X-Next-Cursor ile gez"""
+    ids, sizes, cursor = [], [], None
+    while True:
+        response = client.get("/invoices", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = [invoice["id"] for invoice in response.json()]
+        ids.extend(page)
+        sizes.append(len(page))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return ids, sizes
+
+def newest_first(invoice_ids):
+    # created_at azalan, eşitlikte id azalan
+    order = [4, 3, 2, 1, 0]
+    return [invoice_ids[n] for n in order]
+
+def test_keyset_pages_cover_all_invoices_once(client, invoices):
+    ids, sizes = pages(client, limit=2)
+
+    assert ids == newest_first(invoices)
+    assert sizes == [2, 2, 1]
+
+def test_last_page_has_no_cursor(client, invoices):
+    response = client.get("/invoices", params={"limit": 5})
+
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+def test_cursor_splits_invoices_with_same_created_at(client, invoices):
+    ids, sizes = pages(client, limit=3)
+
+    # 3. sayfa sınırı aynı created_at'e sahip iki faturanın arasına düşer
+    assert ids == newest_first(invoices)
+    assert sizes == [3, 2]
+
+def test_filters_apply_across_pages(client, invoices):
+    ids, _ = pages(client, limit=1, status="uploaded")
+
+    assert ids == [invoices[2], invoices[0]]
+
+def test_date_and_company_filters(client, invoices):
+    response = client.get("/invoices", params={
+        "date_from": (BASE + timedelta(days=1)).isoformat(),
+        "date_to": (BASE + timedelta(days=3)).isoformat(),
+    })
+    assert [invoice["id"] for invoice in response.json()] == [invoices[3], invoices[2], invoices[1]]
+
+    response = client.get("/invoices", params={"company": "firma 4"})
+    assert [invoice["id"] for invoice in response.json()] == [invoices[4]]
+
+def test_company_filter_is_escaped_prefix_match(client, make_invoice):
+    percent = make_invoice(company_name="%50 İndirim Ltd").id
+    underscore = make_invoice(company_name="A_B Ticaret").id
+    make_invoice(company_name="AXB Ticaret")
+    make_invoice(company_name="Yeni A_B Ticaret")
+
+    def company(value):
+        return [invoice["id"] for invoice in client.get("/invoices", params={"company": value}).json()]
+
+    # Önek araması: isim ortasındaki eşleşmeler dönmez, % ve _ düz karakterdir
+    assert company("a_b") == [underscore]
+    assert company("%50") == [percent]
+    assert company("%") == [percent]
+
+def test_invalid_status_is_rejected(client, invoices):
+    assert client.get("/invoices", params={"status": "nope"}).status_code == 422
+
+def test_invalid_cursor_is_rejected(client, invoices):
+    assert client.get("/invoices", params={"cursor": "bm90LWEtY3Vyc29y"}).status_code == 400
@@ -0,0 +1,96 @@
+import multiprocessing
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import jobs
+from models import JobStatus
+from ocr_backends import ocr_backends
+
+class SlowBackend:
+    """Dosyası "hang" ile başlayan belgede takılan motor"""
+
+    def cache_fingerprint(self):
+        return {}
+
+    def process_document(self, content, file_type):
+        if content.startswith(b"hang"):
+            time.sleep(60)
+        return SimpleNamespace(raw_text="Toplam 10,00 TL", confidence=0.9, error=None, words=[], pages=[])
+
+@pytest.fixture
+def engine(monkeypatch):
+    # fork: worker process'ler test modülünde kaydedilen motoru görür
+    monkeypatch.setitem(ocr_backends._factories, "slow", SlowBackend)
+    engine = jobs.OCRJobEngine(max_workers=1, start_method="fork", cache=None)
+    engine.on_complete = lambda job, result: None
+    yield engine
+    engine.shutdown(wait=False)
+
+def document(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def test_run_fails_job_after_timeout_and_replaces_pool(engine, tmp_path):
+    hung = document(tmp_path, "hung.bin", b"hang")
+    started = time.monotonic()
+
+    with pytest.raises(RuntimeError, match="exceeded 1s"):
+        engine.run(1, hung, "bin", backend="slow", timeout=1)
+
+    assert time.monotonic() - started < 10
+    job = engine.get(next(iter(engine._jobs)))
+    assert job.status == JobStatus.FAILED
+
+    # Yeni pool'da sonraki iş çalışır; takılan process sonlandırılır
+    assert engine.run(2, document(tmp_path, "ok.bin", b"ok"), "bin", backend="slow", timeout=10).status == JobStatus.DONE
+    deadline = time.monotonic() + 10
+    while len(multiprocessing.active_children()) > 1 and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert len(multiprocessing.active_children()) == 1
+
+def test_run_without_timeout_waits_for_result(engine, tmp_path):
+    job = engine.run(1, document(tmp_path, "ok.bin", b"ok"), "bin", backend="slow", timeout=0)
+
+    assert job.status == JobStatus.DONE
+
+def test_batch_documents_are_extracted_together(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "OCR_EXTRACTION_BATCH_SIZE", 3)
+    monkeypatch.setattr(jobs, "OCR_EXTRACTION_BATCH_WAIT_MS", 10000)
+    batches = []
+    submit = engine._submit_extraction
+    monkeypatch.setattr(engine, "_submit_extraction", lambda batch: (batches.append(len(batch)), submit(batch)))
+
+    submitted = [
+        engine.submit(n, document(tmp_path, f"{n}.bin", b"ok"), "bin", batch_id="b", backend="slow")
+        for n in range(3)
+    ]
+    assert all(job.wait(10) for job in submitted)
+
+    # Batch dolunca beklemeden tek adımda ayrıştırılır
+    assert batches == [3]
+    assert all(job.status == JobStatus.DONE for job in submitted)
+
+def test_single_upload_does_not_wait_for_extraction_batch(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "OCR_EXTRACTION_BATCH_WAIT_MS", 10000)
+    started = time.monotonic()
+
+    job = engine.run(1, document(tmp_path, "ok.bin", b"ok"), "bin", backend="slow", timeout=10)
+
+    assert job.status == JobStatus.DONE
+    assert time.monotonic() - started < 5
+
+def test_partial_extraction_batch_is_flushed_after_wait(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "OCR_EXTRACTION_BATCH_WAIT_MS", 100)
+    results = {}
+    engine.on_complete = lambda job, result: results.update({job.invoice_id: result})
+
+    submitted = [
+        engine.submit(n, document(tmp_path, f"{n}.bin", b"ok"), "bin", batch_id="b", backend="slow")
+        for n in range(2)
+    ]
+
+    assert all(job.wait(10) for job in submitted)
+    assert {n: results[n]["extracted_fields"]["total_amount"].value for n in results} == {0: 10.0, 1: 10.0}
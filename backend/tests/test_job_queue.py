@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import job_queue as job_queue_module
+from database import SessionLocal
+from job_queue import JobQueue
+from models import JobStatus, QueuedJob
+
+@pytest.fixture
+def queue(db):
+    return JobQueue(session_factory=SessionLocal, visibility_timeout=60)
+
+def enqueue(db, queue, kind="ocr", invoice_id=None, max_attempts=3):
+    job = queue.enqueue(db, kind, invoice_id, {"key": "value"}, max_attempts=max_attempts)
+    db.commit()
+    return job.id
+
+def row(job_id):
+    db = SessionLocal()
+    try:
+        return db.query(QueuedJob).filter(QueuedJob.id == job_id).one()
+    finally:
+        db.close()
+
+def shift(job_id, **columns):
+    """Zaman kolonlarını geriye al (beklemeden kira süresi / backoff dolsun)"""
+    db = SessionLocal()
+    try:
+        db.query(QueuedJob).filter(QueuedJob.id == job_id).update(columns, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def test_lease_marks_job_running(db, queue):
+    job_id = enqueue(db, queue)
+
+    leases = queue.lease("worker-1")
+
+    assert [lease.id for lease in leases] == [job_id]
+    assert leases[0].attempts == 1
+    assert leases[0].payload == {"key": "value"}
+    job = row(job_id)
+    assert job.status == JobStatus.RUNNING
+    assert job.lease_owner == "worker-1"
+    assert job.lease_token == leases[0].lease_token
+    assert queue.lease("worker-2") == []
+
+def test_lease_respects_limit_order_and_kinds(db, queue):
+    first = enqueue(db, queue)
+    erp = enqueue(db, queue, kind="erp")
+    second = enqueue(db, queue)
+
+    assert [lease.id for lease in queue.lease("worker", limit=5, kinds=["ocr"])] == [first, second]
+    assert [lease.id for lease in queue.lease("worker", limit=5)] == [erp]
+    assert queue.lease("worker", limit=0) == []
+
+def test_complete_finishes_job(db, queue):
+    job_id = enqueue(db, queue)
+    lease = queue.lease("worker")[0]
+
+    assert queue.complete(lease) is True
+
+    job = row(job_id)
+    assert job.status == JobStatus.DONE
+    assert job.lease_token is None
+    assert job.finished_at is not None
+
+def test_extend_moves_lease_expiry(db, queue):
+    job_id = enqueue(db, queue)
+    lease = queue.lease("worker")[0]
+    shift(job_id, lease_expires_at=datetime.utcnow() + timedelta(seconds=5))
+
+    queue.extend([lease])
+
+    assert row(job_id).lease_expires_at > datetime.utcnow() + timedelta(seconds=50)
+
+def test_extend_ignores_lost_lease(db, queue):
+    job_id = enqueue(db, queue)
+    lease = queue.lease("worker")[0]
+    expires_at = datetime.utcnow() + timedelta(seconds=5)
+    shift(job_id, lease_expires_at=expires_at)
+    lease.lease_token = "stale"
+
+    queue.extend([lease])
+
+    assert row(job_id).lease_expires_at == expires_at
+
+def test_fail_requeues_with_backoff(db, queue):
+    job_id = enqueue(db, queue)
+    lease = queue.lease("worker")[0]
+    before = datetime.utcnow()
+
+    assert queue.fail(lease, "boom") == JobStatus.QUEUED
+
+    job = row(job_id)
+    assert job.status == JobStatus.QUEUED
+    assert job.last_error == "boom"
+    assert job.lease_token is None
+    assert job.available_at >= before + timedelta(seconds=job_queue_module.JOB_RETRY_BACKOFF * lease.attempts)
+    # Backoff dolana kadar kiralanmaz
+    assert queue.lease("worker") == []
+
+    shift(job_id, available_at=datetime.utcnow() - timedelta(seconds=1))
+    retry = queue.lease("worker")[0]
+    assert retry.attempts == 2
+
+def test_backoff_grows_with_attempts(db, queue):
+    job_id = enqueue(db, queue)
+    delays = []
+    for _ in range(2):
+        lease = queue.lease("worker")[0]
+        now = datetime.utcnow()
+        queue.fail(lease, "boom")
+        delays.append(row(job_id).available_at - now)
+        shift(job_id, available_at=datetime.utcnow() - timedelta(seconds=1))
+
+    assert delays[1] > delays[0]
+
+def test_fail_on_last_attempt_dead_letters(db, queue):
+    dead = []
+    queue.on_dead = lambda lease, error: dead.append((lease.id, error))
+    job_id = enqueue(db, queue, max_attempts=1)
+    lease = queue.lease("worker")[0]
+
+    assert queue.fail(lease, "boom") == JobStatus.DEAD
+
+    job = row(job_id)
+    assert job.status == JobStatus.DEAD
+    assert job.finished_at is not None
+    assert dead == [(job_id, "boom")]
+    assert queue.lease("worker") == []
+
+def test_dead_letter_handler_errors_are_contained(db, queue):
+    def on_dead(lease, error):
+        raise RuntimeError("handler failed")
+
+    queue.on_dead = on_dead
+    job_id = enqueue(db, queue, max_attempts=1)
+
+    assert queue.fail(queue.lease("worker")[0], "boom") == JobStatus.DEAD
+    assert row(job_id).status == JobStatus.DEAD
+
+def test_expired_lease_is_taken_over(db, queue):
+    job_id = enqueue(db, queue)
+    stale = queue.lease("worker-1")[0]
+    shift(job_id, lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    leases = queue.lease("worker-2")
+
+    assert [lease.id for lease in leases] == [job_id]
+    assert leases[0].attempts == 2
+    assert row(job_id).lease_owner == "worker-2"
+    # Eski worker'ın sonucu yazılmaz
+    assert queue.complete(stale) is False
+    assert queue.fail(stale, "late") == JobStatus.QUEUED
+    assert row(job_id).status == JobStatus.RUNNING
+
+def test_expired_lease_without_attempts_left_is_dead_lettered(db, queue):
+    dead = []
+    queue.on_dead = lambda lease, error: dead.append((lease.id, error))
+    job_id = enqueue(db, queue, max_attempts=1)
+    queue.lease("worker-1")
+    shift(job_id, lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    assert queue.lease("worker-2") == []
+
+    job = row(job_id)
+    assert job.status == JobStatus.DEAD
+    assert job.last_error == "Lease expired"
+    assert dead == [(job_id, "Lease expired")]
+
+def test_find_active_returns_queued_or_running_job(db, queue, make_invoice):
+    invoice = make_invoice()
+    assert queue.find_active(db, "ocr", invoice.id) is None
+
+    job_id = enqueue(db, queue, invoice_id=invoice.id)
+    enqueue(db, queue, kind="erp", invoice_id=invoice.id)
+    assert queue.find_active(db, "ocr", invoice.id).id == job_id
+
+    lease = queue.lease("worker", kinds=["ocr"])[0]
+    db.expire_all()
+    assert queue.find_active(db, "ocr", invoice.id).id == job_id
+
+    queue.complete(lease)
+    db.expire_all()
+    assert queue.find_active(db, "ocr", invoice.id) is None
+
+def test_enqueue_many_keeps_item_order(db, queue):
+    ids = queue.enqueue_many(db, "ocr", [{"payload": {"n": n}} for n in range(3)])
+    db.commit()
+
+    assert [row(job_id).payload for job_id in ids] == [{"n": 0}, {"n": 1}, {"n": 2}]
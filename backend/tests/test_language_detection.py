@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from ocr import AIInvoiceOCR, PageResult
+from ocr_cache import OCRResultCache
+
+TURKISH_PILOT = "Fatura Tarihi Ödeme Tutarı Vergi Dairesi Şirket Ünvanı Toplam Tutar KDV"
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = AIInvoiceOCR()
+    engine.language_cache = OCRResultCache(cache_dir=str(tmp_path))
+    engine.pilot_calls = 0
+
+    def pilot(image, config):
+        engine.pilot_calls += 1
+        return engine.pilot_words
+
+    engine.pilot_words = [{"text": word} for word in TURKISH_PILOT.split()]
+    monkeypatch.setattr(engine, "preprocess_image", lambda image: (np.zeros((40, 40), np.uint8), {}, {}))
+    monkeypatch.setattr(engine, "load_page_image", lambda *args: None)
+    monkeypatch.setattr(engine, "_ocr_words", pilot)
+    monkeypatch.setattr(engine, "_text_from_words", lambda words: " ".join(word["text"] for word in words))
+    return engine
+
+def text_page(text):
+    return PageResult(page=1, text=text, confidence=1.0, words=[], source="text_layer")
+
+def test_known_supplier_skips_pilot_ocr(engine):
+    engine.language_cache.put(engine._supplier_key("1234567890"), "eng")
+
+    lang, info = engine.detect_language(b"", "pdf", [], [1], tax_number="1234567890")
+
+    assert (lang, info["source"]) == ("eng", "supplier")
+    assert engine.pilot_calls == 0
+
+def test_supplier_from_text_layer_skips_pilot_ocr(engine):
+    engine.language_cache.put(engine._supplier_key("1234567890"), "tur")
+
+    lang, info = engine.detect_language(b"", "pdf", [text_page("VKN: 1234567890")], [2])
+
+    assert (lang, info["source"]) == ("tur", "supplier")
+    assert engine.pilot_calls == 0
+
+def test_pilot_decision_is_stored_for_known_supplier(engine):
+    lang, info = engine.detect_language(b"", "pdf", [], [1], tax_number="1234567890")
+
+    assert info["source"] == "pilot"
+    assert engine.pilot_calls == 1
+    assert engine.language_cache.get(engine._supplier_key("1234567890")) == lang
+
+    # Aynı tedarikçinin sonraki belgesi pilot OCR'sız
+    again, info = engine.detect_language(b"", "pdf", [], [1], tax_number="1234567890")
+    assert (again, info["source"]) == (lang, "supplier")
+    assert engine.pilot_calls == 1
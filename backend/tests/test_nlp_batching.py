@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import pytest
+
+from field_extractor import AdvancedFieldExtractor
+
+COMPLETE = """ABC ENERJİ SANAYİ VE TİCARET A.Ş.
+Vergi No: 1234567890
+Fatura No: ABC2024000123
+Tarih: 15.03.2024
+Genel Toplam: 295,00 TL"""
+
+class FakeNLP:
+    """nlp.pipe çağrılarını kaydeden spaCy yerine geçen pipeline"""
+
+    def __init__(self):
+        self.calls = []
+
+    def pipe(self, texts, batch_size):
+        texts = list(texts)
+        self.calls.append((texts, batch_size))
+        return [SimpleNamespace(ents=[]) for _ in texts]
+
+    def __call__(self, text):
+        raise AssertionError("documents must go through nlp.pipe")
+
+@pytest.fixture
+def extractor():
+    extractor = AdvancedFieldExtractor()
+    extractor._nlp, extractor._nlp_loaded = FakeNLP(), True
+    return extractor
+
+def test_only_documents_needing_ner_are_piped_together(extractor):
+    texts = [COMPLETE, "Market fişi\nbir şey", "Sadece metin"]
+
+    results = extractor.extract_batch(texts, batch_size=8)
+
+    assert len(extractor.nlp.calls) == 1
+    piped, batch_size = extractor.nlp.calls[0]
+    assert batch_size == 8
+    assert piped == [extractor._preprocess_text(text) for text in texts[1:]]
+    assert results[0]["tax_number"].value == "1234567890"
+
+def test_single_document_is_a_batch_of_one(extractor):
+    assert extractor.extract_all_fields(COMPLETE).keys() == extractor.extract_batch([COMPLETE])[0].keys()
+    assert extractor.nlp.calls == []
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+import ocr_cache as ocr_cache_module
+from ocr_cache import OCRResultCache
+
+FINGERPRINT = {"engine": "AIInvoiceOCR", "tesseract_config": "--oem 3 --psm 6", "preprocessing": {"deskew": True}}
+
+@pytest.fixture
+def cache(tmp_path):
+    return OCRResultCache(cache_dir=str(tmp_path), memory_items=2, disk_max_bytes=10 * 1024 * 1024)
+
+def entries(directory):
+    return [name for _, _, files in os.walk(directory) for name in files if name.endswith(".bin")]
+
+def test_key_is_stable_and_ignores_fingerprint_order():
+    reordered = dict(reversed(list(FINGERPRINT.items())))
+
+    assert OCRResultCache.make_key("abc", FINGERPRINT) == OCRResultCache.make_key("abc", reordered)
+
+def test_key_changes_with_content_and_engine_configuration():
+    key = OCRResultCache.make_key("abc", FINGERPRINT)
+
+    assert OCRResultCache.make_key("abd", FINGERPRINT) != key
+    assert OCRResultCache.make_key("abc", {**FINGERPRINT, "tesseract_config": "--oem 1 --psm 6"}) != key
+    assert OCRResultCache.make_key("abc", {**FINGERPRINT, "preprocessing": {"deskew": False}}) != key
+
+def test_key_changes_with_format_version(monkeypatch):
+    key = OCRResultCache.make_key("abc", FINGERPRINT)
+
+    monkeypatch.setattr(ocr_cache_module, "CACHE_FORMAT_VERSION", ocr_cache_module.CACHE_FORMAT_VERSION + 1)
+
+    assert OCRResultCache.make_key("abc", FINGERPRINT) != key
+
+def test_engine_fingerprint_tracks_preprocessing_parameters():
+    from ocr import AIInvoiceOCR
+
+    engine = AIInvoiceOCR()
+    key = OCRResultCache.make_key("abc", engine.cache_fingerprint())
+    engine.preprocess_params = {**engine.preprocess_params, "target_text_height": 32}
+
+    assert OCRResultCache.make_key("abc", engine.cache_fingerprint()) != key
+
+def test_get_returns_value_from_memory_then_disk(cache, tmp_path):
+    cache.put("a" * 64, {"text": "fatura"})
+
+    assert cache.get("a" * 64) == {"text": "fatura"}
+    assert cache.stats()["memory_hits"] == 1
+
+    # Yeni instance sadece diskten okuyabilir
+    fresh = OCRResultCache(cache_dir=str(tmp_path))
+    assert fresh.get("a" * 64) == {"text": "fatura"}
+    assert fresh.get("a" * 64) == {"text": "fatura"}
+    stats = fresh.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+def test_miss_is_counted(cache):
+    assert cache.get("b" * 64) is None
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_rate"] == 0.0
+
+def test_memory_layer_is_bounded_lru(cache):
+    for key in ("a" * 64, "b" * 64, "c" * 64):
+        cache.put(key, key[0])
+
+    assert list(cache._memory) == ["b" * 64, "c" * 64]
+    # Bellekten düşen girdi diskten okunur
+    assert cache.get("a" * 64) == "a"
+    assert cache.stats()["disk_hits"] == 1
+
+def test_corrupt_disk_entry_is_removed(cache, tmp_path):
+    cache.put("a" * 64, "value")
+    path = cache._path("a" * 64)
+    with open(path, "wb") as f:
+        f.write(b"not zlib")
+
+    assert OCRResultCache(cache_dir=str(tmp_path)).get("a" * 64) is None
+    assert not os.path.exists(path)
+
+def test_disk_layer_evicts_oldest_entries(tmp_path):
+    cache = OCRResultCache(cache_dir=str(tmp_path), memory_items=1, disk_max_bytes=3000)
+    keys = [f"{n:02d}" + "0" * 62 for n in range(5)]
+    for n, key in enumerate(keys):
+        cache.put(key, os.urandom(1000))
+        os.utime(cache._path(key), (n, n))
+
+    remaining = entries(tmp_path)
+    assert cache.stats()["disk_bytes"] <= 3000
+    assert cache.stats()["evictions"] > 0
+    assert f"{keys[-1]}.bin" in remaining
+    assert f"{keys[0]}.bin" not in remaining
+
+def test_language_decisions_are_stored_outside_result_cache():
+    from ocr import AIInvoiceOCR
+
+    results = OCRResultCache(cache_dir=ocr_cache_module.OCR_CACHE_DIR)
+    engine = AIInvoiceOCR()
+    before = results.stats()["disk_bytes"]
+    engine.language_cache.put("b" * 64, "tur")
+
+    language_dir = os.path.abspath(engine.language_cache.cache_dir)
+    assert os.path.dirname(language_dir) == os.path.dirname(os.path.abspath(results.cache_dir))
+    assert language_dir != os.path.abspath(results.cache_dir)
+    assert results.stats()["disk_bytes"] == before
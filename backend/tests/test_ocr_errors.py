@@ -0,0 +1,61 @@
+import io
+import pickle
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import jobs
+import ocr_backup
+from ocr import ocr_engine
+
+class UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__("binary missing")
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("L", (200, 100), 255).save(buffer, "PNG")
+    return buffer.getvalue()
+
+def fail(*args, **kwargs):
+    raise RuntimeError("tesseract failed")
+
+def test_recognize_propagates_tesseract_errors(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "_ocr_words", fail)
+
+    with pytest.raises(RuntimeError, match="tesseract failed"):
+        ocr_engine.recognize(np.full((50, 50), 255, np.uint8), 1.0, {})
+
+def test_process_document_reports_error(monkeypatch):
+    monkeypatch.setattr(ocr_engine, "_ocr_words", fail)
+    monkeypatch.setattr(ocr_engine, "detect_language", lambda *args, **kwargs: ("eng", {"source": "default"}))
+
+    result = ocr_engine.process_document(png_bytes(), "png")
+
+    assert result.error == "tesseract failed"
+
+def test_legacy_backend_reports_error(monkeypatch):
+    monkeypatch.setattr(ocr_backup.pytesseract, "image_to_string", fail)
+
+    result = ocr_backup.ocr_engine.process_document(png_bytes(), "png")
+
+    assert result.error == "tesseract failed"
+    assert result.raw_text == ""
+
+def test_worker_errors_are_made_picklable():
+    @jobs._portable_errors
+    def job():
+        raise UnpicklableError()
+
+    with pytest.raises(jobs.WorkerError, match="UnpicklableError: binary missing") as raised:
+        job()
+    assert isinstance(pickle.loads(pickle.dumps(raised.value)), jobs.WorkerError)
+
+def test_picklable_worker_errors_are_kept():
+    @jobs._portable_errors
+    def job():
+        raise ValueError("bad page")
+
+    with pytest.raises(ValueError, match="bad page"):
+        job()
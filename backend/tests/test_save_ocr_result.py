@@ -0,0 +1,67 @@
+import threading
+from types import SimpleNamespace
+
+import main
+from field_extractor import ExtractedField
+from models import InvoiceLineItem, InvoiceStatus
+
+def ocr_output(descriptions):
+    items = [
+        {"description": description, "quantity": 1.0, "unit_price": 10.0, "total": 10.0,
+         "additional_data": {"page": 1}}
+        for description in descriptions
+    ]
+    fields = {"total_amount": ExtractedField(10.0 * len(items), 0.9, "", "regex")}
+    if items:
+        fields["line_items"] = ExtractedField(items, 0.95, "", "layout")
+    return {"ocr_result": SimpleNamespace(raw_text="Toplam", confidence=0.9), "extracted_fields": fields}
+
+def job_for(invoice_id):
+    return SimpleNamespace(invoice_id=invoice_id, batch_id=None)
+
+def line_items(db, invoice_id):
+    db.expire_all()
+    return [
+        item.description for item in
+        db.query(InvoiceLineItem).filter(InvoiceLineItem.invoice_id == invoice_id).order_by(InvoiceLineItem.id)
+    ]
+
+def test_result_is_saved(db, make_invoice):
+    invoice = make_invoice()
+
+    main.save_ocr_result(job_for(invoice.id), ocr_output(["a", "b"]))
+
+    db.expire_all()
+    assert invoice.status == InvoiceStatus.OCR_PROCESSED
+    assert invoice.total_amount == 20.0
+    assert invoice.extracted_fields["line_items"]["method"] == "layout"
+    assert line_items(db, invoice.id) == ["a", "b"]
+
+def test_reprocessing_replaces_line_items(db, make_invoice):
+    invoice = make_invoice()
+    other = make_invoice()
+    main.save_ocr_result(job_for(other.id), ocr_output(["other"]))
+
+    main.save_ocr_result(job_for(invoice.id), ocr_output(["a", "b", "c"]))
+    main.save_ocr_result(job_for(invoice.id), ocr_output(["d"]))
+
+    assert line_items(db, invoice.id) == ["d"]
+    assert line_items(db, other.id) == ["other"]
+
+    main.save_ocr_result(job_for(invoice.id), ocr_output([]))
+    assert line_items(db, invoice.id) == []
+
+def test_concurrent_results_do_not_duplicate_line_items(db, make_invoice):
+    invoice = make_invoice()
+    main.save_ocr_result(job_for(invoice.id), ocr_output(["a", "b", "c"]))
+
+    threads = [
+        threading.Thread(target=main.save_ocr_result, args=(job_for(invoice.id), ocr_output(["a", "b", "c"])))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert line_items(db, invoice.id) == ["a", "b", "c"]
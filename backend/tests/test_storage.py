@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import io
+import os
+import zipfile
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from storage import (
+    InvalidUpload, TooManyFiles, UnsupportedFileType, UploadTooLarge,
+    _copy_stream, content_path, receive_upload, save_batch, sniff_file_type
+)
+
+PDF = b"%PDF-1.4\n" + b"x" * 5000
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+class StreamRequest:
+    """receive_upload için gövdeyi parça parça veren istek"""
+
+    def __init__(self, body: bytes, content_type: str, chunk_size: int = 1000):
+        self.headers = {"content-type": content_type}
+        self.chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        self.consumed = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+def multipart(content: bytes, field: str = "file", filename: str = "invoice.pdf", trailer: bytes = b""):
+    boundary = "testboundary"
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}\r\n".encode() + (
+        b'Content-Disposition: form-data; name="note"\r\n\r\n' + trailer + f"\r\n--{boundary}--\r\n".encode()
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+def leftovers(directory):
+    return [name for _, _, files in os.walk(directory) for name in files if name.endswith(".part")]
+
+@pytest.mark.parametrize("head, expected", [
+    (b"%PDF-1.7", "pdf"),
+    (b"\x89PNG\r\n\x1a\n....", "png"),
+    (b"\xff\xd8\xff\xe0", "jpg"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+    (b"PK\x03\x04", None),
+    (b"", None),
+])
+def test_sniff_file_type(head, expected):
+    assert sniff_file_type(head) == expected
+
+def test_copy_stream_stores_by_content_hash(tmp_path):
+    stored = _copy_stream(io.BytesIO(PDF), str(tmp_path), max_bytes=len(PDF))
+
+    digest = hashlib.sha256(PDF).hexdigest()
+    assert stored.sha256 == digest
+    assert stored.size == len(PDF)
+    assert stored.file_type == "pdf"
+    assert stored.path == content_path(digest, "pdf", str(tmp_path))
+    with open(stored.path, "rb") as f:
+        assert f.read() == PDF
+
+    # Aynı içerik aynı dosyaya düşer, geçici dosya kalmaz
+    assert _copy_stream(io.BytesIO(PDF), str(tmp_path), max_bytes=len(PDF)).path == stored.path
+    assert leftovers(tmp_path) == []
+
+def test_copy_stream_sniffs_type_ignoring_name(tmp_path):
+    assert _copy_stream(io.BytesIO(PNG), str(tmp_path), max_bytes=1000).file_type == "png"
+
+def test_copy_stream_rejects_oversized_file(tmp_path):
+    with pytest.raises(UploadTooLarge):
+        _copy_stream(io.BytesIO(PDF), str(tmp_path), max_bytes=len(PDF) - 1)
+    assert leftovers(tmp_path) == []
+
+def test_copy_stream_rejects_unknown_type(tmp_path):
+    with pytest.raises(UnsupportedFileType):
+        _copy_stream(io.BytesIO(b"plain text"), str(tmp_path), max_bytes=1000)
+    assert leftovers(tmp_path) == []
+
+def test_receive_upload_streams_file_part(tmp_path):
+    body, content_type = multipart(PDF)
+    request = StreamRequest(body, content_type)
+
+    received = asyncio.run(receive_upload(request, dest_dir=str(tmp_path), max_bytes=len(PDF)))
+
+    assert received.filename == "invoice.pdf"
+    assert received.content_type == "application/pdf"
+    assert received.stored.sha256 == hashlib.sha256(PDF).hexdigest()
+    with open(received.stored.path, "rb") as f:
+        assert f.read() == PDF
+
+def test_receive_upload_stops_reading_after_file_part(tmp_path):
+    body, content_type = multipart(PDF, trailer=b"y" * 20000)
+    request = StreamRequest(body, content_type)
+
+    asyncio.run(receive_upload(request, dest_dir=str(tmp_path), max_bytes=len(PDF)))
+
+    assert request.consumed < len(request.chunks)
+
+def test_receive_upload_stops_at_size_limit(tmp_path):
+    body, content_type = multipart(PDF * 20)
+    request = StreamRequest(body, content_type)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_upload(request, dest_dir=str(tmp_path), max_bytes=len(PDF)))
+
+    assert request.consumed < len(request.chunks)
+    assert leftovers(tmp_path) == []
+
+def test_receive_upload_requires_multipart(tmp_path):
+    request = StreamRequest(PDF, "application/pdf")
+
+    with pytest.raises(InvalidUpload):
+        asyncio.run(receive_upload(request, dest_dir=str(tmp_path)))
+
+def test_receive_upload_requires_file_field(tmp_path):
+    body, content_type = multipart(PDF, field="other")
+
+    with pytest.raises(InvalidUpload):
+        asyncio.run(receive_upload(StreamRequest(body, content_type), dest_dir=str(tmp_path)))
+    assert leftovers(tmp_path) == []
+
+def test_receive_upload_rejects_truncated_body(tmp_path):
+    body, content_type = multipart(PDF)
+
+    with pytest.raises(InvalidUpload):
+        asyncio.run(receive_upload(StreamRequest(body[:len(body) // 2], content_type), dest_dir=str(tmp_path)))
+    assert leftovers(tmp_path) == []
+
+def zip_upload(members, filename="batch.zip"):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            if name.endswith("/"):
+                archive.writestr(zipfile.ZipInfo(name), b"")
+            else:
+                archive.writestr(name, content)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename=filename)
+
+def damaged_zip(name, content, damage):
+    """Tek üyeli (sıkıştırmasız) ZIP; damage ham byte'ları bozar"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(name, content)
+    data = bytearray(buffer.getvalue())
+    damage(data)
+    return UploadFile(file=io.BytesIO(bytes(data)), filename="damaged.zip")
+
+def encrypt_flag(data):
+    # Yerel ve merkezi başlıktaki "şifreli" bayrağı
+    data[6] |= 1
+    data[data.index(b"PK\x01\x02") + 8] |= 1
+
+def flip_content_byte(data):
+    data[data.index(PNG) + len(PNG) - 1] ^= 0xFF
+
+class FailingFile(io.BytesIO):
+    """İmza okunabilen ama içeriği okunurken hata veren dosya"""
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > len(b"PK\x03\x04"):
+            raise OSError("disk read failed")
+        return super().read(size)
+
+def file_upload(content, filename="invoice.pdf"):
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+def stored_files(directory):
+    return sorted(name for _, _, files in os.walk(directory) for name in files)
+
+def test_save_batch_stores_files_and_zip_members(tmp_path):
+    files = [
+        file_upload(PDF),
+        zip_upload({
+            "scans/": b"",
+            "scans/a.png": PNG,
+            "scans/notes.txt": b"plain text",
+            "__MACOSX/scans/._a.png": b"meta",
+            ".DS_Store": b"meta",
+        }),
+    ]
+
+    entries = asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_bytes=len(PDF), max_files=10))
+
+    assert [entry.filename for entry in entries] == ["invoice.pdf", "batch.zip/scans/a.png", "batch.zip/scans/notes.txt"]
+    assert [entry.stored.file_type if entry.stored else entry.error for entry in entries] == [
+        "pdf", "png", "Unsupported file type"
+    ]
+    assert len(stored_files(tmp_path)) == 2
+
+def test_save_batch_applies_size_limit_to_zip_members(tmp_path):
+    files = [zip_upload({"big.pdf": PDF, "small.png": PNG})]
+
+    entries = asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_bytes=len(PNG), max_files=10))
+
+    assert entries[0].error == f"File exceeds {len(PNG)} bytes"
+    assert entries[1].stored.file_type == "png"
+    assert leftovers(tmp_path) == []
+
+def test_save_batch_reports_invalid_zip(tmp_path):
+    files = [file_upload(b"PK\x03\x04 truncated", filename="broken.zip")]
+
+    entries = asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_files=10))
+
+    assert entries[0].filename == "broken.zip"
+    assert entries[0].error.startswith("Invalid ZIP archive")
+
+def test_save_batch_counts_zip_members_against_file_limit(tmp_path):
+    files = [file_upload(PDF), zip_upload({f"{n}.png": PNG + bytes([n]) for n in range(3)})]
+
+    with pytest.raises(TooManyFiles):
+        asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_files=3))
+
+    # Sınırı aşan batch'ten diskte dosya kalmaz
+    assert stored_files(tmp_path) == []
+
+def test_save_batch_accepts_batch_at_file_limit(tmp_path):
+    files = [file_upload(PDF), zip_upload({f"{n}.png": PNG + bytes([n]) for n in range(2)})]
+
+    entries = asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_files=3))
+
+    assert all(entry.stored for entry in entries)
+    assert len(stored_files(tmp_path)) == 3
+
+@pytest.mark.parametrize("damage, reason", [
+    (encrypt_flag, "encrypted"),
+    (flip_content_byte, "Bad CRC-32"),
+])
+def test_save_batch_rejects_unreadable_zip_member(tmp_path, damage, reason):
+    files = [file_upload(PDF), damaged_zip("scan.png", PNG, damage)]
+
+    entries = asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_files=10))
+
+    assert entries[0].stored.file_type == "pdf"
+    assert entries[1].filename == "damaged.zip/scan.png"
+    assert entries[1].stored is None
+    assert entries[1].error.startswith("Unreadable ZIP member") and reason in entries[1].error
+    assert leftovers(tmp_path) == []
+
+def test_save_batch_removes_new_files_when_batch_fails(tmp_path):
+    existing = asyncio.run(save_batch([file_upload(PNG)], dest_dir=str(tmp_path), max_files=10))[0].stored
+    files = [file_upload(PNG), file_upload(PDF), UploadFile(file=FailingFile(b"%PDF"), filename="bad.pdf")]
+
+    with pytest.raises(OSError):
+        asyncio.run(save_batch(files, dest_dir=str(tmp_path), max_files=10))
+
+    # Batch'in yeni yazdığı PDF silinir; önceden var olan PNG yerinde kalır
+    assert stored_files(tmp_path) == [os.path.basename(existing.path)]
+
+def test_batch_endpoint_limits_chunked_body(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    monkeypatch.setattr(main, "MAX_BATCH_UPLOAD_BYTES", len(PDF) * 10)
+    body, content_type = multipart(PDF * 100, field="files")
+
+    # Content-Length olmadan (chunked) gönderilen gövde okunurken kesilir
+    chunks = (body[i:i + 4096] for i in range(0, len(body), 4096))
+    response = TestClient(main.app).post("/upload/batch", content=chunks, headers={"content-type": content_type})
+
+    assert response.status_code == 413
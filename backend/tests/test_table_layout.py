@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from field_extractor import field_extractor
+from table_layout import assign_columns, cluster_positions, cluster_rows, median_height, split_cells
+
+def row(top, cells, page=1, height=20):
+    """(metin, sol) hücrelerinden kelime kutuları; kelimeler hücre içinde 6px arayla dizilir"""
+    words = []
+    for text, left in cells:
+        for token in text.split(" "):
+            words.append({"text": token, "left": left, "top": top, "width": 10 * len(token),
+                          "height": height, "page": page, "conf": 90})
+            left += 10 * len(token) + 6
+    return words
+
+HEADER = [("Açıklama", 20), ("Miktar", 300), ("Birim Fiyat", 400), ("Tutar", 560)]
+
+def table(page=1, header=True):
+    return (
+        row(10, [("ACME LTD", 20)], page)
+        + (row(60, HEADER, page) if header else [])
+        + row(100, [("Kalem bir", 20), ("2", 330), ("100,00", 410), ("200,00", 560)], page)
+        + row(140, [("Kalem iki", 20), ("1", 330), ("1.000,00", 400), ("1.000,00", 560)], page)
+        + row(190, [("Kalem üç", 20), ("3", 330), ("10,00", 410), ("30,00", 560)], page)
+        + row(240, [("Toplam", 400), ("1.230,00", 560)], page)
+    )
+
+def summary(items):
+    return [(item["description"], item["quantity"], item["unit_price"], item["total"]) for item in items]
+
+EXPECTED = [("Kalem bir", 2.0, 100.0, 200.0), ("Kalem iki", 1.0, 1000.0, 1000.0), ("Kalem üç", 3.0, 10.0, 30.0)]
+
+def test_cluster_rows_groups_words_by_baseline():
+    words = row(100, [("b", 200)]) + row(103, [("a", 20)]) + row(160, [("c", 20)]) + row(100, [("d", 20)], page=2)
+
+    rows = cluster_rows(words)
+
+    assert [(r.page, r.text) for r in rows] == [(1, "a b"), (1, "c"), (2, "d")]
+    assert (rows[0].top, rows[0].bottom, rows[0].left, rows[0].right) == (100, 123, 20, 210)
+
+def test_cluster_rows_handles_no_words():
+    assert cluster_rows([]) == []
+    assert median_height([]) == 0.0
+
+def test_cluster_positions_labels_in_input_order():
+    labels = cluster_positions(np.array([300, 10, 305, 20, 600]), gap=15)
+
+    assert labels.tolist() == [1, 0, 1, 0, 2]
+    assert cluster_positions(np.array([]), gap=15).size == 0
+
+def test_split_cells_and_assign_columns():
+    words = row(0, [("Birim Fiyat", 100), ("Tutar", 300)])
+    cells = split_cells(cluster_rows(words)[0], gap=20)
+
+    assert [[word["text"] for word in cell] for cell in cells] == [["Birim", "Fiyat"], ["Tutar"]]
+    assert assign_columns(words, np.array([250.0])).tolist() == [0, 0, 1]
+
+def test_header_table_items():
+    items, confidence = field_extractor._extract_line_items_from_words(table())
+
+    assert summary(items) == EXPECTED
+    assert all(item["additional_data"]["consistent"] for item in items)
+    assert items[0]["additional_data"]["page"] == 1
+    assert confidence == 0.95
+
+def test_description_continuation_is_merged():
+    words = table() + row(163, [("devam", 20)])
+
+    items, _ = field_extractor._extract_line_items_from_words(words)
+
+    assert [item["description"] for item in items] == ["Kalem bir", "Kalem iki devam", "Kalem üç"]
+
+def test_rows_after_total_are_not_items():
+    words = table() + row(300, [("Not", 20), ("5", 330), ("1,00", 410), ("5,00", 560)])
+
+    items, _ = field_extractor._extract_line_items_from_words(words)
+
+    assert summary(items) == EXPECTED
+
+def test_headerless_table_uses_numeric_columns():
+    words = table(header=False) + row(120, [("Kargo", 20), ("1", 330), ("9,00", 410), ("7,00", 560)])
+
+    items, _ = field_extractor._extract_line_items_from_words(words)
+
+    # Başlık yokken sadece miktar x birim fiyat = tutar tutan satırlar kalem sayılır
+    assert summary(items) == EXPECTED
+
+def test_layout_items_beat_text_parser_on_thousands():
+    words = table()
+    text = "\n".join(r.text for r in cluster_rows(words))
+
+    results = field_extractor.extract_all_fields(text, words)
+
+    assert results["line_items"].method == "layout"
+    assert summary(results["line_items"].value) == EXPECTED
+
+@pytest.mark.parametrize("words", [[], [{"text": "x"}]])
+def test_invalid_boxes_give_no_items(words):
+    assert field_extractor._extract_line_items_from_words(words) == ([], 0.0)
@@ -0,0 +1,98 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import ocr
+from ocr import AIInvoiceOCR, TesseractRunner
+
+class FakeAPI:
+    """Açılış/kapanışları sayan tesserocr.PyTessBaseAPI yerine geçen handle"""
+    opened = []
+
+    def __init__(self, lang, psm, oem):
+        self.lang = lang
+        self.ended = False
+        self.fail = False
+        FakeAPI.opened.append(self)
+
+    def SetVariable(self, name, value):
+        pass
+
+    def SetImageBytes(self, *args):
+        pass
+
+    def Recognize(self):
+        if self.ended:
+            raise AssertionError("handle used after End()")
+        if self.fail:
+            raise RuntimeError("tesseract crashed")
+
+    def GetTSVText(self, page):
+        return "5\t1\t1\t1\t1\t1\t0\t0\t10\t10\t96.0\tToplam"
+
+    def Clear(self):
+        pass
+
+    def End(self):
+        self.ended = True
+
+@pytest.fixture
+def runner(monkeypatch):
+    FakeAPI.opened = []
+    monkeypatch.setattr(ocr, "TESSEROCR_AVAILABLE", True)
+    monkeypatch.setattr(ocr, "tesserocr", SimpleNamespace(PyTessBaseAPI=FakeAPI))
+    return TesseractRunner(backend="tesserocr", max_handles=2)
+
+IMAGE = np.zeros((10, 10), dtype=np.uint8)
+
+def config(lang):
+    return f"--oem 3 --psm 6 -l {lang}"
+
+def test_handles_are_reused_per_thread_and_evicted_lru(runner):
+    for lang in ["tur", "eng", "tur", "deu"]:
+        assert runner.image_to_data(IMAGE, config(lang))["text"] == ["Toplam"]
+
+    # tur tekrar kullanıldığı için en eski handle eng; deu açılınca o kapanır
+    assert [(api.lang, api.ended) for api in FakeAPI.opened] == [("tur", False), ("eng", True), ("deu", False)]
+
+def test_threads_do_not_share_handles(runner):
+    runner.image_to_data(IMAGE, config("tur"))
+    thread = threading.Thread(target=runner.image_to_data, args=(IMAGE, config("tur")))
+    thread.start()
+    thread.join()
+
+    assert len(FakeAPI.opened) == 2
+
+def test_fallback_leaves_other_threads_handles_to_their_owner(runner, monkeypatch):
+    monkeypatch.setattr(ocr.pytesseract, "image_to_data", lambda *args, **kwargs: {"text": ["binary"]})
+    other_ready, fallback_done = threading.Event(), threading.Event()
+    results = []
+
+    def other_thread():
+        runner.image_to_data(IMAGE, config("tur"))
+        other_ready.set()
+        fallback_done.wait()
+        # Handle'ı hâlâ açıkken fallback oldu; bu thread'in sonraki çağrısı handle'ını kendisi kapatır
+        results.append(FakeAPI.opened[0].ended)
+        results.append(runner.image_to_data(IMAGE, config("tur"))["text"])
+        results.append(FakeAPI.opened[0].ended)
+
+    thread = threading.Thread(target=other_thread)
+    thread.start()
+    other_ready.wait()
+
+    runner._get_api(config("tur")).fail = True
+    assert runner.image_to_data(IMAGE, config("tur"))["text"] == ["binary"]
+    assert runner.backend == "pytesseract"
+    fallback_done.set()
+    thread.join()
+
+    assert results == [False, ["binary"], True]
+    assert FakeAPI.opened[1].ended
+
+def test_page_pool_is_shared_across_documents():
+    engine = AIInvoiceOCR()
+
+    assert engine.page_pool() is engine.page_pool()
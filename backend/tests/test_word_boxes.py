@@ -0,0 +1,52 @@
+import cv2
+import numpy as np
+import pytest
+
+from ocr import ocr_engine
+
+HEIGHT, WIDTH = 1200, 900
+# Orijinal görüntüdeki kelime kutusu (sol, üst, genişlik, yükseklik)
+BOX = (300, 200, 180, 40)
+ROTATIONS = {90: cv2.ROTATE_90_CLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_COUNTERCLOCKWISE}
+
+def preprocess(scale, rotation, skew):
+    """Ön işleme adımlarını (ölçekleme, döndürme, eğiklik düzeltmesi) sentetik sayfaya uygula"""
+    left, top, width, height = BOX
+    image = np.full((HEIGHT, WIDTH), 255, np.uint8)
+    image[top:top + height, left:left + width] = 0
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if rotation:
+        image = cv2.rotate(image, ROTATIONS[rotation])
+    if skew:
+        h, w = image.shape
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), -skew, 1.0)
+        image = cv2.warpAffine(image, matrix, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return image
+
+def detected_word(image):
+    ys, xs = np.nonzero(image < 128)
+    return {"left": int(xs.min()), "top": int(ys.min()),
+            "width": int(xs.max() - xs.min() + 1), "height": int(ys.max() - ys.min() + 1)}
+
+@pytest.mark.parametrize("rotation", [0, 90, 180, 270])
+@pytest.mark.parametrize("skew", [0.0, 2.5, -3.0])
+@pytest.mark.parametrize("scale", [1.0, 0.5, 1.7])
+def test_words_map_back_to_original_page(scale, rotation, skew):
+    image = preprocess(scale, rotation, skew)
+    word = detected_word(image)
+
+    ocr_engine._words_to_original([word], {"scale": scale, "rotation": rotation, "skew": skew}, image.shape)
+
+    left, top, width, height = BOX
+    center = (word["left"] + word["width"] / 2, word["top"] + word["height"] / 2)
+    assert center == pytest.approx((left + width / 2, top + height / 2), abs=3)
+    if not skew:
+        assert (word["width"], word["height"]) == pytest.approx((width, height), abs=3)
+
+def test_boxes_are_unchanged_without_preprocessing():
+    word = {"left": 10, "top": 20, "width": 30, "height": 40}
+
+    ocr_engine._words_to_original([word], {"scale": 1.0, "rotation": 0, "skew": 0.0}, (100, 100))
+
+    assert word == {"left": 10, "top": 20, "width": 30, "height": 40}
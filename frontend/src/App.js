@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import "./App.css";
+import { API_BASE, subscribeToInvoice, isFinalStage, preprocessedImageUrl } from "./api";
 
 function App() {
   const [file, setFile] = useState(null);
@@ -8,8 +9,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [recentInvoices, setRecentInvoices] = useState([]);
-
-  const API_BASE = "http://localhost:8000";
+  const [stage, setStage] = useState(null);
 
   useEffect(() => {
     // Sayfa yüklendiğinde son faturaları getir
@@ -33,6 +33,7 @@ function App() {
     }
 
     setLoading(true);
+    setStage(null);
     setError(null);
 
     try {
@@ -51,13 +52,8 @@ function App() {
       const uploadData = await uploadRes.json();
       setCurrentInvoice(uploadData);
 
-      // OCR işlemini başlat
-      await fetch(`${API_BASE}/process/${uploadData.id}`, {
-        method: "POST",
-      });
-
-      // Sonuçları bekle
-      pollForResults(uploadData.id);
+      // OCR işi upload ile kuyruğa alınır; aşamaları dinle
+      watchProgress(uploadData.id);
       
     } catch (err) {
       setError(`Upload hatası: ${err.message}`);
@@ -65,41 +61,37 @@ function App() {
     }
   };
 
-  const pollForResults = async (invoiceId) => {
-    const maxAttempts = 30; // 30 saniye max bekleme
-    let attempts = 0;
+  const watchProgress = (invoiceId) => {
+    let finished = false;
 
-    const poll = async () => {
-      attempts++;
-      
-      try {
-        const res = await fetch(`${API_BASE}/results/${invoiceId}`);
-        const data = await res.json();
+    subscribeToInvoice(
+      invoiceId,
+      async (event) => {
+        setStage(event.stage);
+        if (!isFinalStage(event.stage)) return;
 
-        if (data.status === "ocr_processed" || data.status === "validated") {
-          setInvoiceResults(data);
-          setLoading(false);
-          fetchRecentInvoices(); // Listeyi yenile
-          return;
-        } else if (data.status === "error") {
+        finished = true;
+        if (event.stage === "error") {
           setError("OCR işlemi sırasında hata oluştu");
           setLoading(false);
           return;
         }
 
-        if (attempts < maxAttempts) {
-          setTimeout(poll, 1000); // 1 saniye sonra tekrar dene
-        } else {
-          setError("İşlem zaman aşımına uğradı");
-          setLoading(false);
+        try {
+          const res = await fetch(`${API_BASE}/results/${invoiceId}`);
+          setInvoiceResults(await res.json());
+          fetchRecentInvoices(); // Listeyi yenile
+        } catch (err) {
+          setError(`Sonuç alınamadı: ${err.message}`);
         }
-      } catch (err) {
-        setError(`Sonuç alınamadı: ${err.message}`);
+        setLoading(false);
+      },
+      () => {
+        if (finished) return;
+        setError("İşlem durumu takip edilemedi");
         setLoading(false);
       }
-    };
-
-    poll();
+    );
   };
 
   const handleFieldValidation = async (fieldName, value) => {
@@ -195,6 +187,16 @@ function App() {
     return texts[status] || status;
   };
 
+  const getStageText = (stage) => {
+    const texts = {
+      uploaded: "Sırada...",
+      preprocessing: "Ön işleme...",
+      ocr: "OCR...",
+      extraction: "Alanlar ayrıştırılıyor..."
+    };
+    return texts[stage] || "İşleniyor...";
+  };
+
   return (
     <div className="App">
       <header className="app-header">
@@ -218,7 +220,7 @@ function App() {
               disabled={!file || loading}
               className="upload-btn"
             >
-              {loading ? "⏳ İşleniyor..." : "📤 Yükle ve İşle"}
+              {loading ? `⏳ ${getStageText(stage)}` : "📤 Yükle ve İşle"}
             </button>
           </div>
           {error && <div className="error">{error}</div>}
@@ -290,6 +292,15 @@ function App() {
                 </div>
               </div>
 
+              <div className="preprocessed-image">
+                <label>OCR Görüntüsü:</label>
+                <img
+                  src={preprocessedImageUrl(invoiceResults.id)}
+                  alt="Ön işlenmiş fatura görüntüsü"
+                  onError={(e) => { e.target.parentNode.style.display = "none"; }}
+                />
+              </div>
+
               <div className="action-buttons">
                 <button 
                   onClick={sendToERP} 
@@ -0,0 +1,32 @@
+export const API_BASE = "http://localhost:8000";
+
+const FINAL_STAGES = ["done", "error"];
+
+// İşleme aşamalarını Server-Sent Events ile dinle; son aşamada bağlantı kapanır
+const subscribe = (path, onEvent, onError) => {
+  const source = new EventSource(`${API_BASE}${path}`);
+
+  source.addEventListener("progress", (e) => {
+    onEvent(JSON.parse(e.data));
+  });
+
+  source.onerror = (err) => {
+    // Sunucu akışı bitirdiğinde de tetiklenir; otomatik yeniden bağlanmayı engelle
+    source.close();
+    if (onError) onError(err);
+  };
+
+  return () => source.close();
+};
+
+export const subscribeToInvoice = (invoiceId, onEvent, onError) =>
+  subscribe(`/events/invoices/${invoiceId}`, onEvent, onError);
+
+export const subscribeToBatch = (batchId, onEvent, onError) =>
+  subscribe(`/events/batches/${batchId}`, onEvent, onError);
+
+// OCR'a giren ön işlenmiş sayfa görüntüsü (PNG)
+export const preprocessedImageUrl = (invoiceId, page) =>
+  `${API_BASE}/invoices/${invoiceId}/preprocessed-image${page ? `?page=${page}` : ""}`;
+
+export const isFinalStage = (stage) => FINAL_STAGES.includes(stage);
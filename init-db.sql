@@ -44,20 +44,23 @@ BEGIN
     -- These will be executed after SQLAlchemy creates the tables
     
     IF EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'invoices') THEN
-        -- Index for invoice number searches
-        CREATE INDEX IF NOT EXISTS idx_invoices_number ON invoices(invoice_number);
+        -- Mirrors the indexes declared on Invoice in backend/app/models.py.
+        -- New databases get them from SQLAlchemy; call this on databases whose
+        -- invoices table predates those declarations.
+        CREATE INDEX IF NOT EXISTS ix_invoices_created_id ON invoices(created_at, id);
+        CREATE INDEX IF NOT EXISTS ix_invoices_status_created_id ON invoices(status, created_at, id);
+        CREATE INDEX IF NOT EXISTS ix_invoices_tax_number_created_id ON invoices(company_tax_number, created_at, id);
+        CREATE INDEX IF NOT EXISTS ix_invoices_company_name_prefix ON invoices(lower(company_name) text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS ix_invoices_invoice_date ON invoices(invoice_date);
+        CREATE INDEX IF NOT EXISTS ix_invoices_invoice_number ON invoices(invoice_number);
         
-        -- Index for date range queries
-        CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date);
-        
-        -- Index for company searches
-        CREATE INDEX IF NOT EXISTS idx_invoices_company ON invoices(company_name);
-        
-        -- Index for status filtering
-        CREATE INDEX IF NOT EXISTS idx_invoices_status ON invoices(status);
-        
-        -- Composite index for common filters
-        CREATE INDEX IF NOT EXISTS idx_invoices_status_date ON invoices(status, created_at);
+        -- Superseded by the indexes above
+        DROP INDEX IF EXISTS ix_invoices_company_name;
+        DROP INDEX IF EXISTS idx_invoices_number;
+        DROP INDEX IF EXISTS idx_invoices_date;
+        DROP INDEX IF EXISTS idx_invoices_company;
+        DROP INDEX IF EXISTS idx_invoices_status;
+        DROP INDEX IF EXISTS idx_invoices_status_date;
         
         RAISE NOTICE 'Performance indexes created successfully.';
     ELSE